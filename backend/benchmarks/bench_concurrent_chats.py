@@ -0,0 +1,108 @@
+"""
+Benchmark: concurrent in-flight chats per worker.
+
+Compares the old call style (sync client wrapped in asyncio.to_thread) with the
+native async client (client.aio) used by ChatService. Gemini is replaced by an
+httpx mock transport that answers every generateContent call after a fixed
+latency, so the numbers reflect how many calls one event loop can keep in flight.
+
+Usage:
+    cd backend
+    python benchmarks/bench_concurrent_chats.py --chats 200 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from google import genai
+from google.genai import types
+
+RESPONSE_BODY = json.dumps({
+    "candidates": [{
+        "content": {"role": "model", "parts": [{"text": "Hi, I'm Andrei's AI clone."}]},
+        "finishReason": "STOP"
+    }]
+}).encode()
+
+
+class InFlightCounter:
+    """Tracks current and peak number of upstream requests in flight."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def enter(self) -> None:
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def exit(self) -> None:
+        self.current -= 1
+
+
+def build_client(latency: float, counter: InFlightCounter) -> genai.Client:
+    """Create a Gen AI client whose sync and async transports are mocked."""
+
+    def sync_handler(request: httpx.Request) -> httpx.Response:
+        counter.enter()
+        try:
+            time.sleep(latency)
+            return httpx.Response(200, content=RESPONSE_BODY, headers={"content-type": "application/json"})
+        finally:
+            counter.exit()
+
+    async def async_handler(request: httpx.Request) -> httpx.Response:
+        counter.enter()
+        try:
+            await asyncio.sleep(latency)
+            return httpx.Response(200, content=RESPONSE_BODY, headers={"content-type": "application/json"})
+        finally:
+            counter.exit()
+
+    return genai.Client(
+        api_key="benchmark",
+        http_options=types.HttpOptions(
+            client_args={"transport": httpx.MockTransport(sync_handler)},
+            async_client_args={"transport": httpx.MockTransport(async_handler)}
+        )
+    )
+
+
+async def run_threaded(client: genai.Client, chats: int) -> None:
+    """Old path: every call pins a default-executor thread."""
+    await asyncio.gather(*[
+        asyncio.to_thread(client.models.generate_content, model="gemini-2.5-flash", contents="hello")
+        for _ in range(chats)
+    ])
+
+
+async def run_async(client: genai.Client, chats: int) -> None:
+    """New path: calls share the event loop and the pooled HTTP session."""
+    await asyncio.gather(*[
+        client.aio.models.generate_content(model="gemini-2.5-flash", contents="hello")
+        for _ in range(chats)
+    ])
+
+
+async def main(chats: int, latency: float) -> None:
+    for label, runner in (("asyncio.to_thread", run_threaded), ("client.aio", run_async)):
+        counter = InFlightCounter()
+        client = build_client(latency, counter)
+        started = time.perf_counter()
+        await runner(client, chats)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{label:>18}: {chats} chats in {elapsed:6.2f}s | "
+            f"peak in-flight {counter.peak:4d} | {chats / elapsed:7.1f} chats/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="Number of concurrent chats")
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated model latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.latency))
@@ -0,0 +1,109 @@
+"""
+Benchmark: WebSocket connection registry operations at scale.
+
+Registers N fake connections, then measures connect, per-chunk lookups
+(is_connected and get_session_id, as done for every streamed chunk) and
+disconnect in random order. Two registries are compared:
+
+    list - the old List[WebSocket] registry (linear `in` / `remove`)
+    dict - WebSocketService's connection-id registry with a socket index
+
+Usage:
+    cd backend
+    python benchmarks/bench_connection_registry.py --connections 10000 --lookups 100000
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.websocket_service import WebSocketService  # noqa: E402
+
+
+class FakeWebSocket:
+    """Just enough of a Starlette WebSocket for the registry."""
+
+    def __init__(self):
+        self.scope = {"path": "/ws"}
+
+    async def accept(self) -> None:
+        pass
+
+
+class ListRegistry:
+    """The registry as it was before connection ids: a list plus a per-socket dict."""
+
+    def __init__(self):
+        self.active_connections = []
+        self.connection_data = {}
+
+    async def connect(self, websocket) -> None:
+        await websocket.accept()
+        self.active_connections.append(websocket)
+        self.connection_data[websocket] = {"session_id": str(uuid.uuid4())}
+
+    def disconnect(self, websocket) -> None:
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        if websocket in self.connection_data:
+            del self.connection_data[websocket]
+
+    def is_connected(self, websocket) -> bool:
+        return websocket in self.active_connections
+
+    def get_session_id(self, websocket) -> str:
+        return self.connection_data.get(websocket, {}).get("session_id", "default")
+
+
+async def measure(label: str, registry, sockets, lookups) -> None:
+    started = time.perf_counter()
+    for websocket in sockets:
+        await registry.connect(websocket)
+    connect_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for websocket in lookups:
+        registry.is_connected(websocket)
+        registry.get_session_id(websocket)
+    lookup_time = time.perf_counter() - started
+
+    order = list(sockets)
+    random.Random(1).shuffle(order)
+    started = time.perf_counter()
+    for websocket in order:
+        registry.disconnect(websocket)
+    disconnect_time = time.perf_counter() - started
+
+    n = len(sockets)
+    print(
+        f"{label:>5}: connect {connect_time / n * 1e6:8.2f} us/op | "
+        f"lookup {lookup_time / len(lookups) * 1e6:8.2f} us/op | "
+        f"disconnect {disconnect_time / n * 1e6:8.2f} us/op"
+    )
+
+
+async def main(args) -> None:
+    sockets = [FakeWebSocket() for _ in range(args.connections)]
+    rng = random.Random(0)
+    lookups = [rng.choice(sockets) for _ in range(args.lookups)]
+    print(f"{args.connections} connections, {args.lookups} chunk lookups\n")
+
+    # Keep per-connection INFO logging out of the timings
+    logging.getLogger("services.websocket_service").setLevel(logging.WARNING)
+    await measure("list", ListRegistry(), sockets, lookups)
+    await measure("dict", WebSocketService(), sockets, lookups)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000, help="Registered connections")
+    parser.add_argument("--lookups", type=int, default=100000, help="is_connected/get_session_id pairs to time")
+    args = parser.parse_args()
+    asyncio.run(main(args))
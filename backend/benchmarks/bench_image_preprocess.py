@@ -0,0 +1,133 @@
+"""
+Benchmark: preprocessing of phone-camera uploads before they are sent to Gemini.
+
+Generates synthetic 12 MP JPEGs with EXIF metadata (sensor-like noise over a
+gradient, similar in size to phone photos) and compares three ways of preparing
+them for the model:
+
+    passthrough  - base64-decode on the event loop and send full resolution (old path)
+    on-loop      - decode, strip metadata and downscale on the event loop
+    process-pool - the same work in ImagePreprocessor's worker processes
+
+For each mode it reports wall time, bytes sent to the model and the worst
+event-loop stall seen by a 5 ms ticker running alongside.
+
+Usage:
+    cd backend
+    python benchmarks/bench_image_preprocess.py --images 16 --workers 4
+"""
+
+import os
+import sys
+import io
+import time
+import base64
+import asyncio
+import argparse
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.image_preprocessor import ImagePreprocessor, preprocess_image  # noqa: E402
+
+
+def make_phone_photo(seed: int, width: int = 4032, height: int = 3024) -> bytes:
+    """Create a JPEG resembling a phone-camera photo, with orientation and camera EXIF tags."""
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 40 + seed % 20).convert("RGB")
+    photo = Image.blend(gradient, noise, 0.35)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010F] = "Phone Maker"
+    exif[0x0110] = "Phone Model 15"
+    exif[0x0131] = "Camera 1.0"
+
+    output = io.BytesIO()
+    photo.save(output, format="JPEG", quality=92, exif=exif.tobytes())
+    return output.getvalue()
+
+
+class LoopLagMonitor:
+    """Measures the longest delay between consecutive ticks of a periodic task."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.perf_counter() - started - self.interval)
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        # Let the ticker start before the measured work begins
+        await asyncio.sleep(self.interval)
+        return self
+
+    async def __aexit__(self, *exc):
+        # One more tick so a stall at the very end is recorded
+        await asyncio.sleep(self.interval * 2)
+        self._task.cancel()
+
+
+async def run_passthrough(payloads, args):
+    return [base64.b64decode(payload) for payload in payloads]
+
+
+async def run_on_loop(payloads, args):
+    results = []
+    for payload in payloads:
+        data, _ = preprocess_image(payload, args.max_dimension, args.quality)
+        results.append(data)
+        await asyncio.sleep(0)
+    return results
+
+
+async def run_process_pool(payloads, args, preprocessor):
+    results = await asyncio.gather(*[preprocessor.process(payload, "image/jpeg") for payload in payloads])
+    return [data for data, _ in results]
+
+
+async def main(args) -> None:
+    print(f"Generating {args.images} synthetic phone photos...")
+    photos = [make_phone_photo(i) for i in range(args.images)]
+    payloads = [base64.b64encode(photo).decode() for photo in photos]
+    print(f"Average upload: {sum(len(p) for p in photos) / len(photos) / 1e6:.2f} MB\n")
+
+    preprocessor = ImagePreprocessor(args.workers, args.max_dimension, args.quality)
+    # Warm the pool so process start-up is not counted
+    await preprocessor.process(payloads[0], "image/jpeg")
+
+    modes = (
+        ("passthrough", lambda: run_passthrough(payloads, args)),
+        ("on-loop", lambda: run_on_loop(payloads, args)),
+        ("process-pool", lambda: run_process_pool(payloads, args, preprocessor)),
+    )
+    for label, runner in modes:
+        await asyncio.sleep(0.05)
+        async with LoopLagMonitor() as monitor:
+            started = time.perf_counter()
+            results = await runner()
+            elapsed = time.perf_counter() - started
+        sent = sum(len(data) for data in results)
+        print(
+            f"{label:>13}: {elapsed:6.2f}s | {sent / 1e6:7.2f} MB to model | "
+            f"max loop stall {monitor.max_lag * 1000:7.1f} ms"
+        )
+
+    preprocessor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=16, help="Number of photos to process")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes in the pool")
+    parser.add_argument("--max-dimension", type=int, default=1536, help="Longest output side in pixels")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality for re-encoding")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,83 @@
+"""
+Benchmark: CPU cost of turning an outbound message into a JSON WebSocket frame.
+
+Times the whole path from building the response model to the text frame,
+for representative chat and group chat frames:
+
+    before - model.dict() wrapped in an envelope dict, then json.dumps
+    after  - model wrapped in a cached Envelope, encoded by JsonCodec
+             (model_dump_json behind a pre-encoded prefix, orjson for dicts)
+
+Usage:
+    cd backend
+    python benchmarks/bench_serialization.py --iterations 50000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models.websocket import ChatResponseChunk, ChatComplete, GroupChatResponse, GroupUser  # noqa: E402
+from services.serialization import CHAT_RESPONSE, GROUP_CHAT_RESPONSE  # noqa: E402
+from services.wire_codec import JSON_CODEC  # noqa: E402
+
+
+def sample_builders():
+    """Builders for frames as sent by the chat and group chat endpoints: (envelope, model factory)."""
+    now = time.time()
+    message_id = "msg-1727712345678-abc123"
+    users = [GroupUser(id=f"user-{i:04d}-5f0c-4a3e-9d55-1a2b3c4d5e6f", nickname=f"guest{i}", joined_at=now) for i in range(5)]
+    return {
+        "content_chunk": (CHAT_RESPONSE, lambda: ChatResponseChunk(
+            content="Andrei designs conversational interfaces and too", message_id=message_id, timestamp=now
+        )),
+        "message_complete": (CHAT_RESPONSE, lambda: ChatComplete(
+            message_id=message_id, full_content="word " * 200, timestamp=now
+        )),
+        "group_message": (GROUP_CHAT_RESPONSE, lambda: GroupChatResponse(
+            type="message", message="Hello everyone!", sender="guest1", userId=users[1].id, timestamp=now
+        )),
+        "user_joined": (GROUP_CHAT_RESPONSE, lambda: GroupChatResponse(
+            type="user_joined", sender="guest4", userId=users[4].id, users=users, userCount=5, timestamp=now
+        )),
+    }
+
+
+def before(envelope, build) -> str:
+    return json.dumps({"type": envelope.type, "data": build().dict()})
+
+
+def after(envelope, build) -> str:
+    return JSON_CODEC.encode(envelope.wrap(build()))
+
+
+def per_op_us(fn, envelope, build, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(envelope, build)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(args) -> None:
+    # .dict() is deprecated in pydantic v2; the "before" path still uses it on purpose
+    warnings.simplefilter("ignore", DeprecationWarning)
+    for frame_name, (envelope, build) in sample_builders().items():
+        assert json.loads(before(envelope, build)) == json.loads(after(envelope, build))
+        before_us = per_op_us(before, envelope, build, args.iterations)
+        after_us = per_op_us(after, envelope, build, args.iterations)
+        print(
+            f"{frame_name:>16}: before {before_us:6.2f} us | after {after_us:6.2f} us | "
+            f"{before_us / after_us:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50000, help="Frames built and encoded per frame type and path")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,92 @@
+"""
+Benchmark: bytes on the wire and encode/decode cost per WebSocket frame.
+
+Encodes representative outbound frames with each wire codec:
+
+    json            - text JSON, the default protocol
+    msgpack         - MessagePack with the full field names (for reference)
+    msgpack.v1      - MessagePack with short field tags, as negotiated by clients
+
+Usage:
+    cd backend
+    python benchmarks/bench_wire_codec.py --iterations 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import msgpack
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models.websocket import ChatResponseChunk, ChatComplete, GroupChatResponse, GroupUser  # noqa: E402
+from services.wire_codec import JSON_CODEC, MSGPACK_CODEC  # noqa: E402
+
+
+class UntaggedMsgpackCodec:
+    """MessagePack without field tags."""
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+def sample_frames():
+    """Frames as they are sent by the chat and group chat endpoints."""
+    now = time.time()
+    message_id = "msg-1727712345678-abc123"
+    users = [GroupUser(id=f"user-{i:04d}-5f0c-4a3e-9d55-1a2b3c4d5e6f", nickname=f"guest{i}", joined_at=now) for i in range(5)]
+    return {
+        "content_chunk": {
+            "type": "chat_response",
+            "data": ChatResponseChunk(content="Andrei designs conversational interfaces and too", message_id=message_id, timestamp=now).model_dump()
+        },
+        "message_complete": {
+            "type": "chat_response",
+            "data": ChatComplete(message_id=message_id, full_content="word " * 200, timestamp=now).model_dump()
+        },
+        "group_message": {
+            "type": "group_chat_response",
+            "data": GroupChatResponse(type="message", message="Hello everyone!", sender="guest1", userId=users[1].id, timestamp=now).model_dump()
+        },
+        "user_joined": {
+            "type": "group_chat_response",
+            "data": GroupChatResponse(type="user_joined", sender="guest4", userId=users[4].id, users=users, userCount=5, timestamp=now).model_dump()
+        },
+    }
+
+
+def per_op_us(fn, arg, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(args) -> None:
+    codecs = (("json", JSON_CODEC), ("msgpack", UntaggedMsgpackCodec()), ("msgpack.v1", MSGPACK_CODEC))
+    for frame_name, frame in sample_frames().items():
+        print(frame_name)
+        baseline = None
+        for label, codec in codecs:
+            encoded = codec.encode(frame)
+            size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+            baseline = baseline or size
+            encode_us = per_op_us(codec.encode, frame, args.iterations)
+            decode_us = per_op_us(codec.decode, encoded, args.iterations)
+            print(
+                f"  {label:>10}: {size:6d} bytes ({size / baseline:5.0%}) | "
+                f"encode {encode_us:6.2f} us | decode {decode_us:6.2f} us"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000, help="Encodes/decodes timed per frame and codec")
+    args = parser.parse_args()
+    main(args)
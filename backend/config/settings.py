@@ -40,13 +40,80 @@ class Settings(BaseSettings):
     # AI/Chat Configuration
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.5-flash"
+    gemini_light_model: str = "gemini-2.5-flash-lite"  # Cheaper, lower-latency model for short, simple turns
+    model_routing_enabled: bool = True
+    light_route_max_chars: int = 120  # Longer messages always use gemini_model
+    light_route_max_depth: int = 6  # Deeper conversations always use gemini_model
     gemini_image_model: str = "gemini-2.5-flash-image-preview"  # For image generation (nano-banana)
+    chat_model_max_concurrency: int = 16  # Concurrent calls allowed per model
+    chat_model_requests_per_minute: float = 600.0
+    image_model_max_concurrency: int = 4
+    image_model_requests_per_minute: float = 60.0
+    model_queue_max_size: int = 100  # Calls allowed to wait for a slot before new ones are rejected
+    model_queue_timeout: float = 20.0  # Seconds a call may wait for admission
+    model_retry_max_attempts: int = 3  # Retries on 429/503 with jittered exponential backoff
+    model_retry_base_delay: float = 0.5
+    model_retry_max_delay: float = 8.0
+    text_lane_workers: int = 32  # Concurrent text turns
+    text_lane_max_per_session: int = 2
+    image_lane_workers: int = 2  # Concurrent image jobs, shared round-robin across sessions
+    image_lane_max_per_session: int = 1
+    lane_queue_timeout: float = 60.0  # Seconds a turn may wait for a lane worker
+    image_job_retention: float = 600.0  # Seconds finished image jobs are kept for reconnecting clients
+    context_cache_enabled: bool = False  # Off by default: the persona and tool prefix (~460 tokens) is below the caching minimum
+    context_cache_ttl: int = 3600  # Seconds
+    context_cache_refresh_margin: float = 300.0  # Extend the cache TTL once it is this close to expiry
+    context_cache_retry_after: float = 600.0  # Send the persona inline this long after a failed cache creation
+    context_cache_min_tokens: int = 1024  # Model's minimum cacheable prefix; smaller prefixes are sent inline without trying
+    gemini_max_connections: int = 100  # Pooled HTTP connections shared by all async model calls
+    gemini_max_keepalive_connections: int = 20
     chat_history_limit: int = 10
+    chat_streaming_enabled: bool = True  # Forward model tokens as they arrive instead of chunking the full reply
+    intent_preroute_enabled: bool = True  # Send unambiguous image requests straight to the image tool
+    intent_preroute_max_length: int = 200  # Longer messages are always routed by the model
+    chat_history_token_budget: int = 2000  # Prompt tokens spent on history and the rolling summary
+    chat_summary_enabled: bool = True  # Fold turns that fall out of the window into a background summary
+    chat_summary_max_tokens: int = 256
+    chat_summary_keep_ratio: float = 0.5  # Compaction leaves this share of the window, so summaries run every few turns rather than every turn
+    chat_summary_retry_after: float = 60.0  # Seconds before a failed summary is attempted again
+    chat_history_max_turns: int = 50  # Hard cap on stored turns if summarization is disabled or keeps failing
+    chat_session_max_count: int = 1000
+    chat_session_memory_budget_bytes: int = 64 * 1024 * 1024  # Shared across all sessions' history and image context
+    chat_session_idle_timeout: float = 1800.0  # Seconds before an idle session is evicted
+    response_cache_enabled: bool = True  # Reuse answers to identical text-only turns
+    response_cache_max_entries: int = 500
+    response_cache_ttl: float = 3600.0
+    single_flight_enabled: bool = True  # Identical concurrent text turns share one upstream generation
     response_chunk_size: int = 50
     stream_delay: float = 0.03
     
     # WebSocket Configuration
-    websocket_heartbeat_interval: int = 30
+    websocket_heartbeat_interval: int = 30  # Seconds between server ping sweeps (0 disables)
+    websocket_idle_timeout: float = 90.0  # Seconds without any inbound frame (or pong) before a connection is reaped
+    websocket_max_concurrent_messages: int = 4  # In-flight messages handled at once per connection
+    websocket_outbound_queue_size: int = 256  # Frames queued per connection before senders wait and broadcasts evict it
+    websocket_max_send_lag: float = 10.0  # Seconds a queued frame may wait before its connection is evicted
+    websocket_chunk_coalesce_window: float = 0.02  # Seconds a content chunk waits to be merged with the next ones
+    
+    # Attachment Storage
+    attachment_store_dir: str = "./data/blobs"  # Content-addressed uploads, one file per SHA-256
+    attachment_max_bytes: int = 20 * 1024 * 1024
+    attachment_store_max_bytes: int = 2 * 1024 * 1024 * 1024  # Least recently used uploads are deleted past this
+    attachment_upload_quota_bytes: int = 200 * 1024 * 1024  # Bytes one client address may upload per quota window
+    attachment_upload_quota_window: float = 3600.0
+    generated_image_store_dir: str = "./data/images"  # Generated images, served from /api/images
+    generated_image_store_max_bytes: int = 1024 * 1024 * 1024  # Least recently used images are deleted past this
+    image_preprocess_enabled: bool = True  # Strip metadata and downscale uploaded images before sending them to the model
+    image_preprocess_workers: int = 2  # Worker processes for image decoding and resizing
+    image_max_dimension: int = 1536  # Longest side, in pixels, of images sent to the model
+    image_jpeg_quality: int = 85
+    reference_file_upload_enabled: bool = True  # Upload reference images once via the Files API and reuse the URI
+    reference_file_ttl: float = 46 * 3600.0  # Seconds an upload is reused (the Files API keeps files for 48 hours)
+    reference_file_min_bytes: int = 64 * 1024  # Smaller reference images are sent inline
+    reference_file_max_entries: int = 1000
+    image_result_cache_enabled: bool = True  # Reuse renders for repeated prompts with the same reference images
+    image_result_cache_dir: str = "./data/image_cache"
+    image_result_cache_max_bytes: int = 256 * 1024 * 1024  # Least recently used renders are evicted past this
     
     # Database Configuration (for future use)
     database_url: str = "sqlite:///./app.db"
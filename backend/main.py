@@ -64,6 +64,10 @@ async def startup_event():
         logger.warning(f"⚠️ Chat service configuration issue: {e}")
         logger.info("🔧 Chat service will be initialized on first message")
     
+    # Ping WebSocket clients and reap dead connections
+    from routes import websocket_routes
+    websocket_routes.heartbeat.start()
+    
     logger.info("✅ Backend startup complete")
 
 
@@ -71,7 +75,17 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown."""
     logger.info("🛑 Shutting down backend services...")
-    # Add any cleanup logic here
+    
+    # Delete server-side context caches
+    from routes import websocket_routes
+    await websocket_routes.heartbeat.stop()
+    if websocket_routes.chat_service:
+        await websocket_routes.chat_service.close()
+    
+    # Release pooled Gemini HTTP connections
+    from services.chat_service import close_genai_clients
+    await close_genai_clients()
+    
     logger.info("✅ Backend shutdown complete")
 
 
@@ -2,8 +2,9 @@
 WebSocket message models and schemas.
 """
 
-from typing import Any, Dict, Optional, Union, Literal, List
-from pydantic import BaseModel, Field
+import base64
+from typing import Annotated, Any, Dict, Optional, Union, Literal, List
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
 
 
 class BaseWebSocketMessage(BaseModel):
@@ -18,19 +19,43 @@ class BaseWebSocketMessage(BaseModel):
 class PingMessage(BaseWebSocketMessage):
     """Ping message for connection health check."""
     type: Literal["ping"] = "ping"
+    ping_id: Optional[str] = Field(default=None, description="Set on server pings; echoed in the pong")
 
 
 class PongMessage(BaseWebSocketMessage):
     """Pong response to ping message."""
     type: Literal["pong"] = "pong"
+    ping_id: Optional[str] = Field(default=None, description="ID of the server ping being answered")
 
 
 class MessageAttachment(BaseModel):
     """Attachment data for chat messages."""
     name: str = Field(..., description="Filename of the attachment")
     mime_type: str = Field(..., description="MIME type of the attachment")
-    data: str = Field(..., description="Base64 encoded attachment data")
+    data: Optional[str] = Field(None, description="Base64 encoded attachment data (legacy inline upload)")
+    blob_id: Optional[str] = Field(None, description="SHA-256 id returned by POST /api/attachments")
     size: Optional[int] = Field(None, description="File size in bytes")
+    
+    _content: Optional[bytes] = PrivateAttr(default=None)
+    
+    @model_validator(mode="after")
+    def check_source(self) -> "MessageAttachment":
+        """Require either inline data or a blob reference."""
+        if not self.data and not self.blob_id:
+            raise ValueError("Attachment needs either data or blob_id")
+        return self
+    
+    def set_content(self, content: bytes) -> None:
+        """Attach the raw bytes loaded from the blob store."""
+        self._content = content
+    
+    def get_content(self) -> bytes:
+        """Get the raw attachment bytes, decoding inline base64 data on first use."""
+        if self._content is None:
+            if not self.data:
+                raise ValueError(f"Attachment {self.name} has not been loaded from the blob store")
+            self._content = base64.b64decode(self.data)
+        return self._content
 
 
 class ChatMessage(BaseWebSocketMessage):
@@ -39,6 +64,7 @@ class ChatMessage(BaseWebSocketMessage):
     content: str = Field(..., min_length=1, description="The chat message content")
     message_id: str = Field(..., description="Unique identifier for this message")
     attachments: List[MessageAttachment] = Field(default_factory=list, description="Message attachments")
+    session_id: Optional[str] = Field(None, description="Conversation session to continue (defaults to the connection's session)")
 
 
 class ChatResponseChunk(BaseWebSocketMessage):
@@ -59,6 +85,24 @@ class ChatComplete(BaseWebSocketMessage):
     full_content: str = Field(..., description="Complete response content")
 
 
+class CancelMessage(BaseWebSocketMessage):
+    """Request to stop generating the response to a chat message."""
+    type: Literal["cancel"] = "cancel"
+    message_id: str = Field(..., description="Chat message whose response should stop")
+
+
+class CancelImageJobMessage(BaseWebSocketMessage):
+    """Request to cancel a queued or running image generation job."""
+    type: Literal["cancel_image_job"] = "cancel_image_job"
+    job_id: str = Field(..., description="Job to cancel")
+
+
+class ResumeImageJobsMessage(BaseWebSocketMessage):
+    """Request to receive image job results of a session after reconnecting."""
+    type: Literal["resume_image_jobs"] = "resume_image_jobs"
+    session_id: str = Field(..., description="Session the jobs were started in")
+
+
 class BroadcastMessage(BaseWebSocketMessage):
     """Broadcast message to all connected clients."""
     type: Literal["broadcast"] = "broadcast"
@@ -80,6 +124,9 @@ WebSocketMessage = Union[
     ChatMessage,
     ChatResponseChunk,
     ChatComplete,
+    CancelMessage,
+    CancelImageJobMessage,
+    ResumeImageJobsMessage,
     BroadcastMessage,
     ErrorMessage
 ]
@@ -149,3 +196,24 @@ class GroupChatResponse(BaseWebSocketMessage):
     userCount: Optional[int] = None
     error: Optional[str] = None
     replyTo: Optional[ReplyToData] = None  # Reply data
+
+
+# Every message a client may send, told apart by its "type" field
+InboundMessage = Annotated[
+    Union[
+        PingMessage,
+        PongMessage,
+        ChatMessage,
+        CancelMessage,
+        CancelImageJobMessage,
+        ResumeImageJobsMessage,
+        BroadcastMessage,
+        JoinRoomMessage,
+        LeaveRoomMessage,
+        SendGroupMessage
+    ],
+    Field(discriminator="type")
+]
+
+# Built once: validates raw JSON (or decoded MessagePack) straight into the matching model
+INBOUND_MESSAGE_ADAPTER: TypeAdapter[InboundMessage] = TypeAdapter(InboundMessage)
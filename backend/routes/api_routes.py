@@ -2,9 +2,14 @@
 REST API route handlers.
 """
 
+import asyncio
 import logging
-from typing import Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
 from models.api import (
     HealthResponse, 
     AppsResponse, 
@@ -15,6 +20,15 @@ from models.api import (
 )
 from services.app_service import AppService
 from services.websocket_service import WebSocketService
+from services.blob_store import (
+    BlobStore,
+    BlobTooLargeError,
+    UploadQuota,
+    UploadQuotaExceededError,
+    get_blob_store,
+    get_image_store,
+    get_upload_quota
+)
 
 logger = logging.getLogger(__name__)
 
@@ -187,6 +201,270 @@ async def delete_note(note_id: str, app_service: AppService = Depends(get_app_se
         raise HTTPException(status_code=500, detail="Failed to delete note")
 
 
+@api_router.get("/chat/stats", response_model=ApiResponse)
+async def get_chat_stats():
+    """
+    Get AI chat statistics (sessions, response cache).
+    
+    Returns:
+        Chat service diagnostics
+    """
+    from routes.websocket_routes import get_chat_service
+    
+    try:
+        chat_service = await get_chat_service()
+    except Exception as e:
+        logger.error(f"Error getting chat service: {str(e)}")
+        raise HTTPException(status_code=503, detail="Chat service unavailable")
+    
+    return ApiResponse(
+        success=True,
+        message="Chat statistics retrieved successfully",
+        data=chat_service.get_stats()
+    )
+
+
+@api_router.get("/websocket/stats", response_model=ApiResponse)
+async def get_websocket_stats():
+    """
+    Get WebSocket statistics (connections, broadcast fan-out, heartbeat, message dispatch).
+    
+    Returns:
+        WebSocket service diagnostics
+    """
+    from routes.websocket_routes import (
+        get_websocket_service as get_live_websocket_service,
+        heartbeat,
+        ws_dispatcher,
+        chat_dispatcher,
+        group_chat_dispatcher
+    )
+    
+    return ApiResponse(
+        success=True,
+        message="WebSocket statistics retrieved successfully",
+        data={
+            **get_live_websocket_service().get_stats(),
+            "heartbeat": heartbeat.get_stats(),
+            "dispatch": {
+                dispatcher.name: dispatcher.get_stats()
+                for dispatcher in (ws_dispatcher, chat_dispatcher, group_chat_dispatcher)
+            }
+        }
+    )
+
+
+@api_router.get("/websocket/connections", response_model=ApiResponse)
+async def get_websocket_connections():
+    """
+    List open WebSocket connections with their idle time and round-trip time.
+    
+    Returns:
+        One record per connection
+    """
+    from routes.websocket_routes import get_websocket_service as get_live_websocket_service
+    
+    connections = list(get_live_websocket_service().connections.values())
+    return ApiResponse(
+        success=True,
+        message=f"{len(connections)} WebSocket connections",
+        data={"connections": [connection.describe() for connection in connections]}
+    )
+
+
+# Allowance for the multipart boundaries and part headers around the uploaded file
+_MULTIPART_OVERHEAD = 16 * 1024
+
+
+class _MultipartFileReceiver:
+    """
+    python-multipart callbacks that collect one file field's data.
+
+    Data of the field is queued in pending as it is parsed; the caller drains
+    the queue into a blob writer. Other fields are parsed and dropped.
+    """
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name.encode("utf-8")
+        self.found = False
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.pending: List[bytes] = []
+        self._in_field = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.found or options.get(b"name") != self.field_name:
+            return
+        self.found = True
+        self._in_field = True
+        if options.get(b"filename"):
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+        if self._headers.get(b"content-type"):
+            self.content_type = self._headers[b"content-type"].decode("latin-1")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            self.pending.append(bytes(data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self._in_field = False
+
+
+@api_router.post("/attachments", response_model=ApiResponse)
+async def upload_attachment(
+    request: Request,
+    blob_store: BlobStore = Depends(get_blob_store),
+    upload_quota: UploadQuota = Depends(get_upload_quota)
+):
+    """
+    Upload a chat attachment to the content-addressed blob store.
+    
+    Chat messages reference the returned blob_id instead of carrying base64
+    data. Uploading identical content again returns the same id.
+    
+    The multipart body is parsed as it arrives and the "file" field is written
+    straight into the store; nothing is spooled first. Oversized uploads are
+    refused from Content-Length before the body is read, and reading stops as
+    soon as the received byte count passes the limit. Each client address has
+    an upload quota.
+    
+    Args:
+        request: Multipart request with a "file" field
+        
+    Returns:
+        Blob id, size and MIME type of the stored attachment
+    """
+    client = request.client.host if request.client else "unknown"
+    max_body_bytes = blob_store.max_blob_bytes + _MULTIPART_OVERHEAD
+    
+    try:
+        declared_size = int(request.headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared_size > max_body_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {blob_store.max_blob_bytes} bytes")
+    
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    
+    receiver = _MultipartFileReceiver("file")
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    writer = blob_store.new_writer()
+    received = 0
+    try:
+        upload_quota.check(client, declared_size)
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body_bytes:
+                raise BlobTooLargeError(f"Upload exceeds {blob_store.max_blob_bytes} bytes")
+            upload_quota.check(client, received)
+            parser.write(chunk)
+            if receiver.pending:
+                chunks, receiver.pending = receiver.pending, []
+                await asyncio.to_thread(writer.write_all, chunks)
+        parser.finalize()
+        
+        if not receiver.found:
+            raise HTTPException(status_code=400, detail="Missing file field")
+        blob_id, size, deduplicated = await blob_store.commit(writer, receiver.content_type)
+    except HTTPException:
+        raise
+    except BlobTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadQuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except MultipartParseError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error storing attachment {receiver.filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to store attachment")
+    finally:
+        writer.discard()
+        upload_quota.charge(client, received)
+    
+    return ApiResponse(
+        success=True,
+        message="Attachment already stored" if deduplicated else "Attachment stored successfully",
+        data={
+            "blob_id": blob_id,
+            "name": receiver.filename,
+            "mime_type": receiver.content_type or "application/octet-stream",
+            "size": size,
+            "deduplicated": deduplicated
+        }
+    )
+
+
+@api_router.get("/images/{image_name}")
+async def get_generated_image(
+    image_name: str,
+    if_none_match: Optional[str] = Header(None),
+    image_store: BlobStore = Depends(get_image_store)
+):
+    """
+    Serve a generated image by its content hash.
+    
+    Images are immutable, so responses carry a strong ETag (the hash) and
+    long-lived immutable cache headers. Range requests are supported.
+    
+    Args:
+        image_name: Image id followed by a file extension (e.g. "<sha256>.png")
+        if_none_match: ETag(s) the client already has
+        
+    Returns:
+        Image file, or 304 when the client's copy is current
+    """
+    image_id = image_name.split(".", 1)[0]
+    if not image_store.exists(image_id):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    etag = f'"{image_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    # Serve the type recorded when the image was stored, whatever extension the URL has
+    media_type = await image_store.mime_type(image_id) or "application/octet-stream"
+    return FileResponse(
+        image_store.path(image_id),
+        media_type=media_type,
+        headers=headers
+    )
+
+
 @api_router.get("/notes/stats", response_model=ApiResponse)
 async def get_notes_stats(app_service: AppService = Depends(get_app_service)):
     """
@@ -2,24 +2,35 @@
 WebSocket route handlers and message processing.
 """
 
-import json
+import uuid
+import asyncio
 import logging
+from contextlib import aclosing
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from typing import Optional
 from models.websocket import (
     ChatMessage, 
     PingMessage, 
+    PongMessage,
     BroadcastMessage,
-    WebSocketMessage,
+    CancelMessage,
+    CancelImageJobMessage,
+    ResumeImageJobsMessage,
     JoinRoomMessage,
     LeaveRoomMessage,
-    SendGroupMessage,
-    GroupChatResponse
+    SendGroupMessage
 )
 from services.websocket_service import WebSocketService
 from services.chat_service import ChatService
 from services.group_chat_service import GroupChatService
+from services.connection_tasks import ConnectionTasks
+from services.heartbeat import HeartbeatScheduler
+from services.message_dispatcher import MessageDispatcher
+from services.serialization import CHAT_RESPONSE, GROUP_CHAT_RESPONSE
+from config.settings import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Create WebSocket router
 websocket_router = APIRouter(tags=["websocket"])
@@ -28,7 +39,13 @@ websocket_router = APIRouter(tags=["websocket"])
 websocket_service = WebSocketService()
 chat_service: ChatService = None
 chat_service_initialized = False
-group_chat_service = GroupChatService()
+group_chat_service = GroupChatService(websocket_service.fanout)
+heartbeat = HeartbeatScheduler(
+    websocket_service,
+    interval=settings.websocket_heartbeat_interval,
+    idle_timeout=settings.websocket_idle_timeout
+)
+heartbeat.add_reap_listener(group_chat_service.remove_connections)
 
 
 def get_websocket_service() -> WebSocketService:
@@ -58,69 +75,147 @@ async def websocket_endpoint(websocket: WebSocket):
     Main WebSocket endpoint for real-time communication.
     
     Handles various message types:
-    - ping/pong for connection health
+    - ping/pong for connection health (clients also answer the server's pings)
     - chat_message for AI conversations
+    - cancel to stop an in-flight chat_message
+    - cancel_image_job / resume_image_jobs for background image generation
     - broadcast for multi-client messaging
+    
+    Chat, broadcast and resume handlers run as per-connection tasks, so the
+    receive loop keeps answering pings and cancellations during long generations.
+    Messages are routed through ws_dispatcher (see the tables at the end of this module).
     """
     ws_service = get_websocket_service()
     await ws_service.connect(websocket)
+    tasks = ConnectionTasks(settings.websocket_max_concurrent_messages)
     
     try:
-        while True:
-            # Receive and parse message
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # Get message type
-            message_type = message.get("type", "unknown")
-            logger.info(f"Received WebSocket message: {message_type}")
-            
-            # Route message based on type
-            if message_type == "ping":
-                await handle_ping(websocket, message, ws_service)
-            elif message_type == "chat_message":
-                await handle_chat_message(websocket, message, ws_service)
-            elif message_type == "broadcast":
-                await handle_broadcast(websocket, message, ws_service)
-            else:
-                logger.warning(f"Unknown message type: {message_type}")
-                await ws_service.send_error(
-                    f"Unknown message type: {message_type}",
-                    websocket
-                )
-                
+        await ws_dispatcher.run(websocket, ws_service, tasks)
     except WebSocketDisconnect:
-        ws_service.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
-        ws_service.disconnect(websocket)
+    finally:
+        await close_connection(websocket, ws_service, tasks)
+
+
+async def dispatch_chat_message(websocket: WebSocket, message: ChatMessage, ws_service: WebSocketService, tasks: ConnectionTasks):
+    """
+    Start handling a chat message in the background, keyed by its message id.
+    
+    Args:
+        websocket: WebSocket connection
+        message: Chat message
+        ws_service: WebSocket service instance
+        tasks: The connection's in-flight handlers
+    """
+    if not tasks.start(message.message_id, handle_chat_message(websocket, message, ws_service)):
+        await ws_service.send_error(
+            f"Too many messages in progress (limit {tasks.max_concurrent}) or duplicate message id",
+            websocket,
+            message.message_id
+        )
+
+
+async def dispatch_task(websocket: WebSocket, coro, ws_service: WebSocketService, tasks: ConnectionTasks):
+    """
+    Run a non-chat handler in the background under the connection's concurrency cap.
+    
+    Args:
+        websocket: WebSocket connection
+        coro: Handler coroutine
+        ws_service: WebSocket service instance
+        tasks: The connection's in-flight handlers
+    """
+    if not tasks.start(str(uuid.uuid4()), coro):
+        await ws_service.send_error(
+            f"Too many messages in progress (limit {tasks.max_concurrent})",
+            websocket
+        )
+
+
+def in_background(handler):
+    """Wrap a handler so it runs as a connection task instead of holding up the receive loop."""
+    async def start_handler(websocket: WebSocket, message, ws_service: WebSocketService, tasks: ConnectionTasks):
+        await dispatch_task(websocket, handler(websocket, message, ws_service), ws_service, tasks)
+    
+    return start_handler
 
 
-async def handle_ping(websocket: WebSocket, message: dict, ws_service: WebSocketService):
+async def handle_cancel(websocket: WebSocket, message: CancelMessage, ws_service: WebSocketService, tasks: ConnectionTasks):
+    """
+    Handle a request to stop an in-flight chat message.
+    
+    Cancelling the handler closes the response stream, which in turn cancels
+    the upstream model call (unless another identical turn still shares it).
+    
+    Args:
+        websocket: WebSocket connection
+        message: Cancel message
+        ws_service: WebSocket service instance
+        tasks: The connection's in-flight handlers
+    """
+    if not tasks.cancel(message.message_id):
+        await ws_service.send_error(
+            f"No in-flight message {message.message_id}",
+            websocket,
+            message.message_id
+        )
+
+
+async def close_connection(websocket: WebSocket, ws_service: WebSocketService, tasks: ConnectionTasks):
+    """
+    Clean up after a chat connection closes.
+    
+    In-flight handlers are cancelled (nobody is left to receive their output);
+    background image jobs keep running for reconnecting clients.
+    """
+    ws_service.disconnect(websocket)
+    release_image_job_listeners(websocket)
+    await tasks.cancel_all()
+
+
+async def send_chat_error(websocket: WebSocket, ws_service: WebSocketService, error: str, message_id: Optional[str] = None):
+    """Report an error on the chat endpoints."""
+    await ws_service.send_error(error, websocket, message_id)
+
+
+async def handle_ping(websocket: WebSocket, message: PingMessage, ws_service: WebSocketService, tasks: ConnectionTasks = None):
     """
     Handle ping messages for connection health check.
     
     Args:
         websocket: WebSocket connection
-        message: Ping message data
+        message: Ping message
         ws_service: WebSocket service instance
+        tasks: Unused (the group chat endpoint has none)
     """
     await ws_service.send_message({"type": "pong"}, websocket)
 
 
-async def handle_chat_message(websocket: WebSocket, message: dict, ws_service: WebSocketService):
+async def handle_pong(websocket: WebSocket, message: PongMessage, ws_service: WebSocketService, tasks: ConnectionTasks = None):
+    """
+    Record a client's answer to a heartbeat ping.
+    
+    Args:
+        websocket: WebSocket connection
+        message: Pong message
+        ws_service: WebSocket service instance
+        tasks: Unused (the group chat endpoint has none)
+    """
+    ws_service.record_pong(websocket, message.ping_id)
+
+
+async def handle_chat_message(websocket: WebSocket, chat_msg: ChatMessage, ws_service: WebSocketService):
     """
     Handle chat messages for AI conversation.
     
     Args:
         websocket: WebSocket connection
-        message: Chat message data
+        chat_msg: Chat message
         ws_service: WebSocket service instance
     """
     try:
-        # Validate chat message
-        chat_msg = ChatMessage(**message)
-        
         # Get chat service
         try:
             chat_svc = await get_chat_service()
@@ -133,47 +228,133 @@ async def handle_chat_message(websocket: WebSocket, message: dict, ws_service: W
             )
             return
         
+        # Continue the client's named session, or the one bound to this connection
+        session_id = chat_msg.session_id or ws_service.get_session_id(websocket)
+        
+        # Background image jobs of this session report back to this connection
+        listen_for_image_jobs(websocket, session_id, ws_service, chat_svc)
+        
         # Process message and stream response
         response_count = 0
-        async for response_chunk in chat_svc.send_message_stream(
+        async with aclosing(chat_svc.send_message_stream(
             chat_msg.content, 
             chat_msg.message_id,
-            chat_msg.attachments
-        ):
-            response_count += 1
-            
-            # Check if websocket is still connected
-            if not ws_service.is_connected(websocket):
-                logger.warning(f"WebSocket disconnected during streaming at chunk {response_count}")
-                break
-            
-            # Send response chunk
-            await ws_service.send_message({
-                "type": "chat_response",
-                "data": response_chunk
-            }, websocket)
+            chat_msg.attachments,
+            session_id
+        )) as response_stream:
+            async for response_chunk in response_stream:
+                response_count += 1
+                
+                # Check if websocket is still connected
+                if not ws_service.is_connected(websocket):
+                    logger.warning(f"WebSocket disconnected during streaming at chunk {response_count}")
+                    break
+                
+                # Send response chunk (models are encoded straight into the envelope)
+                await ws_service.send_message(CHAT_RESPONSE.wrap(response_chunk), websocket)
         
         logger.info(f"Finished processing chat message {chat_msg.message_id}, sent {response_count} chunks")
         
+    except asyncio.CancelledError:
+        logger.info(f"Chat message {chat_msg.message_id} cancelled")
+        if ws_service.is_connected(websocket):
+            await ws_service.send_message(
+                CHAT_RESPONSE.wrap({"type": "message_cancelled", "message_id": chat_msg.message_id}),
+                websocket
+            )
+        raise
     except Exception as e:
         logger.error(f"Error handling chat message: {str(e)}")
-        message_id = message.get("message_id", "unknown")
-        await ws_service.send_error(str(e), websocket, message_id)
+        await ws_service.send_error(str(e), websocket, chat_msg.message_id)
 
 
-async def handle_broadcast(websocket: WebSocket, message: dict, ws_service: WebSocketService):
+def listen_for_image_jobs(websocket: WebSocket, session_id: str, ws_service: WebSocketService, chat_svc: ChatService):
     """
-    Handle broadcast messages to all connected clients.
+    Deliver a session's image job events to a connection.
     
     Args:
         websocket: WebSocket connection
-        message: Broadcast message data
+        session_id: Chat session whose jobs to follow
         ws_service: WebSocket service instance
+        chat_svc: Chat service running the jobs
+    """
+    job_sessions = ws_service.get_connection_data(websocket).setdefault("image_job_sessions", set())
+    if session_id in job_sessions:
+        return
+    job_sessions.add(session_id)
+    chat_svc.image_jobs.subscribe(session_id, websocket, image_job_sender(websocket, ws_service))
+
+
+def image_job_sender(websocket: WebSocket, ws_service: WebSocketService):
+    """Build a listener that forwards image job events to a connection as chat responses."""
+    async def send_job_event(event: dict):
+        await ws_service.send_message(CHAT_RESPONSE.wrap(event), websocket)
+    
+    return send_job_event
+
+
+def release_image_job_listeners(websocket: WebSocket):
+    """Stop delivering image job events to a closed connection (jobs keep running)."""
+    if chat_service is not None:
+        chat_service.image_jobs.unsubscribe(websocket)
+
+
+async def handle_cancel_image_job(websocket: WebSocket, cancel_msg: CancelImageJobMessage, ws_service: WebSocketService, tasks: ConnectionTasks = None):
+    """
+    Handle a request to cancel a background image job.
+    
+    Args:
+        websocket: WebSocket connection
+        cancel_msg: Cancel message
+        ws_service: WebSocket service instance
+        tasks: Unused
     """
     try:
-        # Validate broadcast message
-        broadcast_msg = BroadcastMessage(**message)
+        chat_svc = await get_chat_service()
+        
+        # Only jobs of sessions this connection follows may be cancelled
+        job_sessions = ws_service.get_connection_data(websocket).get("image_job_sessions", set())
+        if not chat_svc.image_jobs.cancel(cancel_msg.job_id, job_sessions):
+            await ws_service.send_error(f"No active image job {cancel_msg.job_id}", websocket)
         
+    except Exception as e:
+        logger.error(f"Error cancelling image job: {str(e)}")
+        await ws_service.send_error(str(e), websocket)
+
+
+async def handle_resume_image_jobs(websocket: WebSocket, resume_msg: ResumeImageJobsMessage, ws_service: WebSocketService):
+    """
+    Handle a reconnecting client asking for the image jobs of its previous session.
+    
+    Events recorded so far are replayed, and later events are delivered live.
+    
+    Args:
+        websocket: WebSocket connection
+        resume_msg: Resume message
+        ws_service: WebSocket service instance
+    """
+    try:
+        chat_svc = await get_chat_service()
+        
+        listen_for_image_jobs(websocket, resume_msg.session_id, ws_service, chat_svc)
+        replayed = await chat_svc.image_jobs.replay(resume_msg.session_id, image_job_sender(websocket, ws_service))
+        logger.info(f"Replayed {replayed} image jobs for session {resume_msg.session_id}")
+        
+    except Exception as e:
+        logger.error(f"Error resuming image jobs: {str(e)}")
+        await ws_service.send_error(str(e), websocket)
+
+
+async def handle_broadcast(websocket: WebSocket, broadcast_msg: BroadcastMessage, ws_service: WebSocketService):
+    """
+    Handle broadcast messages to all connected clients.
+    
+    Args:
+        websocket: WebSocket connection
+        broadcast_msg: Broadcast message
+        ws_service: WebSocket service instance
+    """
+    try:
         # Broadcast to all other connections
         successful_sends = await ws_service.broadcast({
             "type": "broadcast",
@@ -193,30 +374,21 @@ async def handle_broadcast(websocket: WebSocket, message: dict, ws_service: WebS
 async def chat_websocket(websocket: WebSocket):
     """
     Dedicated WebSocket endpoint for chat-only communication.
-    Simplified version that only handles chat messages.
+    Simplified version that only handles chat messages (and their cancellation).
     """
     ws_service = get_websocket_service()
     await ws_service.connect(websocket)
+    tasks = ConnectionTasks(settings.websocket_max_concurrent_messages)
     
     try:
-        while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # Only handle chat messages on this endpoint
-            if message.get("type") == "chat_message":
-                await handle_chat_message(websocket, message, ws_service)
-            else:
-                await ws_service.send_error(
-                    "This endpoint only supports chat messages",
-                    websocket
-                )
-                
+        # Only chat messages (and their image jobs) are handled on this endpoint
+        await chat_dispatcher.run(websocket, ws_service, tasks)
     except WebSocketDisconnect:
-        ws_service.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"Chat WebSocket error: {str(e)}")
-        ws_service.disconnect(websocket)
+    finally:
+        await close_connection(websocket, ws_service, tasks)
 
 
 @websocket_router.websocket("/ws/group-chat")
@@ -228,133 +400,110 @@ async def group_chat_websocket(websocket: WebSocket):
     - join_room: Join a chat room with a nickname
     - leave_room: Leave the current chat room
     - send_message: Send a message to all users in the room
+    - ping/pong for connection health
     """
     ws_service = get_websocket_service()
     await ws_service.connect(websocket)
     
     try:
-        while True:
-            # Receive and parse message
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # Get message type
-            message_type = message.get("type", "unknown")
-            logger.info(f"Received Group Chat message: {message_type}")
-            
-            # Route message based on type
-            if message_type == "join_room":
-                await handle_join_room(websocket, message)
-            elif message_type == "leave_room":
-                await handle_leave_room(websocket, message)
-            elif message_type == "send_message":
-                await handle_send_group_message(websocket, message)
-            elif message_type == "ping":
-                # Handle heartbeat ping - respond with pong
-                await websocket.send_text(json.dumps({"type": "pong"}))
-            else:
-                logger.warning(f"Unknown group chat message type: {message_type}")
-                await websocket.send_text(json.dumps({
-                    "type": "group_chat_error",
-                    "error": f"Unknown message type: {message_type}"
-                }))
-                
+        await group_chat_dispatcher.run(websocket, ws_service)
     except WebSocketDisconnect:
-        # Handle user leaving when they disconnect
-        await group_chat_service.handle_disconnect(websocket)
-        ws_service.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"Group Chat WebSocket error: {str(e)}")
+    finally:
+        await close_group_chat_connection(websocket, ws_service)
+
+
+async def close_group_chat_connection(websocket: WebSocket, ws_service: WebSocketService):
+    """
+    Clean up after a group chat connection closes, however the loop ended.
+    
+    The registry entry and outbox are released first, so they go away even
+    if announcing the departure to the room fails or is cancelled.
+    """
+    ws_service.disconnect(websocket)
+    try:
+        # Handle user leaving when they disconnect
         await group_chat_service.handle_disconnect(websocket)
-        ws_service.disconnect(websocket)
+    except Exception as e:
+        logger.warning(f"Error leaving group chat room on disconnect: {str(e)}")
+
+
+async def send_group_chat_error(websocket: WebSocket, ws_service: WebSocketService, error: str, message_id: Optional[str] = None):
+    """Report an error on the group chat endpoint."""
+    await ws_service.send_message({
+        "type": "group_chat_error",
+        "error": error
+    }, websocket)
 
 
-async def handle_join_room(websocket: WebSocket, message: dict):
+async def handle_join_room(websocket: WebSocket, join_msg: JoinRoomMessage, ws_service: WebSocketService):
     """
     Handle user joining a chat room.
     
     Args:
         websocket: WebSocket connection
-        message: Join room message data
+        join_msg: Join room message
+        ws_service: WebSocket service instance
     """
     try:
-        # Validate join room message
-        join_msg = JoinRoomMessage(**message)
-        
         # Attempt to join the room
         response = await group_chat_service.join_room(
             join_msg.nickname,
             websocket,
             join_msg.room_id
         )
+        if response.type == "room_joined":
+            ws_service.set_room(websocket, join_msg.room_id or group_chat_service.default_room_id)
         
         # Send response back to client
-        await websocket.send_text(json.dumps({
-            "type": "group_chat_response",
-            "data": response.dict()
-        }))
+        await ws_service.send_message(GROUP_CHAT_RESPONSE.wrap(response), websocket)
         
         logger.info(f"User '{join_msg.nickname}' join attempt: {response.type}")
         
     except Exception as e:
         logger.error(f"Error handling join room: {str(e)}")
-        await websocket.send_text(json.dumps({
-            "type": "group_chat_error",
-            "error": str(e)
-        }))
+        await send_group_chat_error(websocket, ws_service, str(e))
 
 
-async def handle_leave_room(websocket: WebSocket, message: dict):
+async def handle_leave_room(websocket: WebSocket, leave_msg: LeaveRoomMessage, ws_service: WebSocketService):
     """
     Handle user leaving a chat room.
     
     Args:
         websocket: WebSocket connection
-        message: Leave room message data
+        leave_msg: Leave room message
+        ws_service: WebSocket service instance
     """
     try:
-        # Validate leave room message
-        leave_msg = LeaveRoomMessage(**message)
-        
         # Leave the room
         response = await group_chat_service.leave_room(websocket, leave_msg.room_id)
         
         if response:
+            ws_service.set_room(websocket, None)
             # Send confirmation to client
-            await websocket.send_text(json.dumps({
-                "type": "group_chat_response",
-                "data": response.dict()
-            }))
+            await ws_service.send_message(GROUP_CHAT_RESPONSE.wrap(response), websocket)
             logger.info(f"User left room successfully")
         
     except Exception as e:
         logger.error(f"Error handling leave room: {str(e)}")
-        await websocket.send_text(json.dumps({
-            "type": "group_chat_error",
-            "error": str(e)
-        }))
+        await send_group_chat_error(websocket, ws_service, str(e))
 
 
-async def handle_send_group_message(websocket: WebSocket, message: dict):
+async def handle_send_group_message(websocket: WebSocket, group_msg: SendGroupMessage, ws_service: WebSocketService):
     """
     Handle sending a message to the group chat.
     
+    A missing room_id or replyTo takes the model's default ("general", None).
+    
     Args:
         websocket: WebSocket connection
-        message: Group message data
+        group_msg: Group message
+        ws_service: WebSocket service instance
     """
     try:
-        logger.info(f"📨 Received group message payload: {message}")
-        
-        # Ensure backward compatibility - add missing fields with defaults
-        if 'room_id' not in message:
-            message['room_id'] = 'general'
-        if 'replyTo' not in message:
-            message['replyTo'] = None
-            
-        # Validate group message
-        group_msg = SendGroupMessage(**message)
-        logger.info(f"✅ Message validation successful")
+        logger.info(f"📨 Received group message payload: {group_msg}")
         
         # Send message to the room
         response = await group_chat_service.send_message(
@@ -368,8 +517,27 @@ async def handle_send_group_message(websocket: WebSocket, message: dict):
         
     except Exception as e:
         logger.error(f"❌ Error handling group message: {str(e)}")
-        logger.error(f"❌ Message payload was: {message}")
-        await websocket.send_text(json.dumps({
-            "type": "group_chat_error",
-            "error": str(e)
-        }))
+        logger.error(f"❌ Message payload was: {group_msg}")
+        await send_group_chat_error(websocket, ws_service, str(e))
+
+
+# Message tables of the endpoints. Handlers are called with
+# (websocket, message, ws_service) plus the connection's tasks on the chat endpoints.
+ws_dispatcher = MessageDispatcher("/ws", send_chat_error)
+chat_dispatcher = MessageDispatcher("/ws/chat", send_chat_error, "This endpoint only supports chat messages")
+group_chat_dispatcher = MessageDispatcher("/ws/group-chat", send_group_chat_error)
+
+for dispatcher in (ws_dispatcher, chat_dispatcher):
+    dispatcher.register(PongMessage, handle_pong)
+    dispatcher.register(ChatMessage, dispatch_chat_message)
+    dispatcher.register(CancelMessage, handle_cancel)
+    dispatcher.register(CancelImageJobMessage, handle_cancel_image_job)
+    dispatcher.register(ResumeImageJobsMessage, in_background(handle_resume_image_jobs))
+ws_dispatcher.register(PingMessage, handle_ping)
+ws_dispatcher.register(BroadcastMessage, in_background(handle_broadcast))
+
+group_chat_dispatcher.register(JoinRoomMessage, handle_join_room)
+group_chat_dispatcher.register(LeaveRoomMessage, handle_leave_room)
+group_chat_dispatcher.register(SendGroupMessage, handle_send_group_message)
+group_chat_dispatcher.register(PingMessage, handle_ping)
+group_chat_dispatcher.register(PongMessage, handle_pong)
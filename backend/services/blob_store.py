@@ -0,0 +1,446 @@
+"""
+Content-addressed blob storage for uploaded attachments and generated images.
+"""
+
+import io
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import tempfile
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+class UploadQuotaExceededError(ValueError):
+    """Raised when a client has uploaded more than its quota allows."""
+
+
+class BlobWriter:
+    """
+    Incremental writer for one blob.
+
+    Chunks are hashed and written to a temporary file in the store's directory;
+    BlobStore.commit() moves the file into place under its hash.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(dir=root_dir, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append a chunk (blocking; call from a worker thread for large chunks).
+
+        Raises:
+            BlobTooLargeError: If the blob grows past max_bytes
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise BlobTooLargeError(f"Upload exceeds {self.max_bytes} bytes")
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def write_all(self, chunks: List[bytes]) -> None:
+        """Append several chunks in order."""
+        for chunk in chunks:
+            self.write(chunk)
+
+    def close(self) -> None:
+        """Flush and close the temporary file."""
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def blob_id(self) -> str:
+        """SHA-256 hex digest of the content written so far."""
+        return self._digest.hexdigest()
+
+    def discard(self) -> None:
+        """Close and delete the temporary file if it is still there."""
+        self.close()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+
+class BlobStore:
+    """
+    Stores blobs on disk under the SHA-256 of their content.
+
+    Blobs are written to a temporary file while being hashed and then moved
+    into place atomically, so identical uploads share a single file and readers
+    never see a partial blob. A blob's MIME type, when given, is recorded at
+    write time in a small "<id>.type" file next to it. The store is capped at
+    max_total_bytes: an in-memory index ordered by last use (rebuilt from file
+    mtimes on startup) drives least recently used eviction.
+    """
+
+    def __init__(self, root_dir: str, max_blob_bytes: int, max_total_bytes: int):
+        """
+        Initialize the blob store and index the blobs already on disk.
+
+        Args:
+            root_dir: Directory holding the blobs (created if missing)
+            max_blob_bytes: Largest blob accepted
+            max_total_bytes: Total size kept before least recently used blobs are deleted
+        """
+        self.root_dir = root_dir
+        self.max_blob_bytes = max_blob_bytes
+        self.max_total_bytes = max_total_bytes
+        os.makedirs(self.root_dir, exist_ok=True)
+
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._mime_types: Dict[str, Optional[str]] = {}
+        self.total_bytes = 0
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    @staticmethod
+    def is_valid_id(blob_id: str) -> bool:
+        """Check that a blob id is a well-formed SHA-256 hex digest."""
+        return bool(blob_id and _BLOB_ID_PATTERN.match(blob_id))
+
+    def path(self, blob_id: str) -> str:
+        """
+        Get the file path of a blob.
+
+        Args:
+            blob_id: SHA-256 hex digest
+
+        Returns:
+            Path where the blob is (or would be) stored
+
+        Raises:
+            ValueError: If the id is malformed
+        """
+        if not self.is_valid_id(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id!r}")
+        return os.path.join(self.root_dir, blob_id[:2], blob_id)
+
+    def _type_path(self, blob_id: str) -> str:
+        return self.path(blob_id) + ".type"
+
+    def _load_index(self) -> None:
+        """Rebuild the index from the blobs on disk and clear leftover partial writes."""
+        records = []
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for name in file_names:
+                file_path = os.path.join(dir_path, name)
+                try:
+                    if name.endswith(".part"):
+                        os.unlink(file_path)
+                    elif self.is_valid_id(name):
+                        stat = os.stat(file_path)
+                        records.append((stat.st_mtime, name, stat.st_size))
+                except OSError:
+                    continue
+
+        for _, blob_id, size in sorted(records):
+            self._index[blob_id] = size
+            self.total_bytes += size
+
+        if self._index:
+            logger.info(f"Indexed {len(self._index)} blobs in {self.root_dir} ({self.total_bytes} bytes)")
+        self._evict()
+
+    def new_writer(self) -> BlobWriter:
+        """Start writing a blob incrementally; finish with commit() or writer.discard()."""
+        return BlobWriter(self.root_dir, self.max_blob_bytes)
+
+    async def commit(self, writer: BlobWriter, mime_type: Optional[str] = None) -> Tuple[str, int, bool]:
+        """
+        Move a fully written blob into place.
+
+        Args:
+            writer: Writer returned by new_writer
+            mime_type: MIME type to record for the blob (kept if one was recorded before)
+
+        Returns:
+            Tuple of (blob id, size in bytes, whether an identical blob already existed)
+        """
+        blob_id, existed = await asyncio.to_thread(self._commit_sync, writer, mime_type)
+        if existed:
+            self.deduplicated += 1
+        else:
+            self.stored += 1
+
+        if blob_id not in self._index:
+            self.total_bytes += writer.size
+        self._index[blob_id] = writer.size
+        self._index.move_to_end(blob_id)
+        self._evict()
+        return blob_id, writer.size, existed
+
+    def _commit_sync(self, writer: BlobWriter, mime_type: Optional[str]) -> Tuple[str, bool]:
+        try:
+            writer.close()
+            blob_id = writer.blob_id
+            path = self.path(blob_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if mime_type and not os.path.exists(self._type_path(blob_id)):
+                self._write_type_sync(blob_id, mime_type)
+
+            if os.path.exists(path):
+                # Count the re-upload as a use
+                os.utime(path)
+                return blob_id, True
+
+            os.replace(writer.temp_path, path)
+            return blob_id, False
+        finally:
+            writer.discard()
+
+    def _write_type_sync(self, blob_id: str, mime_type: str) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "w") as temp_file:
+                temp_file.write(mime_type)
+            os.replace(temp_path, self._type_path(blob_id))
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    async def put_stream(self, source: BinaryIO, mime_type: Optional[str] = None) -> Tuple[str, int, bool]:
+        """
+        Store the contents of a readable binary file.
+
+        The copy runs in a worker thread so large uploads do not block the event loop.
+
+        Args:
+            source: File object positioned at the start of the content
+            mime_type: MIME type to record for the blob
+
+        Returns:
+            Tuple of (blob id, size in bytes, whether an identical blob already existed)
+
+        Raises:
+            BlobTooLargeError: If the content exceeds max_blob_bytes
+        """
+        writer = self.new_writer()
+        try:
+            await asyncio.to_thread(self._copy_sync, source, writer)
+        except BaseException:
+            writer.discard()
+            raise
+        return await self.commit(writer, mime_type)
+
+    async def put_bytes(self, data: bytes, mime_type: Optional[str] = None) -> Tuple[str, int, bool]:
+        """
+        Store an in-memory blob.
+
+        Args:
+            data: Blob content
+            mime_type: MIME type to record for the blob
+
+        Returns:
+            Tuple of (blob id, size in bytes, whether an identical blob already existed)
+
+        Raises:
+            BlobTooLargeError: If the content exceeds max_blob_bytes
+        """
+        return await self.put_stream(io.BytesIO(data), mime_type)
+
+    @staticmethod
+    def _copy_sync(source: BinaryIO, writer: BlobWriter) -> None:
+        while True:
+            chunk = source.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+
+    def exists(self, blob_id: str) -> bool:
+        """Check whether a blob is stored."""
+        return self.is_valid_id(blob_id) and os.path.exists(self.path(blob_id))
+
+    async def mime_type(self, blob_id: str) -> Optional[str]:
+        """
+        Get the MIME type recorded when a blob was written.
+
+        Args:
+            blob_id: SHA-256 hex digest
+
+        Returns:
+            The recorded MIME type, or None if none was recorded
+
+        Raises:
+            ValueError: If the id is malformed
+        """
+        if blob_id not in self._mime_types:
+            self._mime_types[blob_id] = await asyncio.to_thread(self._read_type_sync, self._type_path(blob_id))
+        return self._mime_types[blob_id]
+
+    @staticmethod
+    def _read_type_sync(path: str) -> Optional[str]:
+        try:
+            with open(path, "r") as type_file:
+                return type_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def touch(self, blob_id: str) -> None:
+        """Mark a blob as recently used so eviction keeps it longer."""
+        if blob_id in self._index:
+            self._index.move_to_end(blob_id)
+
+    async def read(self, blob_id: str) -> bytes:
+        """
+        Read a blob's content.
+
+        Args:
+            blob_id: SHA-256 hex digest returned by put_stream
+
+        Returns:
+            Blob bytes
+
+        Raises:
+            ValueError: If the id is malformed
+            FileNotFoundError: If no such blob is stored
+        """
+        path = self.path(blob_id)
+        data = await asyncio.to_thread(self._read_sync, path)
+        self.touch(blob_id)
+        return data
+
+    @staticmethod
+    def _read_sync(path: str) -> bytes:
+        with open(path, "rb") as blob_file:
+            data = blob_file.read()
+        # Record the use so LRU order survives a restart
+        os.utime(path)
+        return data
+
+    def _evict(self) -> None:
+        """Delete least recently used blobs until the store fits its size cap, keeping the newest one."""
+        while self.total_bytes > self.max_total_bytes and len(self._index) > 1:
+            blob_id, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            self._mime_types.pop(blob_id, None)
+            for path in (self.path(blob_id), self._type_path(blob_id)):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get upload counters and store size."""
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "entries": len(self._index),
+            "total_bytes": self.total_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            "evictions": self.evictions
+        }
+
+
+class UploadQuota:
+    """
+    Per-client upload byte budget over a fixed window.
+
+    Uploads are unauthenticated, so each client address may only store a
+    limited number of bytes per window; the store-wide size cap bounds disk use
+    across all clients.
+    """
+
+    def __init__(self, max_bytes: int, window_seconds: float):
+        """
+        Initialize the quota.
+
+        Args:
+            max_bytes: Bytes a client may upload per window
+            window_seconds: Window length
+        """
+        self.max_bytes = max_bytes
+        self.window_seconds = window_seconds
+        # client -> (window start, bytes used)
+        self._usage: Dict[str, Tuple[float, int]] = {}
+        self.rejected = 0
+
+    def _used(self, client: str) -> int:
+        started, used = self._usage.get(client, (0.0, 0))
+        if time.monotonic() - started >= self.window_seconds:
+            self._usage.pop(client, None)
+            return 0
+        return used
+
+    def check(self, client: str, size: int) -> None:
+        """
+        Ensure a client can upload size more bytes.
+
+        Raises:
+            UploadQuotaExceededError: If the upload would exceed the client's quota
+        """
+        if self._used(client) + size > self.max_bytes:
+            self.rejected += 1
+            raise UploadQuotaExceededError(f"Upload quota of {self.max_bytes} bytes per {int(self.window_seconds)}s exceeded")
+
+    def charge(self, client: str, size: int) -> None:
+        """Record bytes a client has uploaded."""
+        used = self._used(client)
+        started = self._usage[client][0] if client in self._usage else time.monotonic()
+        self._usage[client] = (started, used + size)
+        # Drop clients whose windows have ended so the table stays small
+        if len(self._usage) > 10000:
+            now = time.monotonic()
+            self._usage = {key: value for key, value in self._usage.items() if now - value[0] < self.window_seconds}
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get quota counters."""
+        return {
+            "clients": len(self._usage),
+            "rejected": self.rejected
+        }
+
+
+_blob_store: Optional[BlobStore] = None
+_image_store: Optional[BlobStore] = None
+_upload_quota: Optional[UploadQuota] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Get the process-wide attachment blob store."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(settings.attachment_store_dir, settings.attachment_max_bytes, settings.attachment_store_max_bytes)
+    return _blob_store
+
+
+def get_image_store() -> BlobStore:
+    """Get the process-wide store of generated images."""
+    global _image_store
+    if _image_store is None:
+        _image_store = BlobStore(
+            settings.generated_image_store_dir,
+            settings.attachment_max_bytes,
+            settings.generated_image_store_max_bytes
+        )
+    return _image_store
+
+
+def get_upload_quota() -> UploadQuota:
+    """Get the process-wide per-client upload quota."""
+    global _upload_quota
+    if _upload_quota is None:
+        _upload_quota = UploadQuota(settings.attachment_upload_quota_bytes, settings.attachment_upload_quota_window)
+    return _upload_quota
@@ -4,10 +4,15 @@ AI Chat service using Google Gemini.
 
 import asyncio
 import logging
-import base64
-from typing import Dict, Any, AsyncGenerator, List, Optional
+import hashlib
+import mimetypes
+import time
+from contextlib import aclosing
+from typing import Dict, Any, AsyncGenerator, List, Optional, Union
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from pydantic import BaseModel
 from config.settings import get_settings
 from models.websocket import (
     ChatResponseChunk, 
@@ -15,10 +20,80 @@ from models.websocket import (
     ErrorMessage,
     MessageAttachment
 )
+from services.session_store import ChatSession, SessionStore
+from services.history_window import TokenEstimator, select_history
+from services.response_cache import ResponseCache
+from services.single_flight import SingleFlight
+from services.model_scheduler import ModelScheduler, LaneScheduler
+from services.intent_router import ImageIntentClassifier
+from services.model_router import ModelRouter, ModelRoute
+from services.context_cache import PersonaContextCache, is_cache_error
+from services.blob_store import get_blob_store, get_image_store, get_upload_quota
+from services.image_result_cache import ImageResultCache
+from services.image_preprocessor import ImagePreprocessor
+from services.reference_files import ReferenceFileCache, is_file_reference_error
+from services.image_jobs import ImageJobManager
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Session used when a caller does not identify its conversation
+DEFAULT_SESSION_ID = "default"
+
+# Reply used when the model returns nothing usable (never cached)
+NO_RESPONSE_FALLBACK = "I'm sorry, I couldn't process your request."
+
+# History reply of an image turn until its background job records the outcome
+IMAGE_PENDING_REPLY = "Generating an image based on your request..."
+
+# Gen AI clients shared by every ChatService, keyed by API key
+_genai_clients: Dict[str, genai.Client] = {}
+_genai_transports: List[httpx.AsyncHTTPTransport] = []
+
+
+def get_genai_client(api_key: str) -> genai.Client:
+    """
+    Get the shared Gen AI client for an API key.
+    
+    The client owns a pooled async HTTP transport, so all `client.aio` calls
+    reuse the same keep-alive connections instead of pinning a worker thread
+    per request.
+    
+    Args:
+        api_key: Gemini API key
+        
+    Returns:
+        Shared Gen AI client instance
+    """
+    client = _genai_clients.get(api_key)
+    if client is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.gemini_max_connections,
+                max_keepalive_connections=settings.gemini_max_keepalive_connections
+            )
+        )
+        client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(async_client_args={"transport": transport})
+        )
+        _genai_clients[api_key] = client
+        _genai_transports.append(transport)
+    return client
+
+
+def generated_image_url(image_id: str, mime_type: str) -> str:
+    """Build the cacheable URL a generated image is served from."""
+    return f"/api/images/{image_id}{mimetypes.guess_extension(mime_type) or ''}"
+
+
+async def close_genai_clients() -> None:
+    """Close the pooled HTTP connections held by the shared Gen AI clients."""
+    for transport in _genai_transports:
+        await transport.aclose()
+    _genai_transports.clear()
+    _genai_clients.clear()
+
 
 class ChatService:
     """
@@ -37,8 +112,8 @@ class ChatService:
         if not self.api_key:
             raise ValueError("Gemini API key not found in configuration")
         
-        # Initialize the Gen AI client
-        self.client = genai.Client(api_key=self.api_key)
+        # Shared Gen AI client - model calls go through its async API (self.client.aio)
+        self.client = get_genai_client(self.api_key)
         
         # System instruction for the AI persona with tool awareness
         self.system_instruction = """You are Andrei's AI clone, an intelligent and helpful assistant representing Andrei Clodius. 
@@ -90,36 +165,183 @@ class ChatService:
             ]
         )
         
-        # Chat history storage - in production, this would be persisted
-        self.chat_history: List[Dict[str, str]] = []
+        # Per-session history and image context, bounded by a global memory budget
+        self.sessions = SessionStore(
+            max_sessions=settings.chat_session_max_count,
+            memory_budget_bytes=settings.chat_session_memory_budget_bytes,
+            idle_timeout=settings.chat_session_idle_timeout
+        )
+        
+        # Local token estimator, calibrated against usage_metadata from real calls
+        self.token_estimator = TokenEstimator()
+        
+        # Exact-match cache for repeated text-only questions
+        self.response_cache = ResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl=settings.response_cache_ttl
+        )
+        
+        # Identical concurrent turns share one upstream generation
+        self.single_flight = SingleFlight()
+        
+        # Per-model admission control, rate limiting and 429/503 backoff
+        self.scheduler = ModelScheduler(
+            max_retries=settings.model_retry_max_attempts,
+            base_delay=settings.model_retry_base_delay,
+            max_delay=settings.model_retry_max_delay
+        )
+        self.scheduler.register(
+            settings.gemini_model,
+            max_concurrency=settings.chat_model_max_concurrency,
+            requests_per_minute=settings.chat_model_requests_per_minute,
+            max_queue=settings.model_queue_max_size,
+            queue_timeout=settings.model_queue_timeout
+        )
+        self.scheduler.register(
+            settings.gemini_image_model,
+            max_concurrency=settings.image_model_max_concurrency,
+            requests_per_minute=settings.image_model_requests_per_minute,
+            max_queue=settings.model_queue_max_size,
+            queue_timeout=settings.model_queue_timeout
+        )
+        
+        # Local classifier that sends unambiguous image requests straight to the image tool
+        self.intent_router = ImageIntentClassifier(max_length=settings.intent_preroute_max_length)
+        
+        # Short, simple turns go to the lightweight model; complex ones to the full model
+        self.model_router = ModelRouter(
+            light_model=settings.gemini_light_model,
+            full_model=settings.gemini_model,
+            light_max_chars=settings.light_route_max_chars,
+            light_max_depth=settings.light_route_max_depth,
+            enabled=settings.model_routing_enabled
+        )
+        if settings.gemini_light_model != settings.gemini_model:
+            self.scheduler.register(
+                settings.gemini_light_model,
+                max_concurrency=settings.chat_model_max_concurrency,
+                requests_per_minute=settings.chat_model_requests_per_minute,
+                max_queue=settings.model_queue_max_size,
+                queue_timeout=settings.model_queue_timeout
+            )
+        
+        # Separate worker lanes so slow image jobs cannot starve text replies
+        self.lanes = LaneScheduler()
+        self.lanes.add_lane(
+            "text",
+            workers=settings.text_lane_workers,
+            max_per_session=settings.text_lane_max_per_session,
+            queue_timeout=settings.lane_queue_timeout
+        )
+        self.lanes.add_lane(
+            "image",
+            workers=settings.image_lane_workers,
+            max_per_session=settings.image_lane_max_per_session,
+            queue_timeout=settings.lane_queue_timeout
+        )
+        
+        # Server-side cache of the static persona prefix and tool declarations
+        self.context_cache = PersonaContextCache(
+            client=self.client,
+            system_instruction=self.system_instruction,
+            tools=[self.image_generation_tool],
+            ttl_seconds=settings.context_cache_ttl,
+            refresh_margin=settings.context_cache_refresh_margin,
+            retry_after=settings.context_cache_retry_after,
+            enabled=settings.context_cache_enabled,
+            min_tokens=settings.context_cache_min_tokens,
+            token_estimator=self.token_estimator
+        )
+        logger.info(
+            f"Persona context cache mode: {self.context_cache.mode()} "
+            f"(~{self.context_cache.prefix_tokens()} prefix tokens, minimum {settings.context_cache_min_tokens})"
+        )
+        
+        # Uploaded attachments referenced by blob id
+        self.blob_store = get_blob_store()
+        
+        # Decodes, validates and downscales uploaded images in worker processes
+        self.image_preprocessor = ImagePreprocessor(
+            max_workers=settings.image_preprocess_workers,
+            max_dimension=settings.image_max_dimension,
+            jpeg_quality=settings.image_jpeg_quality,
+            enabled=settings.image_preprocess_enabled
+        )
+        
+        # Files API uploads of reference images, reused across edit turns
+        self.reference_files = ReferenceFileCache(
+            client=self.client,
+            ttl_seconds=settings.reference_file_ttl,
+            min_bytes=settings.reference_file_min_bytes,
+            max_entries=settings.reference_file_max_entries,
+            enabled=settings.reference_file_upload_enabled
+        )
+        
+        # Background image renders, reported to the session's connections
+        self.image_jobs = ImageJobManager(retention_seconds=settings.image_job_retention)
+        
+        # Generated images, stored once as raw bytes and served by URL
+        self.image_store = get_image_store()
         
-        # Context tracking for smart image generation
-        self.last_generated_image: Optional[str] = None  # Store last generated image as base64
-        self.last_generation_prompt: Optional[str] = None  # Store the prompt that created it
-        self.last_message_was_generation: bool = False  # Track if last response included image generation
+        # Disk-backed cache of renders for repeated prompts and reference images
+        self.image_result_cache = ImageResultCache(
+            root_dir=settings.image_result_cache_dir,
+            max_bytes=settings.image_result_cache_max_bytes,
+            enabled=settings.image_result_cache_enabled
+        )
         
         logger.info("ChatService initialized successfully")
     
-    async def _generate_response_with_tools(self, message: str, attachments: List[MessageAttachment]) -> str:
+    async def _load_attachments(self, attachments: List[MessageAttachment]) -> None:
         """
-        Generate AI response with function calling capability.
+        Load attachment content and preprocess images before they are sent to the model.
+        
+        Blob references are read from the blob store. Images (uploaded or inline
+        base64) are decoded, validated, stripped of metadata and downscaled in
+        the preprocessing pool, off the event loop.
+        
+        Args:
+            attachments: File attachments
+            
+        Raises:
+            ValueError: If a referenced blob does not exist or an image is invalid
+        """
+        for attachment in attachments:
+            source = attachment.data
+            if attachment.blob_id and not attachment.data:
+                try:
+                    source = await self.blob_store.read(attachment.blob_id)
+                except FileNotFoundError:
+                    raise ValueError(f"Attachment {attachment.name} was not found, please upload it again")
+            
+            if not attachment.mime_type.startswith('image/'):
+                if isinstance(source, bytes):
+                    attachment.set_content(source)
+                continue
+            
+            try:
+                content, mime_type = await self.image_preprocessor.process(source, attachment.mime_type)
+            except ValueError as e:
+                raise ValueError(f"Attachment {attachment.name} is not a supported image: {str(e)}")
+            attachment.set_content(content)
+            attachment.mime_type = mime_type
+    
+    def _build_tool_contents(self, session: ChatSession, message: str, attachments: List[MessageAttachment]) -> List[Any]:
+        """
+        Build the conversation contents for a function-calling request.
         
         Args:
+            session: Chat session providing the conversation history
             message: User's message
             attachments: File attachments
             
         Returns:
-            AI response text
+            List of content parts (text and images)
         """
-        # Build conversation content
         contents = []
         
-        # Add conversation history for context
-        for entry in self.chat_history[-5:]:  # Last 5 exchanges for context
-            if entry.get("user"):
-                contents.append(f"Human: {entry['user']}")
-            if entry.get("assistant"):
-                contents.append(f"Assistant: {entry['assistant']}")
+        # Add token-budgeted conversation history for context
+        contents.extend(self._build_history_contents(session, user_label="Human"))
         
         # Add current user message
         current_content = [f"User: {message}"]
@@ -129,8 +351,8 @@ class ChatService:
             for attachment in attachments:
                 if attachment.mime_type.startswith('image/'):
                     try:
-                        # Decode base64 image data
-                        image_bytes = base64.b64decode(attachment.data)
+                        # Raw image bytes (loaded from the blob store or decoded from base64)
+                        image_bytes = attachment.get_content()
                         
                         # Create image part using Gemini types
                         image_part = types.Part.from_bytes(
@@ -147,20 +369,208 @@ class ChatService:
         if current_content:
             contents.extend(current_content)
         
-        logger.info(f"Sending to Gemini with tools enabled")
+        return contents
+    
+    def _build_history_contents(self, session: ChatSession, user_label: str = "User") -> List[str]:
+        """
+        Build the history part of a prompt within the configured token budget.
         
-        # Generate response using function calling
-        response = await asyncio.to_thread(
-            self.client.models.generate_content,
-            model=settings.gemini_model,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                system_instruction=self.system_instruction,
-                tools=[self.image_generation_tool],  # Enable image generation tool
+        Args:
+            session: Chat session providing the conversation history
+            user_label: Label used for the user's turns
+            
+        Returns:
+            List of history lines, starting with the rolling summary if there is one
+        """
+        window, _ = select_history(
+            session,
+            self.token_estimator,
+            settings.chat_history_token_budget,
+            settings.chat_history_limit
+        )
+        
+        contents = []
+        if session.summary:
+            contents.append(f"Summary of earlier conversation: {session.summary}")
+        for entry in window:
+            if entry.get("user"):
+                contents.append(f"{user_label}: {entry['user']}")
+            if entry.get("assistant"):
+                contents.append(f"Assistant: {entry['assistant']}")
+        return contents
+    
+    def _preroute_image_intent(self, session: ChatSession, message: str, attachments: List[MessageAttachment]) -> Optional[Dict[str, Any]]:
+        """
+        Classify the message locally and build a generate_image call if it is an unambiguous image request.
+        
+        Args:
+            session: Chat session providing the image context
+            message: User's message
+            attachments: File attachments
+            
+        Returns:
+            Function call dictionary, or None to use the normal model routing
+        """
+        if not settings.intent_preroute_enabled:
+            return None
+        
+        has_previous_image = bool(session.last_message_was_generation and session.last_generated_image_id)
+        has_image_attachments = any(attachment.mime_type.startswith('image/') for attachment in attachments)
+        
+        args = self.intent_router.classify(message, has_previous_image, has_image_attachments)
+        if not args:
+            return None
+        
+        # Carry the original prompt so edits keep the subject of the previous image
+        if args["use_previous_image"] and session.last_generation_prompt:
+            args["prompt"] = f"{args['prompt']} (previous image: {session.last_generation_prompt})"
+        
+        return {
+            "type": "function_call",
+            "function": "generate_image",
+            "args": args
+        }
+    
+    def _choose_route(self, session: ChatSession, message: str, attachments: List[MessageAttachment]) -> ModelRoute:
+        """
+        Pick the chat model for a turn.
+        
+        Args:
+            session: Chat session providing the conversation depth
+            message: User's message
+            attachments: File attachments
+            
+        Returns:
+            Model route for the turn
+        """
+        # A rolling summary means the conversation is already deep
+        depth = len(session.chat_history) + (settings.chat_history_limit if session.summary else 0)
+        route = self.model_router.choose(message, bool(attachments), depth)
+        logger.info(f"Routing turn to {route.name} model ({route.model})")
+        return route
+    
+    def _response_cache_key(self, session: ChatSession, message: str, model: str) -> str:
+        """
+        Build the response cache key for a text-only turn.
+        
+        Args:
+            session: Chat session providing the conversation history
+            message: User's message
+            model: Model that would answer the turn
+            
+        Returns:
+            Cache key covering the message, visible history and persona
+        """
+        return ResponseCache.make_key(
+            message,
+            self._build_history_contents(session, user_label="Human"),
+            self.system_instruction,
+            model
+        )
+    
+    def _observe_usage(self, contents: List[Any], usage_metadata, system_instruction: str = "") -> None:
+        """
+        Check the local token estimate against the prompt token count Gemini reports.
+        
+        Only text-only prompts are used, since image tokens are not proportional to length.
+        
+        Args:
+            contents: Contents sent to the model
+            usage_metadata: Usage metadata from the model response
+            system_instruction: System instruction sent alongside the contents
+        """
+        if not usage_metadata or any(not isinstance(content, str) for content in contents):
+            return
+        prompt_chars = len(system_instruction) + sum(len(content) for content in contents)
+        self.token_estimator.observe(prompt_chars, usage_metadata.prompt_token_count)
+    
+    def _build_persona_config(self, include_tools: bool = True, cached_content: Optional[str] = None) -> types.GenerateContentConfig:
+        """
+        Build the generation config carrying the persona (and optionally the image generation tool).
+        
+        Args:
+            include_tools: Whether to enable the image generation tool
+            cached_content: Cached-content entry holding the persona and tools; when
+                given they are referenced instead of being sent inline
+            
+        Returns:
+            Generation config for the request
+        """
+        if cached_content:
+            return types.GenerateContentConfig(
+                cached_content=cached_content,
                 temperature=0.7,
                 max_output_tokens=2048
             )
+        return types.GenerateContentConfig(
+            system_instruction=self.system_instruction,
+            tools=[self.image_generation_tool] if include_tools else None,  # Enable image generation tool
+            temperature=0.7,
+            max_output_tokens=2048
         )
+    
+    async def _generate_with_persona(self, model: str, contents: List[Any], include_tools: bool = True):
+        """
+        Generate content with the persona prefix, referencing the context cache when available.
+        
+        If the cached entry has expired or been deleted upstream, it is dropped and
+        the request is retried once with the persona sent inline.
+        
+        Args:
+            model: Model to call
+            contents: Request contents
+            include_tools: Whether to enable the image generation tool
+            
+        Returns:
+            Model response
+        """
+        cached_content = await self.context_cache.get(model, include_tools)
+        try:
+            return await self.scheduler.call(
+                model,
+                lambda: self.client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=self._build_persona_config(include_tools, cached_content)
+                )
+            )
+        except errors.APIError as e:
+            if not cached_content or not is_cache_error(e):
+                raise
+            logger.warning(f"Context cache {cached_content} rejected, retrying inline: {str(e)}")
+            self.context_cache.invalidate(model, include_tools)
+            return await self.scheduler.call(
+                model,
+                lambda: self.client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=self._build_persona_config(include_tools)
+                )
+            )
+    
+    async def _generate_response_with_tools(self, session: ChatSession, message: str, attachments: List[MessageAttachment], route: Optional[ModelRoute] = None) -> str:
+        """
+        Generate AI response with function calling capability.
+        
+        Args:
+            session: Chat session providing the conversation history
+            message: User's message
+            attachments: File attachments
+            route: Model route for the turn (defaults to the full model)
+            
+        Returns:
+            AI response text
+        """
+        route = route or self.model_router.full
+        contents = self._build_tool_contents(session, message, attachments)
+        
+        logger.info(f"Sending to Gemini with tools enabled")
+        
+        # Generate response using function calling
+        started = time.monotonic()
+        response = await self._generate_with_persona(route.model, contents)
+        route.record(time.monotonic() - started, response.usage_metadata)
+        self._observe_usage(contents, response.usage_metadata, self.system_instruction)
         
         # Handle function calls
         if hasattr(response, 'candidates') and response.candidates:
@@ -184,23 +594,148 @@ class ChatService:
                 if text_parts:
                     return ' '.join(text_parts)
         
-        return "I'm sorry, I couldn't process your request."
+        return NO_RESPONSE_FALLBACK
     
-    async def _handle_image_generation_tool(self, args, message_id: str, user_attachments: List[MessageAttachment] = None) -> AsyncGenerator[Dict[str, Any], None]:
-        """Handle the image generation tool call and stream responses."""
+    async def _stream_model_events(self, session: ChatSession, message: str, attachments: List[MessageAttachment], route: Optional[ModelRoute] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream raw model output for a function-calling request.
+        
+        Args:
+            session: Chat session providing the conversation history
+            message: User's message
+            attachments: File attachments
+            route: Model route for the turn (defaults to the full model)
+            
+        Yields:
+            {"type": "text", "text": ...} deltas as they arrive, or a single
+            function call dictionary after which the stream stops
+        """
+        route = route or self.model_router.full
+        contents = self._build_tool_contents(session, message, attachments)
+        
+        logger.info(f"Streaming from Gemini with tools enabled")
+        
+        started = time.monotonic()
+        cached_content = await self.context_cache.get(route.model)
+        usage_metadata = None
+        received = False
+        
+        while True:
+            config = self._build_persona_config(cached_content=cached_content)
+            stream = self.scheduler.stream(
+                route.model,
+                lambda: self.client.aio.models.generate_content_stream(
+                    model=route.model,
+                    contents=contents,
+                    config=config
+                )
+            )
+            
+            try:
+                async with aclosing(stream):
+                    async for response in stream:
+                        received = True
+                        # Usage metadata arrives with the final chunk
+                        usage_metadata = response.usage_metadata or usage_metadata
+                        
+                        if not response.candidates or not response.candidates[0].content:
+                            continue
+                        
+                        for part in response.candidates[0].content.parts or []:
+                            if part.function_call and part.function_call.name == "generate_image":
+                                route.record(time.monotonic() - started, usage_metadata)
+                                yield {
+                                    "type": "function_call",
+                                    "function": "generate_image",
+                                    "args": part.function_call.args
+                                }
+                                return
+                            
+                            if part.text and not part.thought:
+                                yield {"type": "text", "text": part.text}
+                break
+            except errors.APIError as e:
+                # An expired cache entry fails before the first chunk - retry once inline
+                if received or not cached_content or not is_cache_error(e):
+                    raise
+                logger.warning(f"Context cache {cached_content} rejected, retrying inline: {str(e)}")
+                self.context_cache.invalidate(route.model)
+                cached_content = None
+        
+        route.record(time.monotonic() - started, usage_metadata)
+        self._observe_usage(contents, usage_metadata, self.system_instruction)
+    
+    async def _stream_response_with_tools(self, session: ChatSession, message: str, message_id: str, attachments: List[MessageAttachment], flight_key: Optional[str] = None, route: Optional[ModelRoute] = None) -> AsyncGenerator[Union[ChatResponseChunk, Dict[str, Any]], None]:
+        """
+        Stream AI response tokens as Gemini produces them, with function calling capability.
+        
+        Text deltas are forwarded as content chunks. The last chunk is held back
+        until the stream ends so it can be marked as final. If the model emits a
+        generate_image function call mid-stream, any pending text is flushed and a
+        single function call event is yielded instead of further chunks.
+        
+        When a flight key is given, concurrent turns with the same key share one
+        upstream generation and each receives its own copy of the chunks.
+        
+        Args:
+            session: Chat session providing the conversation history
+            message: User's message
+            message_id: Message identifier
+            attachments: File attachments
+            flight_key: Optional key for coalescing identical in-flight requests
+            route: Model route for the turn (defaults to the full model)
+            
+        Yields:
+            ChatResponseChunk models, or a function call dictionary as the last item
+        """
+        if flight_key:
+            events = self.single_flight.stream(
+                flight_key,
+                lambda: self._stream_model_events(session, message, attachments, route)
+            )
+        else:
+            events = self._stream_model_events(session, message, attachments, route)
+        
+        pending_text: Optional[str] = None
+        
+        async with aclosing(events):
+            async for event in events:
+                if event["type"] == "function_call":
+                    if pending_text is not None:
+                        yield ChatResponseChunk(
+                            content=pending_text,
+                            message_id=message_id,
+                            is_final=False,
+                            timestamp=asyncio.get_event_loop().time()
+                        )
+                    yield event
+                    return
+                
+                if pending_text is not None:
+                    yield ChatResponseChunk(
+                        content=pending_text,
+                        message_id=message_id,
+                        is_final=False,
+                        timestamp=asyncio.get_event_loop().time()
+                    )
+                pending_text = event["text"]
+        
+        if pending_text is not None:
+            yield ChatResponseChunk(
+                content=pending_text,
+                message_id=message_id,
+                is_final=True,
+                timestamp=asyncio.get_event_loop().time()
+            )
+    
+    async def _handle_image_generation_tool(self, session: ChatSession, message: str, args, message_id: str, user_attachments: List[MessageAttachment] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """Handle the image generation tool call by starting a background image job."""
         logger.info(f"Handling image generation tool with args: {args}")
         
         prompt = args.get("prompt", "")
         use_previous = args.get("use_previous_image", False)
         modification_type = args.get("modification_type", "new_generation")
         
-        # Send image generation loading state
-        yield {
-            "type": "image_generating",
-            "message_id": message_id,
-            "timestamp": asyncio.get_event_loop().time()
-        }
-        
         # Prepare reference images - prioritize user uploads over previous generations
         reference_images = []
         
@@ -214,109 +749,247 @@ class ChatService:
             # Clear previous generation context when user uploads new images
             if reference_images:
                 logger.info("Clearing previous generation context - user uploaded new images")
-                self.last_generated_image = None
-                self.last_generation_prompt = None
+                session.last_generated_image_id = None
+                session.last_generated_image_mime_type = None
+                session.last_generation_prompt = None
         
         # Second priority: Use previously generated image if no user uploads and use_previous is True
-        elif use_previous and self.last_generated_image:
+        elif use_previous and session.last_generated_image_id:
             logger.info("Using previous generated image as reference via tool")
             previous_image_attachment = MessageAttachment(
-                name="previous-generated-image.png",
-                mime_type="image/png", 
-                data=self.last_generated_image,
+                name="previous-generated-image",
+                mime_type=session.last_generated_image_mime_type or "image/png",
+                blob_id=session.last_generated_image_id,
                 size=0
             )
-            reference_images = [previous_image_attachment]
+            try:
+                # Reuse the stored raw bytes directly
+                previous_image_attachment.set_content(await self.image_store.read(session.last_generated_image_id))
+                reference_images = [previous_image_attachment]
+            except FileNotFoundError:
+                logger.warning(f"Previous generated image {session.last_generated_image_id} is no longer stored")
             
         if reference_images:
             logger.info(f"Total reference images prepared: {len(reference_images)}")
         else:
             logger.info("No reference images - generating from scratch")
         
-        # Generate image
-        generated_image, text_response = await self.generate_image(prompt, reference_images)
+        # Reserve the turn's place in history now; the job fills in the outcome, so
+        # turns sent while the image renders stay after this one
+        history_entry = self._add_to_history(session, message, IMAGE_PENDING_REPLY)
+        
+        # Render in the background so the chat turn (and the connection) is not blocked
+        job = self.image_jobs.submit(
+            session.session_id,
+            message_id,
+            lambda: self._run_image_job(session, history_entry, prompt, reference_images, message_id)
+        )
+        
+        yield {
+            "type": "image_generating",
+            "job_id": job.job_id,
+            "session_id": session.session_id,
+            "message_id": message_id,
+            "timestamp": asyncio.get_event_loop().time()
+        }
+    
+    async def _run_image_job(self, session: ChatSession, history_entry: Dict[str, str], prompt: str, reference_images: List[MessageAttachment], message_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Generate an image as a background job.
+        
+        The outcome is written into the history entry reserved when the job was
+        submitted, and the session's image context is updated under the session
+        lock, so neither changes in the middle of another turn and history never
+        claims an image that was not produced. The chat turn was already
+        completed; the result is delivered as a single "image_job" event.
         
-        if generated_image:
-            # Store generated image for future context
-            self.last_generated_image = generated_image
-            self.last_generation_prompt = prompt
-            self.last_message_was_generation = True
+        Args:
+            session: Chat session that requested the image
+            history_entry: History entry reserved for the requesting turn
+            prompt: Text description for image generation
+            reference_images: Prepared reference images
+            message_id: Chat message that requested the image
             
-            # Send image response
+        Yields:
+            Job status and result events for the session's connections
+        """
+        try:
+            # Generate image in the image lane, fair-shared across sessions
+            error = None
+            async with self.lanes.slot("image", session.session_id):
+                yield {"type": "image_job_status", "status": "running"}
+                try:
+                    image_bytes, image_mime_type, text_response = await self.generate_image(prompt, reference_images)
+                except Exception as e:
+                    image_bytes, image_mime_type, text_response = None, None, None
+                    error = f"Image generation failed: {str(e)}"
+            
+            if not image_bytes:
+                # The model may explain why it produced no image; that is its reply, not an error message
+                error = error or "Image generation failed with no image in the response"
+                async with session.lock:
+                    session.last_message_was_generation = False
+                    self._fill_history_entry(session, history_entry, text_response or f"Tried to generate an image, but it failed. {error}")
+                
+                yield {
+                    "type": "image_job",
+                    "status": "failed",
+                    "error": error,
+                    "text": text_response,
+                    "message_id": message_id,
+                    "timestamp": asyncio.get_event_loop().time()
+                }
+                yield {"type": "image_job_status", "status": "failed", "error": error}
+                logger.error(f"Image job for message {message_id} failed: {error}")
+                return
+            
+            # Store the raw image once; clients fetch it by URL
+            image_id, image_size, _ = await self.image_store.put_bytes(image_bytes, image_mime_type)
+            
+            # Store generated image for future context, between turns of the session
+            async with session.lock:
+                session.last_generated_image_id = image_id
+                session.last_generated_image_mime_type = image_mime_type
+                session.last_generation_prompt = prompt
+                session.last_message_was_generation = True
+                self._fill_history_entry(session, history_entry, "Generated an image based on your request.")
+            
+            # Send the image, with any text the model returned alongside it
             yield {
-                "type": "image_generated",
-                "image_data": generated_image,
-                "mime_type": "image/png",
+                "type": "image_job",
+                "status": "done",
+                "image_id": image_id,
+                "image_url": generated_image_url(image_id, image_mime_type),
+                "mime_type": image_mime_type,
+                "size": image_size,
+                "text": text_response,
                 "message_id": message_id,
                 "timestamp": asyncio.get_event_loop().time()
             }
             
             logger.info("Image generated successfully via tool call")
-            
-            # If there's also a text response, stream it
-            if text_response:
-                async for chunk in self._stream_response(text_response, message_id):
-                    yield chunk
-        else:
-            # No image generated, but check if we have a text response to stream
-            if text_response:
-                logger.info("Image generation failed, but streaming text response from model")
-                async for chunk in self._stream_response(text_response, message_id):
-                    yield chunk
-            else:
-                # Send generic error response
-                yield {
-                    "type": "image_generation_failed",
-                    "error": "Image generation failed with no response",
-                    "message_id": message_id,
-                    "timestamp": asyncio.get_event_loop().time()
-                }
-                logger.error("Image generation failed via tool call with no response")
+        finally:
+            # Cancelled (or closed) before an outcome was recorded
+            if history_entry.get("assistant") == IMAGE_PENDING_REPLY:
+                self._fill_history_entry(session, history_entry, "Started generating an image, but it was cancelled.")
     
-    async def send_message_stream(self, message: str, message_id: str, attachments: List[MessageAttachment] = None) -> AsyncGenerator[Dict[str, Any], None]:
+    def _fill_history_entry(self, session: ChatSession, entry: Dict[str, str], ai_response: str) -> None:
+        """
+        Record the reply of a turn whose history entry was reserved earlier.
+        
+        Args:
+            session: Chat session the entry belongs to
+            entry: Entry returned by _add_to_history (it may since have been summarized)
+            ai_response: AI's response
+        """
+        entry["assistant"] = ai_response
+        self.sessions.update_size(session)
+
+    async def send_message_stream(self, message: str, message_id: str, attachments: List[MessageAttachment] = None, session_id: str = DEFAULT_SESSION_ID) -> AsyncGenerator[Union[BaseModel, Dict[str, Any]], None]:
         """
         Process a message and stream the AI response.
         
+        Turns within the same session are serialized, so concurrent messages
+        cannot interleave on one conversation history.
+        
+        Args:
+            message: User's message
+            message_id: Unique identifier for this message
+            attachments: File attachments
+            session_id: Conversation session identifier
+            
+        Yields:
+            ChatResponseChunk and ChatComplete models, or event dictionaries
+            (image job status, errors)
+        """
+        async with self.sessions.session_turn(session_id) as session:
+            async for chunk in self._process_message_stream(session, message, message_id, attachments):
+                yield chunk
+    
+    async def _process_message_stream(self, session: ChatSession, message: str, message_id: str, attachments: List[MessageAttachment] = None) -> AsyncGenerator[Union[BaseModel, Dict[str, Any]], None]:
+        """
+        Generate and stream the AI response for one turn of a session.
+        
         Args:
+            session: Chat session for this turn
             message: User's message
             message_id: Unique identifier for this message
+            attachments: File attachments
             
         Yields:
-            Dict containing response chunks with type and content
+            ChatResponseChunk and ChatComplete models, or event dictionaries
+            (image job status, errors)
         """
         try:
             logger.info(f"Processing streaming message with function calling: {message[:100]}...")
             
-            # Generate AI response with function calling capability
-            ai_response = await self._generate_response_with_tools(message, attachments or [])
+            streamed_content: List[str] = []
+            await self._load_attachments(attachments or [])
+            
+            # Unambiguous image requests skip the tool-routing round trip
+            prerouted_call = self._preroute_image_intent(session, message, attachments or [])
+            route = self._choose_route(session, message, attachments or [])
+            
+            # Text-only turns can be answered from the response cache or share an in-flight generation
+            cache_key = None
+            cached_response = None
+            if not prerouted_call and (settings.response_cache_enabled or settings.single_flight_enabled) and not attachments:
+                cache_key = self._response_cache_key(session, message, route.model)
+                if settings.response_cache_enabled:
+                    cached_response = self.response_cache.get(cache_key)
+            
+            if prerouted_call:
+                ai_response = prerouted_call
+            elif cached_response is not None:
+                logger.info(f"Response cache hit for message {message_id}")
+                ai_response = cached_response
+            elif settings.chat_streaming_enabled:
+                # Forward tokens as they arrive; a function call ends the text stream
+                ai_response = None
+                flight_key = cache_key if settings.single_flight_enabled else None
+                async with self.lanes.slot("text", session.session_id):
+                    async with aclosing(self._stream_response_with_tools(session, message, message_id, attachments or [], flight_key, route)) as events:
+                        async for event in events:
+                            if isinstance(event, dict):
+                                ai_response = event
+                                break
+                            streamed_content.append(event.content)
+                            yield event
+                
+                if ai_response is None:
+                    ai_response = "".join(streamed_content) or NO_RESPONSE_FALLBACK
+            else:
+                # Generate AI response with function calling capability
+                async with self.lanes.slot("text", session.session_id):
+                    ai_response = await self._generate_response_with_tools(session, message, attachments or [], route)
             
             # Check if AI decided to use image generation tool
             if isinstance(ai_response, dict) and ai_response.get("type") == "function_call":
                 if ai_response.get("function") == "generate_image":
                     # Handle image generation via tool, passing user attachments
-                    async for chunk in self._handle_image_generation_tool(ai_response["args"], message_id, attachments):
+                    async for chunk in self._handle_image_generation_tool(session, message, ai_response["args"], message_id, attachments):
                         yield chunk
                     
-                    # Send completion signal
+                    # Send completion signal - the image itself arrives from the background job
                     completion = ChatComplete(
                         message_id=message_id,
-                        full_content="Image generated successfully",
+                        full_content="Generating your image...",
                         timestamp=asyncio.get_event_loop().time()
                     )
-                    yield completion.dict()
+                    yield completion
                     
-                    # Add to chat history
-                    self._add_to_history(message, "Generated an image based on your request.")
+                    # The background job fills in the turn's reserved history entry once the render succeeds or fails
                     return
             
             # Handle text response
             if isinstance(ai_response, str):
                 # Reset generation context for non-image messages
-                self.last_message_was_generation = False
+                session.last_message_was_generation = False
                 
-                # Stream the text response in chunks
-                async for chunk in self._stream_response(ai_response, message_id):
-                    yield chunk
+                # Stream the text response in chunks (unless it was already streamed live)
+                if not streamed_content:
+                    async for chunk in self._stream_response(ai_response, message_id):
+                        yield chunk
                     
                 # Send completion signal
                 completion = ChatComplete(
@@ -324,10 +997,14 @@ class ChatService:
                     full_content=ai_response,
                     timestamp=asyncio.get_event_loop().time()
                 )
-                yield completion.dict()
+                yield completion
+                
+                # Cache fresh model answers for identical future turns
+                if settings.response_cache_enabled and cache_key and cached_response is None and ai_response != NO_RESPONSE_FALLBACK:
+                    self.response_cache.set(cache_key, ai_response)
                 
                 # Add to chat history
-                self._add_to_history(message, ai_response)
+                self._add_to_history(session, message, ai_response)
                 return
                 
             # Fallback for unexpected response format
@@ -342,7 +1019,7 @@ class ChatService:
                 full_content=fallback_response,
                 timestamp=asyncio.get_event_loop().time()
             )
-            yield completion.dict()
+            yield completion
             
         except Exception as e:
             logger.error(f"Error processing streaming message: {str(e)}")
@@ -356,45 +1033,46 @@ class ChatService:
             logger.info(f"Message processing complete for ID: {message_id}")
     
 
-    async def send_message_simple(self, message: str) -> str:
+    async def send_message_simple(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> str:
         """
         Send a message and get the complete response (non-streaming).
         
         Args:
             message: User's message
+            session_id: Conversation session identifier
             
         Returns:
             Complete AI response string
         """
         try:
-            response = await self._generate_response(message)
-            self._add_to_history(message, response)
-            return response
+            async with self.sessions.session_turn(session_id) as session:
+                route = self._choose_route(session, message, [])
+                response = await self._generate_response(session, message, route=route)
+                self._add_to_history(session, message, response)
+                return response
         except Exception as e:
             logger.error(f"Error in simple message: {str(e)}")
             return f"Sorry, I encountered an error: {str(e)}"
     
-    async def _generate_response(self, message: str, attachments: List[MessageAttachment] = None) -> str:
+    async def _generate_response(self, session: ChatSession, message: str, attachments: List[MessageAttachment] = None, route: Optional[ModelRoute] = None) -> str:
         """
         Generate AI response using Gemini.
         
         Args:
+            session: Chat session providing the conversation history
             message: User's message
+            attachments: File attachments
+            route: Model route for the turn (defaults to the full model)
             
         Returns:
             AI response string
         """
         # Prepare conversation context for multimodal input
+        # (the persona is sent as a system instruction, cached server-side when possible)
         contents = []
         
-        # Add system instruction as first content
-        contents.append(self.system_instruction)
-        
-        # Add recent chat history for context
-        recent_history = self.chat_history[-settings.chat_history_limit:]
-        for hist_msg in recent_history:
-            contents.append(f"User: {hist_msg['user']}")
-            contents.append(f"Assistant: {hist_msg['assistant']}")
+        # Add token-budgeted chat history for context
+        contents.extend(self._build_history_contents(session))
         
         # Build current message content (multimodal)
         current_content = []
@@ -409,8 +1087,8 @@ class ChatService:
                 # Only process image attachments for now
                 if attachment.mime_type.startswith('image/'):
                     try:
-                        # Decode base64 image data
-                        image_bytes = base64.b64decode(attachment.data)
+                        # Raw image bytes (loaded from the blob store or decoded from base64)
+                        image_bytes = attachment.get_content()
                         
                         # Create image part using Gemini types
                         image_part = types.Part.from_bytes(
@@ -439,15 +1117,45 @@ class ChatService:
         logger.info(f"Content types: {[type(content).__name__ for content in contents]}")
         
         # Generate response using the client
-        response = await asyncio.to_thread(
-            self.client.models.generate_content,
-            model=settings.gemini_model,
-            contents=contents
-        )
+        route = route or self.model_router.full
+        started = time.monotonic()
+        response = await self._generate_with_persona(route.model, contents, include_tools=False)
+        route.record(time.monotonic() - started, response.usage_metadata)
+        self._observe_usage(contents, response.usage_metadata, self.system_instruction)
         
         return response.text
     
-    async def generate_image(self, prompt: str, reference_images: List[MessageAttachment] = None) -> tuple[Optional[str], Optional[str]]:
+    @staticmethod
+    def _content_hash(attachment: MessageAttachment) -> str:
+        """Get the SHA-256 digest identifying an attachment's content."""
+        # Blob ids are already SHA-256 digests of the content
+        return attachment.blob_id or hashlib.sha256(attachment.get_content()).hexdigest()
+    
+    async def _build_reference_parts(self, reference_images: List[MessageAttachment], use_files: bool = True) -> List[types.Part]:
+        """
+        Build model parts for reference images.
+        
+        Args:
+            reference_images: Reference images for context
+            use_files: Reference images uploaded through the Files API instead of inlining them
+            
+        Returns:
+            One part per usable reference image
+        """
+        parts = []
+        for img in reference_images:
+            try:
+                if use_files:
+                    image_part = await self.reference_files.get_part(img.get_content(), img.mime_type, self._content_hash(img))
+                else:
+                    image_part = types.Part.from_bytes(data=img.get_content(), mime_type=img.mime_type)
+                parts.append(image_part)
+                logger.info(f"Added reference image: {img.name}")
+            except Exception as e:
+                logger.error(f"Error processing reference image {img.name}: {str(e)}")
+        return parts
+    
+    async def generate_image(self, prompt: str, reference_images: List[MessageAttachment] = None) -> tuple[Optional[bytes], Optional[str], Optional[str]]:
         """
         Generate an image using Gemini's image generation model.
         
@@ -456,7 +1164,10 @@ class ChatService:
             reference_images: Optional reference images for context
             
         Returns:
-            Tuple of (Base64 encoded image data, text response) - either can be None
+            Tuple of (raw image bytes, image MIME type, text response) - image and text can each be None
+            
+        Raises:
+            Exception: If the image model call fails (errors are never returned as text)
         """
         try:
             logger.info(f"Generating image with model: {settings.gemini_image_model}")
@@ -464,33 +1175,49 @@ class ChatService:
             if reference_images:
                 logger.info(f"Reference images: {len(reference_images)}")
             
-            # Build contents for multimodal generation
-            contents = []
+            reference_images = [img for img in reference_images or [] if img.mime_type.startswith('image/')]
             
-            # Add reference images first if provided
-            if reference_images:
-                for img in reference_images:
-                    if img.mime_type.startswith('image/'):
-                        try:
-                            image_bytes = base64.b64decode(img.data)
-                            image_part = types.Part.from_bytes(
-                                data=image_bytes,
-                                mime_type=img.mime_type,
-                            )
-                            contents.append(image_part)
-                            logger.info(f"Added reference image: {img.name}")
-                        except Exception as e:
-                            logger.error(f"Error processing reference image {img.name}: {str(e)}")
+            # Identical prompt and reference images - reuse the earlier render
+            result_key = ImageResultCache.make_key(
+                settings.gemini_image_model,
+                prompt,
+                [self._content_hash(img) for img in reference_images]
+            )
+            cached_result = await self.image_result_cache.get(result_key)
+            if cached_result is not None:
+                logger.info("Image result cache hit")
+                return cached_result
             
-            # Add text prompt
+            # Build contents for multimodal generation: reference images first, then the prompt
+            contents = await self._build_reference_parts(reference_images)
             contents.append(prompt)
             
             # Use image generation model
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=settings.gemini_image_model,
-                contents=contents
-            )
+            try:
+                response = await self.scheduler.call(
+                    settings.gemini_image_model,
+                    lambda: self.client.aio.models.generate_content(
+                        model=settings.gemini_image_model,
+                        contents=contents
+                    )
+                )
+            except errors.ClientError as e:
+                # Rate limits and other client errors are not about the references - retrying would repeat them
+                if not is_file_reference_error(e) or not any(part.file_data for part in contents if isinstance(part, types.Part)):
+                    raise
+                # An uploaded reference may have been deleted early - forget it and retry inline
+                logger.warning(f"Image generation with uploaded references failed, retrying inline: {str(e)}")
+                for img in reference_images:
+                    self.reference_files.invalidate(self._content_hash(img))
+                inline_contents = await self._build_reference_parts(reference_images, use_files=False)
+                inline_contents.append(prompt)
+                response = await self.scheduler.call(
+                    settings.gemini_image_model,
+                    lambda: self.client.aio.models.generate_content(
+                        model=settings.gemini_image_model,
+                        contents=inline_contents
+                    )
+                )
             
             logger.info(f"Image generation response received: {type(response)}")
             
@@ -500,6 +1227,7 @@ class ChatService:
                 logger.info(f"Candidate found with {len(candidate.content.parts)} parts")
                 
                 image_data = None
+                image_mime_type = None
                 text_response = None
                 
                 # Look for image parts and text parts in the response
@@ -507,8 +1235,9 @@ class ChatService:
                     logger.info(f"Part {i}: {type(part)} - has inline_data: {hasattr(part, 'inline_data')}")
                     if hasattr(part, 'inline_data') and part.inline_data:
                         logger.info("Found inline image data!")
-                        # Store base64 encoded image data
-                        image_data = base64.b64encode(part.inline_data.data).decode('utf-8')
+                        # Keep the raw image bytes
+                        image_data = part.inline_data.data
+                        image_mime_type = part.inline_data.mime_type or "image/png"
                     elif hasattr(part, 'file_data') and part.file_data:
                         # Handle file data if available
                         logger.warning("File data response not yet implemented")
@@ -518,23 +1247,24 @@ class ChatService:
                 
                 # Return both image and text (either can be None)
                 if image_data:
-                    return (image_data, text_response)
+                    await self.image_result_cache.set(result_key, image_data, image_mime_type, text_response)
+                    return (image_data, image_mime_type, text_response)
                 elif text_response:
                     logger.warning("No image data found, but text response available")
-                    return (None, text_response)
+                    return (None, None, text_response)
             
             logger.warning("No image data found in generation response")
             if response.candidates:
                 logger.warning(f"Response text: {response.text}")
             
-            return (None, response.text if response.candidates else None)
+            return (None, None, response.text if response.candidates else None)
             
         except Exception as e:
             logger.error(f"Error generating image: {str(e)}", exc_info=True)
-            return (None, f"Error generating image: {str(e)}")
+            raise
     
 
-    async def _stream_response(self, full_response: str, message_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+    async def _stream_response(self, full_response: str, message_id: str) -> AsyncGenerator[ChatResponseChunk, None]:
         """
         Stream response content in chunks.
         
@@ -543,7 +1273,7 @@ class ChatService:
             message_id: Message identifier
             
         Yields:
-            Response chunk dictionaries
+            ChatResponseChunk models
         """
         chunk_size = settings.response_chunk_size
         
@@ -558,47 +1288,176 @@ class ChatService:
                 timestamp=asyncio.get_event_loop().time()
             )
             
-            yield chunk.dict()
+            yield chunk
             
             # Small delay to simulate real streaming
             if not is_final:
                 await asyncio.sleep(settings.stream_delay)
     
-    def _add_to_history(self, user_message: str, ai_response: str) -> None:
+    def _add_to_history(self, session: ChatSession, user_message: str, ai_response: str) -> Dict[str, str]:
         """
-        Add message pair to chat history.
+        Add message pair to a session's chat history.
         
         Args:
+            session: Chat session to update
             user_message: User's message
             ai_response: AI's response
+            
+        Returns:
+            The added entry (see _fill_history_entry)
         """
-        self.chat_history.append({
+        entry = {
             "user": user_message,
             "assistant": ai_response
-        })
+        }
+        session.chat_history.append(entry)
+        
+        # Fold turns that no longer fit the prompt window into the rolling summary.
+        # Turns are normally only removed once summarized; the hard cap below only
+        # applies when summarization is off (turns past the window are never used)
+        # or has been failing long enough for the history to pile up.
+        max_turns = settings.chat_history_max_turns if settings.chat_summary_enabled else settings.chat_history_limit
+        if len(session.chat_history) > max_turns:
+            del session.chat_history[:-max_turns]
+        
+        self._schedule_history_compaction(session)
+        return entry
+    
+    def _schedule_history_compaction(self, session: ChatSession) -> None:
+        """
+        Start a background summary once turns fall outside the history window.
+        
+        Compaction runs only when the window overflows and then folds in enough
+        turns to bring the window down to chat_summary_keep_ratio of its size, so
+        a long conversation costs one summary call every few turns rather than
+        one per turn.
+        
+        Args:
+            session: Chat session to compact
+        """
+        if not settings.chat_summary_enabled:
+            return
+        if session.summary_task and not session.summary_task.done():
+            return
+        if time.monotonic() < session.summary_retry_at:
+            return
+        
+        _, overflow = select_history(
+            session,
+            self.token_estimator,
+            settings.chat_history_token_budget,
+            settings.chat_history_limit
+        )
+        if not overflow:
+            return
+        
+        _, entries = select_history(
+            session,
+            self.token_estimator,
+            int(settings.chat_history_token_budget * settings.chat_summary_keep_ratio),
+            max(1, int(settings.chat_history_limit * settings.chat_summary_keep_ratio))
+        )
+        session.summary_task = asyncio.create_task(self._compact_history(session, entries))
+    
+    async def _compact_history(self, session: ChatSession, entries: List[Dict[str, str]]) -> None:
+        """
+        Summarize older turns into the session's rolling summary, off the request path.
+        
+        Args:
+            session: Chat session to compact
+            entries: Oldest turns to fold into the summary
+        """
+        transcript = "\n".join(
+            f"User: {entry.get('user', '')}\nAssistant: {entry.get('assistant', '')}"
+            for entry in entries
+        )
+        prompt = (
+            "Update the running summary of a conversation between a visitor and Andrei's AI clone. "
+            "Keep facts, names, preferences and open questions; drop small talk. "
+            "Reply with the summary only.\n\n"
+            f"Current summary:\n{session.summary or '(none)'}\n\n"
+            f"New turns:\n{transcript}"
+        )
         
-        # Keep history within reasonable limits
-        if len(self.chat_history) > settings.chat_history_limit * 2:
-            # Remove oldest entries, keeping twice the context limit
-            self.chat_history = self.chat_history[-settings.chat_history_limit:]
+        try:
+            response = await self.scheduler.call(
+                settings.gemini_model,
+                lambda: self.client.aio.models.generate_content(
+                    model=settings.gemini_model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=0.2,
+                        max_output_tokens=settings.chat_summary_max_tokens
+                    )
+                )
+            )
+            summary = (response.text or "").strip()
+        except Exception as e:
+            logger.warning(f"History summarization failed for session {session.session_id}: {str(e)}")
+            session.summary_retry_at = time.monotonic() + settings.chat_summary_retry_after
+            return
+        
+        if not summary:
+            return
+        
+        # Apply between turns so an in-flight prompt never sees a half-compacted history
+        async with session.lock:
+            compacted = {id(entry) for entry in entries}
+            session.chat_history = [entry for entry in session.chat_history if id(entry) not in compacted]
+            session.summary = summary
+        self.sessions.update_size(session)
+        
+        logger.info(f"Compacted {len(entries)} turns into summary for session {session.session_id}")
     
-    def reset_conversation(self) -> None:
-        """Reset the chat session to start fresh."""
-        self.chat_history = []
-        logger.info("Chat session reset")
+    def reset_conversation(self, session_id: str = DEFAULT_SESSION_ID) -> None:
+        """Reset a chat session to start fresh."""
+        session = self.sessions.get(session_id)
+        if session:
+            session.reset()
+            self.sessions.update_size(session)
+        logger.info(f"Chat session {session_id} reset")
     
-    def get_conversation_length(self) -> int:
-        """Get the number of message pairs in the conversation."""
-        return len(self.chat_history)
+    def get_conversation_length(self, session_id: str = DEFAULT_SESSION_ID) -> int:
+        """Get the number of message pairs in a session's conversation."""
+        session = self.sessions.get(session_id)
+        return len(session.chat_history) if session else 0
     
-    def get_last_messages(self, count: int = 5) -> List[Dict[str, str]]:
+    def get_last_messages(self, count: int = 5, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, str]]:
         """
-        Get the last N message pairs from the conversation.
+        Get the last N message pairs from a session's conversation.
         
         Args:
             count: Number of message pairs to return
+            session_id: Conversation session identifier
             
         Returns:
             List of message dictionaries
         """
-        return self.chat_history[-count:] if self.chat_history else []
+        session = self.sessions.get(session_id)
+        return session.chat_history[-count:] if session and session.chat_history else []
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get chat service statistics for diagnostics."""
+        return {
+            "sessions": self.sessions.get_stats(),
+            "response_cache": self.response_cache.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "models": self.scheduler.get_stats(),
+            "lanes": self.lanes.get_stats(),
+            "intent_router": self.intent_router.get_stats(),
+            "model_routing": self.model_router.get_stats(),
+            "context_cache": self.context_cache.get_stats(),
+            "attachments": self.blob_store.get_stats(),
+            "upload_quota": get_upload_quota().get_stats(),
+            "generated_images": self.image_store.get_stats(),
+            "image_result_cache": self.image_result_cache.get_stats(),
+            "image_preprocessing": self.image_preprocessor.get_stats(),
+            "reference_files": self.reference_files.get_stats(),
+            "image_jobs": self.image_jobs.get_stats()
+        }
+    
+    async def close(self) -> None:
+        """Release background jobs, server-side resources and worker processes held by the service."""
+        await self.image_jobs.shutdown()
+        await self.context_cache.close()
+        self.image_preprocessor.shutdown()
@@ -0,0 +1,81 @@
+"""
+Per-connection tracking of in-flight message handlers.
+"""
+
+import asyncio
+import logging
+from typing import Any, Coroutine, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionTasks:
+    """
+    Runs a connection's message handlers as tasks, keyed by message id.
+
+    The receive loop dispatches work here and goes straight back to reading,
+    so pings and cancellations are handled while long generations run. The
+    number of concurrent handlers per connection is capped.
+    """
+
+    def __init__(self, max_concurrent: int):
+        """
+        Initialize the task set.
+
+        Args:
+            max_concurrent: Maximum number of handlers running at once
+        """
+        self.max_concurrent = max_concurrent
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, key: str, coro: Coroutine[Any, Any, Any]) -> bool:
+        """
+        Start a handler unless the connection is at its cap.
+
+        Args:
+            key: Identifies the handler (e.g. the chat message id)
+            coro: Handler coroutine
+
+        Returns:
+            True if the handler was started; False if it was rejected (the coroutine is closed)
+        """
+        if len(self._tasks) >= self.max_concurrent or key in self._tasks:
+            coro.close()
+            return False
+
+        task = asyncio.create_task(coro)
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return True
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Message handler {key} failed: {str(task.exception())}")
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancel an in-flight handler.
+
+        Args:
+            key: Handler key passed to start
+
+        Returns:
+            True if a running handler was cancelled
+        """
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def cancel_all(self) -> None:
+        """Cancel every in-flight handler and wait for them to finish."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,227 @@
+"""
+Server-side context caching for the static persona prefix.
+"""
+
+import asyncio
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from google import genai
+from google.genai import errors, types
+from services.history_window import TokenEstimator
+
+logger = logging.getLogger(__name__)
+
+
+def is_cache_error(error: Exception) -> bool:
+    """Check whether an upstream error means the referenced cached content is gone or unusable."""
+    return (
+        isinstance(error, errors.ClientError)
+        and error.code in (400, 403, 404)
+        and "cache" in str(error).lower()
+    )
+
+
+class _CacheEntry:
+    """A created cached-content resource and its expiry."""
+
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class PersonaContextCache:
+    """
+    Keeps Gemini cached-content entries for the persona system instruction and tools.
+
+    One entry is kept per (model, with tools) pair. Entries are created on first
+    use, have their TTL extended when they get close to expiry, and are recreated
+    once expired. A prefix estimated below the model's minimum cacheable size
+    is never sent to the caches API. If creation fails anyway, callers get None
+    and send the prefix inline until a cooldown has passed.
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        system_instruction: str,
+        tools: List[types.Tool],
+        ttl_seconds: int,
+        refresh_margin: float,
+        retry_after: float,
+        enabled: bool = True,
+        min_tokens: int = 0,
+        token_estimator: Optional[TokenEstimator] = None
+    ):
+        """
+        Initialize the context cache.
+
+        Args:
+            client: Gen AI client
+            system_instruction: Persona system instruction to cache
+            tools: Tool declarations to cache alongside the instruction
+            ttl_seconds: Lifetime of each cached-content entry
+            refresh_margin: Extend the TTL once an entry is this close to expiry (seconds)
+            retry_after: Seconds to wait before retrying after a failed creation
+            enabled: When False, callers always send the prefix inline
+            min_tokens: Smallest prefix the model will cache (0 skips the check)
+            token_estimator: Estimates the prefix size (defaults to a fresh TokenEstimator)
+        """
+        self.client = client
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.token_estimator = token_estimator or TokenEstimator()
+
+        self._entries: Dict[Tuple[str, bool], _CacheEntry] = {}
+        self._locks: Dict[Tuple[str, bool], asyncio.Lock] = {}
+        self._disabled_until: Dict[Tuple[str, bool], float] = {}
+        self._too_small: Dict[bool, bool] = {}  # include_tools -> prefix below min_tokens
+
+        self.created = 0
+        self.refreshed = 0
+        self.fallbacks = 0
+
+    async def get(self, model: str, include_tools: bool = True) -> Optional[str]:
+        """
+        Get the cached-content name for a model, creating or refreshing it as needed.
+
+        Args:
+            model: Model the cache is used with
+            include_tools: Whether the cached prefix includes the tool declarations
+
+        Returns:
+            Cached-content resource name, or None to send the prefix inline
+        """
+        if not self.enabled or self._below_minimum(include_tools):
+            return None
+
+        key = (model, include_tools)
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry and entry.expires_at - self.refresh_margin > now:
+            return entry.name
+
+        if self._disabled_until.get(key, 0) > now:
+            self.fallbacks += 1
+            return None
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another request may have created or refreshed it while we waited
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry and entry.expires_at - self.refresh_margin > now:
+                return entry.name
+
+            try:
+                if entry and entry.expires_at > now:
+                    entry = await self._refresh(entry)
+                else:
+                    entry = await self._create(model, include_tools)
+            except Exception as e:
+                logger.warning(f"Context cache unavailable for {model}, sending persona inline: {str(e)}")
+                self._entries.pop(key, None)
+                self._disabled_until[key] = now + self.retry_after
+                self.fallbacks += 1
+                return None
+
+            self._entries[key] = entry
+            return entry.name
+
+    def prefix_tokens(self, include_tools: bool = True) -> int:
+        """Estimate the token count of the cached prefix."""
+        text = self.system_instruction
+        if include_tools:
+            text += "".join(tool.model_dump_json(exclude_none=True) for tool in self.tools)
+        return self.token_estimator.estimate(text)
+
+    def mode(self) -> str:
+        """
+        Describe how the persona prefix is sent.
+
+        Returns:
+            "disabled" when turned off in settings, "below_minimum" when the prefix
+            is too small for the model to cache (sent inline), "explicit" otherwise
+        """
+        if not self.enabled:
+            return "disabled"
+        if self._below_minimum(True):
+            return "below_minimum"
+        return "explicit"
+
+    def _below_minimum(self, include_tools: bool) -> bool:
+        """Check (once per prefix) whether the prefix is too small to cache, logging it the first time."""
+        too_small = self._too_small.get(include_tools)
+        if too_small is None:
+            tokens = self.prefix_tokens(include_tools)
+            too_small = tokens < self.min_tokens
+            self._too_small[include_tools] = too_small
+            if too_small:
+                logger.info(
+                    f"Persona prefix ({'with' if include_tools else 'without'} tools, ~{tokens} tokens) is below "
+                    f"the {self.min_tokens}-token caching minimum; sending it inline"
+                )
+        return too_small
+
+    async def _create(self, model: str, include_tools: bool) -> _CacheEntry:
+        """Create a new cached-content entry."""
+        cached = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"persona-{'tools' if include_tools else 'plain'}",
+                system_instruction=self.system_instruction,
+                tools=self.tools if include_tools else None,
+                ttl=f"{self.ttl_seconds}s"
+            )
+        )
+        self.created += 1
+        logger.info(f"Created context cache {cached.name} for {model}")
+        return _CacheEntry(cached.name, self._expiry(cached))
+
+    async def _refresh(self, entry: _CacheEntry) -> _CacheEntry:
+        """Extend the TTL of an existing entry."""
+        cached = await self.client.aio.caches.update(
+            name=entry.name,
+            config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+        )
+        self.refreshed += 1
+        logger.info(f"Extended context cache {entry.name}")
+        return _CacheEntry(entry.name, self._expiry(cached))
+
+    def _expiry(self, cached: types.CachedContent) -> float:
+        if cached.expire_time:
+            return cached.expire_time.timestamp()
+        return time.time() + self.ttl_seconds
+
+    def invalidate(self, model: str, include_tools: bool = True) -> None:
+        """Forget an entry the server no longer recognizes so the next call recreates it."""
+        self._entries.pop((model, include_tools), None)
+        self.fallbacks += 1
+
+    async def close(self) -> None:
+        """Delete all cached-content entries created by this instance."""
+        for entry in list(self._entries.values()):
+            try:
+                await self.client.aio.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete context cache {entry.name}: {str(e)}")
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context cache statistics."""
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode(),
+            "prefix_tokens": self.prefix_tokens(),
+            "min_tokens": self.min_tokens,
+            "below_minimum": self.prefix_tokens() < self.min_tokens,
+            "entries": len(self._entries),
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "fallbacks": self.fallbacks
+        }
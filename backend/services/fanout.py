@@ -0,0 +1,282 @@
+"""
+Per-connection outboxes and concurrent fan-out of encoded frames to many connections.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+from fastapi import WebSocket, status
+from services.outbox import Outbox
+from services.wire_codec import JSON_CODEC, Outbound
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the room-size buckets fan-out durations are grouped into
+ROOM_SIZE_BUCKETS = (1, 10, 100, 1000)
+
+
+def room_size_bucket(size: int) -> str:
+    """Name the metrics bucket for a fan-out to `size` connections."""
+    lower = 1
+    for upper in ROOM_SIZE_BUCKETS:
+        if size <= upper:
+            return str(upper) if lower == upper else f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+
+class _Delivery:
+    """Tracks one published frame until every recipient has sent or dropped it."""
+
+    __slots__ = ("bucket", "started_at", "pending")
+
+    def __init__(self, bucket: str, started_at: float, pending: int):
+        self.bucket = bucket
+        self.started_at = started_at
+        self.pending = pending
+
+
+class _DurationStats:
+    """Running count, mean and max of fan-out durations for one room-size bucket."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+
+class FanoutEngine:
+    """
+    Owns every connection's outbox and sends one encoded payload to many connections.
+
+    Direct sends go through `send`, which waits while the connection's outbox
+    is full. A published message is serialized once per wire codec in use
+    among its recipients; each recipient gets it through its own outbox and
+    writer task without the publisher waiting, so a slow client only delays
+    itself. A
+    client whose outbox is full, or whose oldest queued frame is older than
+    the lag limit, is evicted: its queue is dropped and the connection is
+    closed, which lets the endpoint run its normal disconnect cleanup.
+    Fan-out durations (publish until the last recipient has sent the frame)
+    are recorded by room size.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        max_lag: float,
+        coalesce_window: float = 0.0,
+        close_timeout: float = 5.0
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            max_queue_size: Frames a connection may have queued before producers wait and fan-out evicts it
+            max_lag: Seconds the oldest queued frame may wait before the connection is evicted
+            coalesce_window: Seconds a lone content chunk is held so following chunks can be merged in
+            close_timeout: Seconds to wait for an evicted connection to close
+        """
+        self.max_queue_size = max_queue_size
+        self.max_lag = max_lag
+        self.coalesce_window = coalesce_window
+        self.close_timeout = close_timeout
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        # Evicted connections are skipped until their endpoint releases them
+        self._evicted: Set[WebSocket] = set()
+        self._durations: Dict[str, _DurationStats] = {}
+
+        self.published = 0
+        self.frames_queued = 0
+        self.evictions = 0
+        self.send_failures = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    def open(self, websocket: WebSocket, codec=JSON_CODEC) -> Outbox:
+        """
+        Start a connection's outbox and writer.
+
+        Args:
+            websocket: Accepted connection
+            codec: Wire codec negotiated for the connection
+
+        Returns:
+            The outbox
+        """
+        self._evicted.discard(websocket)
+        outbox = self._outboxes[websocket] = Outbox(
+            websocket, self.max_queue_size, self.coalesce_window, self._failed, codec
+        )
+        return outbox
+
+    def outbox(self, websocket: WebSocket) -> Optional[Outbox]:
+        """
+        Get a connection's outbox, opening a JSON one on first use.
+
+        Args:
+            websocket: Connection
+
+        Returns:
+            The outbox, or None if the connection was evicted or its sends failed
+        """
+        outbox = self._outboxes.get(websocket)
+        if outbox is None and websocket not in self._evicted:
+            outbox = self.open(websocket)
+        return outbox
+
+    async def send(self, message: Outbound, websocket: WebSocket) -> bool:
+        """
+        Queue a message for one connection, waiting while its outbox is full.
+
+        A connection that stays full for longer than the lag limit is evicted.
+
+        Args:
+            message: Message dictionary or model to send
+            websocket: Target connection
+
+        Returns:
+            False if the connection is gone or was evicted
+        """
+        outbox = self.outbox(websocket)
+        if outbox is None:
+            return False
+        if await outbox.send(message, timeout=self.max_lag):
+            return True
+        if not outbox.closed:
+            self.evict(websocket, f"outbox stayed full for {self.max_lag:.1f}s")
+        return False
+
+    async def publish(self, message: Outbound, connections: Iterable[WebSocket]) -> int:
+        """
+        Queue a message for every connection, encoding it once per codec.
+
+        Args:
+            message: Message dictionary or model, shared by all recipients
+            connections: Target connections
+
+        Returns:
+            Number of connections the frame was queued for
+        """
+        connections = list(connections)
+        self.published += 1
+        if not connections:
+            return 0
+
+        now = time.monotonic()
+        delivery = _Delivery(room_size_bucket(len(connections)), now, 1)
+
+        on_sent = lambda: self._delivered(delivery)
+        encoded: Dict[str, Any] = {}
+        queued = 0
+        for websocket in connections:
+            outbox = self.outbox(websocket)
+            if outbox is None:
+                continue
+            if len(outbox) >= self.max_queue_size or outbox.lag(now) > self.max_lag:
+                self.evict(websocket, f"{len(outbox)} frames queued, {outbox.lag(now):.1f}s behind")
+                continue
+            payload = encoded.get(outbox.codec.name)
+            if payload is None:
+                payload = encoded[outbox.codec.name] = outbox.codec.encode(message)
+            delivery.pending += 1
+            outbox.offer(payload, on_sent)
+            queued += 1
+
+        self.frames_queued += queued
+        # Release the publisher's hold; the duration is recorded once every recipient is done
+        self._delivered(delivery)
+        # Let the writers pick the frame up before the publisher queues another
+        await asyncio.sleep(0)
+        return queued
+
+    def _delivered(self, delivery: _Delivery) -> None:
+        """Count one recipient (or the publisher) as done with a frame."""
+        delivery.pending -= 1
+        if delivery.pending == 0:
+            stats = self._durations.get(delivery.bucket)
+            if stats is None:
+                stats = self._durations[delivery.bucket] = _DurationStats()
+            stats.record(time.monotonic() - delivery.started_at)
+
+    def _drop(self, outbox: Outbox) -> None:
+        if self._outboxes.get(outbox.websocket) is outbox:
+            del self._outboxes[outbox.websocket]
+        outbox.close()
+        self.sent += outbox.sent
+        self.coalesced += outbox.coalesced
+        self.throttled += outbox.throttled
+
+    def _failed(self, outbox: Outbox) -> None:
+        """Stop sending to a connection whose send raised; its endpoint cleans up."""
+        self.send_failures += 1
+        self._evicted.add(outbox.websocket)
+        self._drop(outbox)
+
+    def evict(self, websocket: WebSocket, reason: str) -> None:
+        """
+        Drop a slow consumer's queue and close its connection.
+
+        Args:
+            websocket: Connection to evict
+            reason: Logged explanation
+        """
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return
+        logger.warning(f"Evicting slow WebSocket consumer: {reason}")
+        self.evictions += 1
+        self._evicted.add(websocket)
+        self._drop(outbox)
+        asyncio.create_task(self._close(websocket))
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too slow"),
+                timeout=self.close_timeout
+            )
+        except Exception as e:
+            logger.debug(f"Closing evicted WebSocket failed: {str(e)}")
+
+    def release(self, websocket: WebSocket) -> None:
+        """Stop the writer of a connection that has gone away."""
+        self._evicted.discard(websocket)
+        outbox = self._outboxes.get(websocket)
+        if outbox is not None:
+            self._drop(outbox)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get outbox counters and fan-out durations by room size."""
+        outboxes = list(self._outboxes.values())
+        return {
+            "published": self.published,
+            "frames_queued": self.frames_queued,
+            "evictions": self.evictions,
+            "send_failures": self.send_failures,
+            "outboxes": len(outboxes),
+            "queued_frames": sum(len(outbox) for outbox in outboxes),
+            "sent": self.sent + sum(outbox.sent for outbox in outboxes),
+            "coalesced": self.coalesced + sum(outbox.coalesced for outbox in outboxes),
+            "throttled": self.throttled + sum(outbox.throttled for outbox in outboxes),
+            "duration_by_room_size": {
+                bucket: stats.as_dict()
+                for bucket, stats in sorted(self._durations.items(), key=lambda item: int(item[0].split("-")[0].rstrip("+")))
+            }
+        }
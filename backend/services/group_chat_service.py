@@ -2,13 +2,14 @@
 Group Chat Service for managing multi-user chat rooms.
 """
 
-import json
 import time
 import uuid
 import logging
 from typing import Dict, List, Optional, Set
 from fastapi import WebSocket
 from models.websocket import GroupUser, GroupChatResponse
+from services.fanout import FanoutEngine
+from services.serialization import GROUP_CHAT_RESPONSE
 
 logger = logging.getLogger(__name__)
 
@@ -82,7 +83,7 @@ class ChatRoom:
         """
         user_id = None
         for uid, conn in self.connections.items():
-            if conn == websocket:
+            if conn is websocket:
                 user_id = uid
                 break
                 
@@ -104,7 +105,7 @@ class ChatRoom:
         logger.debug(f"🔍 Available users: {[f'{user_id}: {user.nickname}' for user_id, user in self.users.items()]}")
         
         for user_id, conn in self.connections.items():
-            if conn == websocket:
+            if conn is websocket:
                 user = self.users.get(user_id)
                 logger.debug(f"✅ Found user {user.nickname} (ID: {user_id}) for websocket {id(websocket)}")
                 return user
@@ -118,13 +119,20 @@ class ChatRoom:
         
     def get_connections(self, exclude: WebSocket = None) -> List[WebSocket]:
         """Get all WebSocket connections except the excluded one."""
-        return [conn for conn in self.connections.values() if conn != exclude]
+        return [conn for conn in self.connections.values() if conn is not exclude]
 
 
 class GroupChatService:
     """Service for managing group chat functionality."""
     
-    def __init__(self):
+    def __init__(self, fanout: FanoutEngine):
+        """
+        Initialize the group chat service.
+        
+        Args:
+            fanout: Engine that delivers room broadcasts
+        """
+        self.fanout = fanout
         self.rooms: Dict[str, ChatRoom] = {}
         self.default_room_id = "general"
         self.max_users_per_room = 20
@@ -270,6 +278,35 @@ class GroupChatService:
             userCount=len(room.users)
         )
         
+    async def remove_connections(self, websockets: List[WebSocket]) -> int:
+        """
+        Remove a batch of dead connections from every room.
+        
+        Each room's remaining users are told about every user who left, with
+        the room's final user list.
+        
+        Args:
+            websockets: Connections to remove
+            
+        Returns:
+            Number of users removed
+        """
+        removed = 0
+        for room in self.rooms.values():
+            left = [user for user in (room.remove_user(websocket) for websocket in websockets) if user]
+            for user in left:
+                await self._broadcast_to_room(
+                    room,
+                    GroupChatResponse(
+                        type="user_left",
+                        sender=user.nickname,
+                        users=room.get_users_list(),
+                        userCount=len(room.users)
+                    )
+                )
+            removed += len(left)
+        return removed
+        
     async def handle_disconnect(self, websocket: WebSocket) -> None:
         """Handle user disconnection from any room."""
         for room in self.rooms.values():
@@ -287,41 +324,22 @@ class GroupChatService:
         """
         Broadcast a message to all users in a room.
         
+        The response is serialized once. Connections that fail or fall too far
+        behind are closed by the fan-out engine, and their endpoint's disconnect
+        handling removes them from the room.
+        
         Args:
             room: Target room
             response: Response to broadcast
             exclude: WebSocket to exclude from broadcast
             
         Returns:
-            Number of successful sends
+            Number of connections the message was queued for
         """
         connections = room.get_connections(exclude)
-        successful_sends = 0
-        failed_connections = []
-        
-        logger.info(f"Broadcasting {response.type} to {len(connections)} connections (excluding sender: {exclude is not None})")
-        
-        for websocket in connections:
-            try:
-                # Wrap the response in the group_chat_response envelope
-                wrapped_response = {
-                    "type": "group_chat_response",
-                    "data": response.dict()
-                }
-                await websocket.send_text(json.dumps(wrapped_response))
-                successful_sends += 1
-                logger.debug(f"Successfully broadcast {response.type} to a connection")
-            except Exception as e:
-                logger.warning(f"Failed to send {response.type} message to user: {str(e)}")
-                failed_connections.append(websocket)
-                
-        # Only clean up failed connections for non-join messages to avoid removing users immediately after joining
-        if response.type != "user_joined":
-            for websocket in failed_connections:
-                logger.info(f"Removing user due to failed connection (message type: {response.type})")
-                room.remove_user(websocket)
-        else:
-            logger.info(f"Skipping connection cleanup for user_joined message - {len(failed_connections)} failed connections")
-            
-        logger.info(f"Broadcast {response.type} completed: {successful_sends} successful, {len(failed_connections)} failed")
-        return successful_sends
+        
+        # Wrap the response in the group_chat_response envelope
+        queued = await self.fanout.publish(GROUP_CHAT_RESPONSE.wrap(response), connections)
+        
+        logger.info(f"Broadcast {response.type} queued for {queued}/{len(connections)} connections (excluding sender: {exclude is not None})")
+        return queued
@@ -0,0 +1,144 @@
+"""
+Server-driven WebSocket heartbeat and dead-connection reaper.
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import WebSocket, status
+from services.websocket_service import Connection, WebSocketService
+
+logger = logging.getLogger(__name__)
+
+# Called with the sockets removed in one sweep (e.g. to clean up group chat rooms)
+ReapListener = Callable[[List[WebSocket]], Awaitable[Any]]
+
+
+class HeartbeatScheduler:
+    """
+    One background task that pings every connection and reaps the silent ones.
+
+    Each sweep first removes connections that have sent nothing (not even a
+    pong) for the idle timeout, closing them and notifying the reap listeners
+    once with the whole batch. It then sends a single encoded ping to all
+    remaining connections through the fan-out engine. Clients answer with a
+    pong carrying the ping id, which gives each connection's round-trip time.
+    """
+
+    def __init__(self, ws_service: WebSocketService, interval: float, idle_timeout: float, close_timeout: float = 5.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            ws_service: Registry of the connections to watch
+            interval: Seconds between sweeps (0 disables the heartbeat)
+            idle_timeout: Seconds without any inbound frame before a connection is reaped
+            close_timeout: Seconds to wait for a reaped connection to close
+        """
+        self.ws_service = ws_service
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.close_timeout = close_timeout
+        self._listeners: List[ReapListener] = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.sweeps = 0
+        self.pings_sent = 0
+        self.reaped = 0
+
+    def add_reap_listener(self, listener: ReapListener) -> None:
+        """Register a callback for connections removed by the reaper."""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        """Start the sweep task (no-op if disabled or already running)."""
+        if self.interval <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"WebSocket heartbeat every {self.interval}s, idle timeout {self.idle_timeout}s")
+
+    async def stop(self) -> None:
+        """Stop the sweep task."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Heartbeat sweep failed: {str(e)}", exc_info=True)
+
+    async def sweep(self) -> int:
+        """
+        Reap idle connections and ping the rest.
+
+        Returns:
+            Number of connections reaped
+        """
+        self.sweeps += 1
+        now = time.monotonic()
+        idle: List[Connection] = []
+        live: List[Connection] = []
+        for connection in list(self.ws_service.connections.values()):
+            (idle if now - connection.last_seen > self.idle_timeout else live).append(connection)
+
+        if idle:
+            await self._reap(idle)
+
+        ping_id = uuid.uuid4().hex[:12]
+        for connection in live:
+            connection.ping_id = ping_id
+            connection.ping_sent_at = now
+        self.pings_sent += await self.ws_service.fanout.publish(
+            {"type": "ping", "ping_id": ping_id, "timestamp": time.time()},
+            [connection.websocket for connection in live]
+        )
+        return len(idle)
+
+    async def _reap(self, connections: List[Connection]) -> None:
+        """Unregister, announce and close a batch of dead connections."""
+        websockets = [connection.websocket for connection in connections]
+        for websocket in websockets:
+            self.ws_service.disconnect(websocket)
+        self.reaped += len(websockets)
+        logger.info(f"Reaping {len(websockets)} idle WebSocket connections")
+
+        for listener in self._listeners:
+            try:
+                await listener(websockets)
+            except Exception as e:
+                logger.warning(f"Reap listener failed: {str(e)}")
+
+        await asyncio.gather(*[self._close(websocket) for websocket in websockets])
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=status.WS_1001_GOING_AWAY, reason="Heartbeat timeout"),
+                timeout=self.close_timeout
+            )
+        except Exception as e:
+            logger.debug(f"Closing reaped WebSocket failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get heartbeat counters and round-trip times."""
+        rtts = [connection.rtt for connection in self.ws_service.connections.values() if connection.rtt is not None]
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "interval": self.interval,
+            "idle_timeout": self.idle_timeout,
+            "sweeps": self.sweeps,
+            "pings_sent": self.pings_sent,
+            "reaped": self.reaped,
+            "rtt_ms": {
+                "connections": len(rtts),
+                "avg": round(sum(rtts) / len(rtts) * 1000, 3) if rtts else None,
+                "max": round(max(rtts) * 1000, 3) if rtts else None
+            }
+        }
@@ -0,0 +1,100 @@
+"""
+Token-budgeted conversation history for prompt building.
+"""
+
+import math
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from services.session_store import ChatSession
+
+logger = logging.getLogger(__name__)
+
+
+class TokenEstimator:
+    """
+    Local token estimator calibrated against the model's reported usage.
+
+    Starts from a characters-per-token heuristic and nudges the ratio towards
+    the values observed in `usage_metadata.prompt_token_count`.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, smoothing: float = 0.2):
+        """
+        Initialize the estimator.
+
+        Args:
+            chars_per_token: Initial characters-per-token ratio
+            smoothing: Weight given to each new observation (0-1)
+        """
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+        self.observations = 0
+        self.last_error: Optional[float] = None
+
+    def estimate(self, text: str) -> int:
+        """Estimate the number of tokens in a piece of text."""
+        if not text:
+            return 0
+        return max(1, math.ceil(len(text) / self.chars_per_token))
+
+    def observe(self, prompt_chars: int, prompt_tokens: Optional[int]) -> None:
+        """
+        Calibrate the estimator with an actual prompt token count.
+
+        Args:
+            prompt_chars: Number of text characters sent in the prompt
+            prompt_tokens: Prompt token count reported by the model
+        """
+        if not prompt_tokens or prompt_chars <= 0:
+            return
+
+        estimated = prompt_chars / self.chars_per_token
+        self.last_error = (estimated - prompt_tokens) / prompt_tokens
+
+        observed_ratio = min(8.0, max(1.5, prompt_chars / prompt_tokens))
+        self.chars_per_token += self.smoothing * (observed_ratio - self.chars_per_token)
+        self.observations += 1
+
+        if abs(self.last_error) > 0.25:
+            logger.debug(
+                f"Token estimate off by {self.last_error:+.0%} "
+                f"(estimated {estimated:.0f}, actual {prompt_tokens}); "
+                f"chars/token now {self.chars_per_token:.2f}"
+            )
+
+
+def select_history(
+    session: ChatSession,
+    estimator: TokenEstimator,
+    token_budget: int,
+    max_turns: int
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Pick the most recent turns that fit within a token budget.
+
+    The rolling summary (if any) is charged against the budget first. Turns are
+    then taken newest-first until the budget or turn limit is reached.
+
+    Args:
+        session: Chat session providing history and summary
+        estimator: Token estimator
+        token_budget: Maximum tokens to spend on history and summary
+        max_turns: Maximum number of turns to include
+
+    Returns:
+        Tuple of (turns in the window, oldest-first; older turns left out)
+    """
+    remaining = token_budget - estimator.estimate(session.summary or "")
+    history = session.chat_history
+    start = len(history)
+
+    while start > 0 and len(history) - start < max_turns:
+        entry = history[start - 1]
+        cost = estimator.estimate(entry.get("user", "")) + estimator.estimate(entry.get("assistant", ""))
+        if cost > remaining:
+            break
+        remaining -= cost
+        start -= 1
+
+    return history[start:], history[:start]
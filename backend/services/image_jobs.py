@@ -0,0 +1,218 @@
+"""
+Background image generation jobs with status events and reconnect delivery.
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Receives job events for a session (e.g. sends them over a WebSocket)
+JobListener = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class ImageJob:
+    """One background image generation and the events it has produced."""
+
+    def __init__(self, session_id: str, message_id: str):
+        self.job_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.message_id = message_id
+        self.status = "queued"
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+
+class ImageJobManager:
+    """
+    Runs image generations as background tasks, so chat turns return immediately.
+
+    Every job event is tagged with the job id and session id, recorded, and
+    sent to the connections listening on the job's session. A client that
+    reconnects can listen on its session again and have the recorded events
+    replayed, so results are not lost with the original connection. Finished
+    jobs are kept for a retention period.
+    """
+
+    def __init__(self, retention_seconds: float):
+        """
+        Initialize the job manager.
+
+        Args:
+            retention_seconds: How long finished jobs are kept for replay
+        """
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, ImageJob] = {}
+        self._listeners: Dict[str, Dict[Any, JobListener]] = {}
+
+        self.submitted = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def submit(self, session_id: str, message_id: str, run: Callable[[], AsyncIterator[Dict[str, Any]]]) -> ImageJob:
+        """
+        Start a background job.
+
+        Args:
+            session_id: Chat session the job belongs to
+            message_id: Chat message that requested the image
+            run: Creates the job's event stream. Events of type "image_job_status"
+                update the job status.
+
+        Returns:
+            The started job
+        """
+        self._prune()
+        job = ImageJob(session_id, message_id)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        self.submitted += 1
+        logger.info(f"Submitted image job {job.job_id} for session {session_id}")
+        return job
+
+    async def _run(self, job: ImageJob, run: Callable[[], AsyncIterator[Dict[str, Any]]]) -> None:
+        """Drive a job's event stream and publish its events."""
+        await self._publish_status(job, "queued")
+        try:
+            async for event in run():
+                await self._publish(job, event)
+            if job.status == "failed":
+                # The job reported its own failure (e.g. the model returned no image)
+                self.failed += 1
+            elif not job.finished:
+                await self._publish_status(job, "done")
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            await self._publish_status(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Image job {job.job_id} failed: {str(e)}", exc_info=True)
+            self.failed += 1
+            await self._publish_status(job, "failed", error=str(e))
+        finally:
+            job.finished_at = time.monotonic()
+
+    async def _publish_status(self, job: ImageJob, status: str, error: Optional[str] = None) -> None:
+        event = {"type": "image_job_status", "status": status}
+        if error:
+            event["error"] = error
+        await self._publish(job, event)
+
+    async def _publish(self, job: ImageJob, event: Dict[str, Any]) -> None:
+        """Record an event and send it to the session's listeners."""
+        event = {
+            **event,
+            "job_id": job.job_id,
+            "session_id": job.session_id,
+            "message_id": event.get("message_id", job.message_id),
+            "timestamp": event.get("timestamp", time.time())
+        }
+        if event["type"] == "image_job_status":
+            job.status = event["status"]
+        job.events.append(event)
+
+        for listener in list(self._listeners.get(job.session_id, {}).values()):
+            try:
+                await listener(event)
+            except Exception as e:
+                logger.warning(f"Failed to deliver image job event: {str(e)}")
+
+    def subscribe(self, session_id: str, key: Any, listener: JobListener) -> None:
+        """
+        Listen for job events of a session.
+
+        Args:
+            session_id: Chat session to listen on
+            key: Identifies the listener (e.g. the WebSocket), used to unsubscribe
+            listener: Called with each event
+        """
+        self._listeners.setdefault(session_id, {})[key] = listener
+
+    def unsubscribe(self, key: Any, session_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Stop a listener from receiving job events.
+
+        Args:
+            key: Listener key passed to subscribe
+            session_ids: Sessions to stop listening on (defaults to all)
+        """
+        for session_id in list(session_ids if session_ids is not None else self._listeners.keys()):
+            listeners = self._listeners.get(session_id)
+            if listeners is None:
+                continue
+            listeners.pop(key, None)
+            if not listeners:
+                del self._listeners[session_id]
+
+    async def replay(self, session_id: str, listener: JobListener) -> int:
+        """
+        Send every recorded event of a session's retained jobs to one listener.
+
+        Args:
+            session_id: Chat session whose jobs to replay
+            listener: Receives the events
+
+        Returns:
+            Number of jobs replayed
+        """
+        self._prune()
+        jobs = [job for job in self._jobs.values() if job.session_id == session_id]
+        for job in jobs:
+            for event in list(job.events):
+                await listener(event)
+        return len(jobs)
+
+    def cancel(self, job_id: str, session_ids: Iterable[str]) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Args:
+            job_id: Job to cancel
+            session_ids: Sessions the requester may act on
+
+        Returns:
+            True if a cancellation was requested
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.session_id not in set(session_ids) or job.finished:
+            return False
+        job.task.cancel()
+        logger.info(f"Cancelling image job {job_id}")
+        return True
+
+    def _prune(self) -> None:
+        """Drop finished jobs past the retention period."""
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel all unfinished jobs."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job counters."""
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "submitted": self.submitted,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "retained": len(self._jobs),
+            "statuses": statuses,
+            "listening_sessions": len(self._listeners)
+        }
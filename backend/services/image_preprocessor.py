@@ -0,0 +1,153 @@
+"""
+Process-pool preprocessing of user-uploaded images before they are sent to Gemini.
+"""
+
+import io
+import asyncio
+import base64
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple, Union
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name -> MIME type accepted as input
+SUPPORTED_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "MPO": "image/jpeg",  # Multi-picture JPEGs written by many phone cameras
+}
+
+# Guard against decompression bombs (roughly a 12000x8000 image)
+Image.MAX_IMAGE_PIXELS = 100_000_000
+
+
+def preprocess_image(data: Union[bytes, str], max_dimension: int, jpeg_quality: int) -> Tuple[bytes, str]:
+    """
+    Decode, validate, strip metadata from and downscale one image.
+
+    Runs in a worker process. EXIF orientation is applied before the metadata is
+    dropped, so rotated phone photos stay upright. Images with transparency are
+    re-encoded as PNG and everything else as JPEG.
+
+    Args:
+        data: Raw image bytes, or base64 text from a legacy inline attachment
+        max_dimension: Longest side of the output in pixels
+        jpeg_quality: JPEG quality used when re-encoding
+
+    Returns:
+        Tuple of (encoded image bytes, MIME type)
+
+    Raises:
+        ValueError: If the data is not a supported image
+    """
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in SUPPORTED_FORMATS:
+                raise ValueError(f"Unsupported image format: {image.format}")
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid image data: {str(e)}")
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    # Saving without exif/icc/info arguments drops all metadata
+    output = io.BytesIO()
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        image.convert("RGBA").save(output, format="PNG", optimize=True)
+        return output.getvalue(), "image/png"
+
+    image.convert("RGB").save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+    return output.getvalue(), "image/jpeg"
+
+
+class ImagePreprocessor:
+    """
+    Runs image preprocessing in a process pool so decoding and resizing never block the event loop.
+    """
+
+    def __init__(self, max_workers: int, max_dimension: int, jpeg_quality: int, enabled: bool = True):
+        """
+        Initialize the preprocessor. The pool is started on first use.
+
+        Args:
+            max_workers: Worker processes in the pool
+            max_dimension: Longest side of processed images in pixels
+            jpeg_quality: JPEG quality used when re-encoding
+            enabled: When False, images are passed through unchanged (base64 is still decoded off the loop)
+        """
+        self.max_workers = max_workers
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.enabled = enabled
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.processed = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def process(self, data: Union[bytes, str], mime_type: str) -> Tuple[bytes, str]:
+        """
+        Preprocess one image in the pool.
+
+        Args:
+            data: Raw image bytes, or base64 text from a legacy inline attachment
+            mime_type: MIME type declared by the client
+
+        Returns:
+            Tuple of (image bytes to send to the model, MIME type)
+
+        Raises:
+            ValueError: If the data is not a supported image
+        """
+        if not self.enabled:
+            if isinstance(data, str):
+                data = await asyncio.to_thread(base64.b64decode, data)
+            return data, mime_type
+
+        loop = asyncio.get_running_loop()
+        try:
+            processed, processed_mime_type = await loop.run_in_executor(
+                self._get_pool(), preprocess_image, data, self.max_dimension, self.jpeg_quality
+            )
+        except ValueError:
+            self.rejected += 1
+            raise
+
+        self.processed += 1
+        self.bytes_in += len(data) * 3 // 4 if isinstance(data, str) else len(data)
+        self.bytes_out += len(processed)
+        return processed, processed_mime_type
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get preprocessing counters."""
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out
+        }
@@ -0,0 +1,210 @@
+"""
+Disk-backed cache of image generation results.
+"""
+
+import os
+import json
+import mmap
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from services.response_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+
+class _CachedImage:
+    """Index record for one cached result."""
+
+    def __init__(self, size: int, mime_type: str, text: Optional[str]):
+        self.size = size
+        self.mime_type = mime_type
+        self.text = text
+
+
+class ImageResultCache:
+    """
+    Size-capped LRU cache of generated images, keyed by model, prompt and reference images.
+
+    Each result is stored as an image file plus a small JSON sidecar holding its
+    MIME type and accompanying text. The index lives in memory and is rebuilt
+    from the directory on startup, ordered by last use (file mtime). Hits are
+    read through a memory map in a worker thread.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int, enabled: bool = True):
+        """
+        Initialize the cache and load the existing entries.
+
+        Args:
+            root_dir: Directory holding the cached results (created if missing)
+            max_bytes: Total image bytes kept before least recently used entries are evicted
+            enabled: When False, lookups always miss and nothing is stored
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _CachedImage]" = OrderedDict()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.enabled:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._load_index()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, reference_hashes: List[str]) -> str:
+        """
+        Build a cache key for an image generation request.
+
+        Args:
+            model: Image model name
+            prompt: Generation prompt
+            reference_hashes: SHA-256 digests of the reference images, in order
+
+        Returns:
+            Hex digest identifying the request
+        """
+        digest = hashlib.sha256()
+        for part in [model, normalize_message(prompt), *reference_hashes]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _image_path(self, key: str) -> str:
+        return os.path.join(self.root_dir, f"{key}.img")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root_dir, f"{key}.json")
+
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from the files on disk."""
+        records = []
+        for name in os.listdir(self.root_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            try:
+                with open(self._meta_path(key), "r") as meta_file:
+                    meta = json.load(meta_file)
+                stat = os.stat(self._image_path(key))
+            except (OSError, ValueError):
+                continue
+            records.append((stat.st_mtime, key, _CachedImage(stat.st_size, meta["mime_type"], meta.get("text"))))
+
+        for _, key, entry in sorted(records, key=lambda record: record[0]):
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+
+        if self._entries:
+            logger.info(f"Loaded {len(self._entries)} cached image results ({self.total_bytes} bytes)")
+        self._evict()
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str, Optional[str]]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Tuple of (image bytes, MIME type, text) on a hit, None otherwise
+        """
+        entry = self._entries.get(key) if self.enabled else None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        try:
+            data = await asyncio.to_thread(self._read_sync, self._image_path(key))
+        except OSError:
+            # Evicted or removed underneath us
+            self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data, entry.mime_type, entry.text
+
+    @staticmethod
+    def _read_sync(path: str) -> bytes:
+        with open(path, "rb") as image_file:
+            with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = mapped[:]
+        # Record the use so LRU order survives a restart
+        os.utime(path)
+        return data
+
+    async def set(self, key: str, data: bytes, mime_type: str, text: Optional[str]) -> None:
+        """
+        Store a result, evicting least recently used entries past the size cap.
+
+        Args:
+            key: Key from make_key
+            data: Image bytes
+            mime_type: Image MIME type
+            text: Text the model returned with the image
+        """
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+
+        try:
+            await asyncio.to_thread(self._write_sync, key, data, {"mime_type": mime_type, "text": text})
+        except OSError as e:
+            logger.warning(f"Failed to cache image result: {str(e)}")
+            return
+
+        self._drop(key)
+        self._entries[key] = _CachedImage(len(data), mime_type, text)
+        self.total_bytes += len(data)
+        self._evict()
+
+    def _write_sync(self, key: str, data: bytes, meta: Dict[str, Any]) -> None:
+        for path, content in ((self._image_path(key), data), (self._meta_path(key), json.dumps(meta).encode("utf-8"))):
+            fd, temp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as temp_file:
+                    temp_file.write(content)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+    def _drop(self, key: str) -> None:
+        """Forget an entry from the index."""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.total_bytes -= entry.size
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits its size cap."""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            for path in (self._image_path(key), self._meta_path(key)):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,146 @@
+"""
+Local intent pre-router for image generation requests.
+"""
+
+import re
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Things a visitor can ask to have drawn or generated
+_IMAGE_NOUNS = (
+    r"(?:image|picture|pic|photo|illustration|drawing|painting|sketch|portrait|cartoon|"
+    r"artwork|logo|icon|wallpaper|poster)s?"
+)
+
+# Comparative wording used to adjust an image ("bluer", "more colorful")
+_COMPARATIVES = (
+    r"(?:bluer|redder|greener|brighter|darker|bigger|smaller|cuter|scarier|sharper|"
+    r"(?:more|less)\s+(?:colou?rful|vibrant|vivid|saturated|realistic|detailed|cartoonish|abstract|blue|red|green))"
+)
+
+# Wording that can only be about how something looks
+_VISUAL_CUES = re.compile(
+    r"\b(?:" + _IMAGE_NOUNS + r"|" + _COMPARATIVES + r"|"
+    r"red|blue|green|yellow|orange|purple|pink|black|white|gr[ae]y|brown|gold|golden|silver|colou?rs?|colou?rful|"
+    r"style|background|foreground|lighting|sky|sunset|watercolou?r|oil\s+paint|pixel\s+art|anime|cartoonish|"
+    r"photorealistic|realistic|sepia|vintage|retro|cyberpunk|neon)\b"
+)
+
+# Figures of speech that use drawing verbs without asking for a picture
+_FIGURES_OF_SPEECH = re.compile(
+    r"\b(?:comparisons?|conclusions?|line|parallels?|distinctions?|blank|breath|attention|crowds?|cards?|straws?|"
+    r"lessons?|inspiration|curtains?|plan|outline|roadmap|strategy|proposal|town|bleak|grim|rosy|vivid|clear)\b"
+)
+
+# Explicit requests for a new image. A bare drawing verb counts when it is
+# followed by an article and a subject ("draw a cat", "sketch me a dragon");
+# figures of speech ("draw a comparison") are left to the model.
+_NEW_IMAGE_PATTERNS = [
+    re.compile(r"^(?:please\s+|pls\s+|can you\s+|could you\s+)?(?:draw|sketch|paint)(?:\s+me)?\s+(?:an?|the)\s+\w+"),
+    re.compile(
+        r"^(?:please\s+|pls\s+|can you\s+|could you\s+)?(?:draw|sketch|paint|illustrate|doodle)\s+(?:me\s+|us\s+)?"
+        r"(?:an?\s+|the\s+|some\s+|another\s+)?(?:\w+\s+)?" + _IMAGE_NOUNS + r"\b"
+    ),
+    re.compile(
+        r"\b(?:generate|create|make|render|design|produce)\s+(?:me\s+|us\s+)?(?:an?\s+|another\s+|one\s+more\s+|some\s+)?"
+        r"(?:new\s+)?" + _IMAGE_NOUNS + r"\b"
+    ),
+    re.compile(r"^(?:an?\s+)?(?:image|picture|photo|drawing|painting|illustration)\s+of\b"),
+]
+
+# Follow-up edits of the image that was just generated (or uploaded). An edit
+# verb alone also fits text edits ("make it shorter", "give it a title"), so
+# these only count together with a visual cue.
+_EDIT_VERBS = re.compile(
+    r"^(?:now\s+|ok(?:ay)?\s+|and\s+)?(?:make|turn|change|add|remove|replace|put|give|recolou?r)\b"
+    r"|\b(?:make|turn|render|draw)\s+(?:it|this|that|them|the\s+" + _IMAGE_NOUNS + r")\b"
+)
+
+# Edits that are visual on their own ("in the style of Monet", "it but bluer")
+_STANDALONE_EDIT_PATTERNS = [
+    re.compile(r"^(?:now\s+)?(?:in|as)\s+(?:the\s+style\s+of|a\s+\w+\s+style|\w+\s+style)\b"),
+    re.compile(r"^(?:now\s+|ok(?:ay)?\s+)?(?:it|the\s+" + _IMAGE_NOUNS + r")\s+(?:but\s+)?" + _COMPARATIVES + r"\b"),
+]
+
+# Signals that the visitor is asking about images (or for advice) rather than for one
+_AMBIGUOUS_PATTERNS = [
+    re.compile(r"^(?:how|why|what|when|where|who|which|is|are|do|does|did|should)\b"),
+    re.compile(r"\?"),
+    re.compile(r"\b(?:how|tips?|ideas?|advice|suggestions?)\b"),
+    re.compile(r"\b(?:don't|do not|dont|never|stop|without generating)\b"),
+    re.compile(r"\b(?:code|function|script|css|svg|html|python|javascript|typescript|diagram|chart|graph|table)\b"),
+    re.compile(r"\b(?:explain|describe|tell me|what's in|what is in)\b"),
+]
+
+_POLITE_PREFIX = re.compile(r"^(?:please|pls|hey|hi|ok(?:ay)?|now|can you|could you|would you)[\s,]+", re.IGNORECASE)
+
+
+class ImageIntentClassifier:
+    """
+    Keyword and feature based classifier for unambiguous image intents.
+
+    It never calls the network. When it is not confident, it returns None and
+    the turn goes through the normal model tool-routing path.
+    """
+
+    def __init__(self, max_length: int = 200):
+        """
+        Initialize the classifier.
+
+        Args:
+            max_length: Messages longer than this are left to the model
+        """
+        self.max_length = max_length
+        self.prerouted = 0
+        self.passed_through = 0
+
+    def classify(self, message: str, has_previous_image: bool, has_image_attachments: bool) -> Optional[Dict[str, Any]]:
+        """
+        Classify a message as an image request.
+
+        Args:
+            message: User's message
+            has_previous_image: Whether the session's last reply was a generated image
+            has_image_attachments: Whether the visitor attached images to this message
+
+        Returns:
+            generate_image tool arguments for confident matches, None otherwise
+        """
+        text = " ".join(message.strip().lower().split())
+
+        decision = None
+        if text and len(text) <= self.max_length and not any(p.search(text) for p in _AMBIGUOUS_PATTERNS):
+            can_edit = has_previous_image or has_image_attachments
+            if can_edit and self._is_edit(text):
+                decision = "edit_previous"
+            elif not _FIGURES_OF_SPEECH.search(text) and any(p.search(text) for p in _NEW_IMAGE_PATTERNS):
+                decision = "new_generation"
+
+        if decision is None:
+            self.passed_through += 1
+            return None
+
+        self.prerouted += 1
+        prompt = _POLITE_PREFIX.sub("", message.strip()).rstrip("?!. ") or message.strip()
+        logger.info(f"Pre-routed image intent ({decision}): {prompt[:100]}")
+        return {
+            "prompt": prompt,
+            "use_previous_image": decision == "edit_previous" and has_previous_image and not has_image_attachments,
+            "modification_type": decision
+        }
+
+    @staticmethod
+    def _is_edit(text: str) -> bool:
+        """Check whether a normalized message asks to change how an image looks."""
+        if any(p.search(text) for p in _STANDALONE_EDIT_PATTERNS):
+            return True
+        return bool(_EDIT_VERBS.search(text) and _VISUAL_CUES.search(text))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get pre-routing counters."""
+        return {
+            "prerouted": self.prerouted,
+            "passed_through": self.passed_through
+        }
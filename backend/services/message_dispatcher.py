@@ -0,0 +1,138 @@
+"""
+Table-driven dispatch of inbound WebSocket messages.
+"""
+
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+from fastapi import WebSocket
+from pydantic import BaseModel
+from models.websocket import InboundMessage
+from services.websocket_service import WebSocketService
+from services.wire_codec import InvalidMessageError
+
+logger = logging.getLogger(__name__)
+
+# Called as handler(websocket, message, ws_service, *args) with the validated message model
+MessageHandler = Callable[..., Awaitable[Any]]
+# Called as send_error(websocket, ws_service, error, message_id) to answer a rejected message
+ErrorSender = Callable[[WebSocket, WebSocketService, str, Optional[str]], Awaitable[Any]]
+
+
+def message_type_of(model: Type[BaseModel]) -> str:
+    """Get the "type" value a message model is dispatched on."""
+    return model.model_fields["type"].default
+
+
+class MessageDispatcher:
+    """
+    One endpoint's table from message type to handler.
+
+    WebSocketService parses every frame into its inbound message model in a
+    single validation pass (see INBOUND_MESSAGE_ADAPTER); the dispatcher then
+    finds the handler with one dictionary lookup on the model's type. Invalid
+    messages and types the endpoint does not handle are answered through the
+    endpoint's error sender and the connection stays open.
+
+    Adding a message type takes a model in the InboundMessage union and a
+    register() call on the endpoints that accept it.
+    """
+
+    def __init__(self, name: str, send_error: ErrorSender, unsupported_error: str = "Unknown message type: {type}"):
+        """
+        Initialize an empty dispatch table.
+
+        Args:
+            name: Endpoint name used in logs and stats
+            send_error: Sends an error reply to the client
+            unsupported_error: Reply for unhandled types ("{type}" is replaced by the type)
+        """
+        self.name = name
+        self.send_error = send_error
+        self.unsupported_error = unsupported_error
+        self._handlers: Dict[str, MessageHandler] = {}
+
+        self.dispatched: Counter = Counter()
+        self.invalid = 0
+        self.unsupported = 0
+
+    def register(self, model: Type[BaseModel], handler: MessageHandler) -> None:
+        """
+        Route messages of a model's type to a handler.
+
+        Args:
+            model: Inbound message model with a literal "type" field
+            handler: Coroutine function called with (websocket, message, ws_service, *args)
+
+        Raises:
+            ValueError: If the type already has a handler
+        """
+        message_type = message_type_of(model)
+        if message_type in self._handlers:
+            raise ValueError(f"{self.name} already handles {message_type} messages")
+        self._handlers[message_type] = handler
+
+    def handles(self, message_type: str) -> bool:
+        """Check whether the endpoint accepts a message type."""
+        return message_type in self._handlers
+
+    async def run(self, websocket: WebSocket, ws_service: WebSocketService, *args: Any) -> None:
+        """
+        Receive and dispatch messages until the client disconnects.
+
+        Args:
+            websocket: Registered WebSocket connection
+            ws_service: WebSocket service instance
+            *args: Extra arguments passed on to every handler
+
+        Raises:
+            WebSocketDisconnect: When the client disconnects
+        """
+        while True:
+            try:
+                message = await ws_service.receive_message(websocket)
+            except InvalidMessageError as e:
+                await self.reject(websocket, ws_service, e)
+                continue
+            await self.dispatch(websocket, message, ws_service, *args)
+
+    async def dispatch(self, websocket: WebSocket, message: InboundMessage, ws_service: WebSocketService, *args: Any) -> bool:
+        """
+        Call the handler registered for a message's type.
+
+        Returns:
+            True if the message was handled, False if the endpoint does not accept its type
+        """
+        handler = self._handlers.get(message.type)
+        if handler is None:
+            await self._reply_unsupported(websocket, ws_service, message.type)
+            return False
+
+        self.dispatched[message.type] += 1
+        logger.debug(f"Dispatching {message.type} message on {self.name}")
+        await handler(websocket, message, ws_service, *args)
+        return True
+
+    async def reject(self, websocket: WebSocket, ws_service: WebSocketService, error: InvalidMessageError) -> None:
+        """Answer a frame that failed to parse or validate."""
+        if error.message_type is not None and not self.handles(error.message_type):
+            await self._reply_unsupported(websocket, ws_service, error.message_type)
+            return
+
+        self.invalid += 1
+        logger.warning(f"Rejected message on {self.name}: {str(error)}")
+        await self.send_error(websocket, ws_service, str(error), error.message_id)
+
+    async def _reply_unsupported(self, websocket: WebSocket, ws_service: WebSocketService, message_type: str) -> None:
+        self.unsupported += 1
+        logger.warning(f"Unsupported message type on {self.name}: {message_type}")
+        await self.send_error(websocket, ws_service, self.unsupported_error.format(type=message_type), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get handled message types and dispatch counters."""
+        return {
+            "handlers": sorted(self._handlers),
+            "dispatched": dict(self.dispatched),
+            "invalid": self.invalid,
+            "unsupported": self.unsupported
+        }
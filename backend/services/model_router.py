@@ -0,0 +1,128 @@
+"""
+Routing of chat turns between a lightweight and a full chat model.
+"""
+
+import re
+import logging
+from collections import deque
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Topics that deserve the full model even in a short message
+_COMPLEX_PATTERN = re.compile(
+    r"\b(?:code|debug|error|bug|architecture|design|algorithm|explain|compare|trade-?offs?|"
+    r"step[- ]by[- ]step|in detail|detailed|why|how does|how do|implement|optimi[sz]e|analy[sz]e)\b"
+    r"|```"
+)
+
+
+class ModelRoute:
+    """A named route to a model, with latency and token usage samples."""
+
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        self.turns = 0
+        self._latencies: deque = deque(maxlen=512)
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, latency: float, usage_metadata=None) -> None:
+        """
+        Record one completed call on this route.
+
+        Args:
+            latency: Seconds from request to last chunk
+            usage_metadata: Usage metadata from the model response, if available
+        """
+        self.turns += 1
+        self._latencies.append(latency)
+        if usage_metadata:
+            self.prompt_tokens += usage_metadata.prompt_token_count or 0
+            self.output_tokens += usage_metadata.candidates_token_count or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get latency and token usage for this route."""
+        latencies = sorted(self._latencies)
+        return {
+            "model": self.model,
+            "turns": self.turns,
+            "p50_latency_ms": 1000 * latencies[int(0.5 * (len(latencies) - 1))] if latencies else 0.0,
+            "p95_latency_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            "avg_prompt_tokens": self.prompt_tokens / self.turns if self.turns else 0.0,
+            "avg_output_tokens": self.output_tokens / self.turns if self.turns else 0.0
+        }
+
+
+class ModelRouter:
+    """
+    Chooses between a lightweight and a full model for each text turn.
+
+    Short, simple turns early in a conversation go to the lightweight model.
+    Long messages, attachments, deep conversations and technical topics go to
+    the full model.
+    """
+
+    def __init__(
+        self,
+        light_model: str,
+        full_model: str,
+        light_max_chars: int,
+        light_max_depth: int,
+        enabled: bool = True
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            light_model: Cheaper, lower-latency model
+            full_model: Default full model
+            light_max_chars: Longest message the light model may handle
+            light_max_depth: Deepest conversation (in turns) the light model may handle
+            enabled: When False, every turn uses the full model
+        """
+        self.light = ModelRoute("light", light_model)
+        self.full = ModelRoute("full", full_model)
+        self.light_max_chars = light_max_chars
+        self.light_max_depth = light_max_depth
+        self.enabled = enabled
+
+    def choose(self, message: str, has_attachments: bool, conversation_depth: int) -> ModelRoute:
+        """
+        Pick the route for a turn.
+
+        Args:
+            message: User's message
+            has_attachments: Whether the turn carries attachments
+            conversation_depth: Number of previous turns in the session
+
+        Returns:
+            The chosen model route
+        """
+        if not self.enabled or has_attachments:
+            return self.full
+
+        text = message.strip()
+        if (
+            len(text) > self.light_max_chars
+            or conversation_depth > self.light_max_depth
+            or text.count("?") > 1
+            or "\n" in text
+            or _COMPLEX_PATTERN.search(text.lower())
+        ):
+            return self.full
+
+        return self.light
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-route statistics."""
+        return {
+            "enabled": self.enabled,
+            "light_max_chars": self.light_max_chars,
+            "light_max_depth": self.light_max_depth,
+            "routes": {
+                self.light.name: self.light.get_stats(),
+                self.full.name: self.full.get_stats()
+            }
+        }
@@ -0,0 +1,424 @@
+"""
+Admission control and rate limiting for Gemini model calls.
+"""
+
+import asyncio
+import random
+import time
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, TypeVar
+from google.genai import errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upstream status codes worth retrying with backoff
+RETRYABLE_STATUS_CODES = {429, 503}
+
+
+class ModelBusyError(Exception):
+    """Raised when a model call cannot be admitted before its deadline."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an upstream error is a rate limit or overload response."""
+    return isinstance(error, errors.APIError) and error.code in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """Token-bucket rate limiter."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of stored tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, deadline: float) -> None:
+        """
+        Take one token, waiting for a refill if needed.
+
+        Args:
+            deadline: Monotonic time after which to give up
+
+        Raises:
+            ModelBusyError: If no token becomes available before the deadline
+        """
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise ModelBusyError("Rate limit reached")
+            await asyncio.sleep(wait)
+
+
+class ModelLimiter:
+    """Concurrency limit, rate limit and bounded wait queue for one model."""
+
+    def __init__(
+        self,
+        model: str,
+        max_concurrency: int,
+        requests_per_minute: float,
+        max_queue: int,
+        queue_timeout: float
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.retries = 0
+        self._wait_times: deque = deque(maxlen=512)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one admission slot for the duration of a model call.
+
+        Raises:
+            ModelBusyError: If the wait queue is full or the deadline passes
+        """
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ModelBusyError(f"Too many requests waiting for {self.model}")
+
+        self.waiting += 1
+        queued_at = time.monotonic()
+        deadline = queued_at + self.queue_timeout
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise ModelBusyError(f"Timed out waiting for {self.model}")
+
+            try:
+                await self._bucket.acquire(deadline)
+            except ModelBusyError:
+                self._semaphore.release()
+                self.rejected += 1
+                raise
+        finally:
+            self.waiting -= 1
+
+        self._wait_times.append(time.monotonic() - queued_at)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait time and admission counters."""
+        waits = sorted(self._wait_times)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "avg_wait_ms": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_ms": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "max_wait_ms": 1000 * waits[-1] if waits else 0.0
+        }
+
+
+class ModelScheduler:
+    """
+    Schedules model calls through per-model limiters.
+
+    Each call waits for a concurrency slot and a rate-limit token, and is
+    retried with jittered exponential backoff on 429/503 responses.
+    """
+
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_retries: Retries after a 429/503 before giving up
+            base_delay: Backoff delay before the first retry, in seconds
+            max_delay: Upper bound for a single backoff delay, in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def register(
+        self,
+        model: str,
+        max_concurrency: int,
+        requests_per_minute: float,
+        max_queue: int,
+        queue_timeout: float
+    ) -> None:
+        """Configure the limits for a model."""
+        self._limiters[model] = ModelLimiter(
+            model, max_concurrency, requests_per_minute, max_queue, queue_timeout
+        )
+
+    def _limiter(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            raise KeyError(f"No limits registered for model {model}")
+        return limiter
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a single model request under the model's limits.
+
+        Args:
+            model: Model name the request targets
+            request: Creates the awaitable for one attempt
+
+        Returns:
+            The request's result
+        """
+        limiter = self._limiter(model)
+        attempt = 0
+        while True:
+            async with limiter.slot():
+                try:
+                    return await request()
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    logger.warning(f"{model} returned {e.code}, retrying (attempt {attempt + 1})")
+
+            limiter.retries += 1
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    async def stream(self, model: str, request: Callable[[], Awaitable[AsyncIterator[T]]]) -> AsyncGenerator[T, None]:
+        """
+        Run a streaming model request under the model's limits.
+
+        The slot is held until the stream ends. Retries only happen if the
+        request fails before the first item was produced.
+
+        Args:
+            model: Model name the request targets
+            request: Creates the awaitable stream for one attempt
+
+        Yields:
+            Items from the upstream stream
+        """
+        limiter = self._limiter(model)
+        attempt = 0
+        while True:
+            async with limiter.slot():
+                started = False
+                try:
+                    async for item in await request():
+                        started = True
+                        yield item
+                    return
+                except Exception as e:
+                    if started or not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    logger.warning(f"{model} stream returned {e.code}, retrying (attempt {attempt + 1})")
+
+            limiter.retries += 1
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get statistics for every registered model."""
+        return {model: limiter.get_stats() for model, limiter in self._limiters.items()}
+
+
+def _percentile(samples: deque, fraction: float) -> float:
+    """Get a percentile of recorded durations, in milliseconds."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return 1000 * ordered[int(fraction * (len(ordered) - 1))]
+
+
+class Lane:
+    """
+    Worker budget for one class of work, shared fairly across sessions.
+
+    When all workers are busy, waiting requests are queued per session and
+    served round-robin, and a session never holds more than its share of
+    workers, so one busy visitor cannot starve everyone else.
+    """
+
+    def __init__(self, name: str, workers: int, max_per_session: int, queue_timeout: float):
+        """
+        Initialize the lane.
+
+        Args:
+            name: Lane name (e.g. "text" or "image")
+            workers: Number of requests that may run at once
+            max_per_session: Maximum concurrent requests for a single session
+            queue_timeout: Seconds a request may wait for a worker
+        """
+        self.name = name
+        self.workers = workers
+        self.max_per_session = max_per_session
+        self.queue_timeout = queue_timeout
+
+        self.running = 0
+        self._running_by_session: Dict[str, int] = {}
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+        self.waiting = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self._wait_times: deque = deque(maxlen=512)
+        self._run_times: deque = deque(maxlen=512)
+
+    def _can_run(self, session_id: str) -> bool:
+        return (
+            self.running < self.workers
+            and self._running_by_session.get(session_id, 0) < self.max_per_session
+        )
+
+    def _start(self, session_id: str) -> None:
+        self.running += 1
+        self._running_by_session[session_id] = self._running_by_session.get(session_id, 0) + 1
+
+    def _finish(self, session_id: str) -> None:
+        self.running -= 1
+        remaining = self._running_by_session[session_id] - 1
+        if remaining:
+            self._running_by_session[session_id] = remaining
+        else:
+            del self._running_by_session[session_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free workers to waiting sessions in round-robin order."""
+        for session_id in list(self._waiting.keys()):
+            if self.running >= self.workers:
+                return
+            if not self._can_run(session_id):
+                continue
+
+            waiters = self._waiting.pop(session_id)
+            waiter = waiters.popleft()
+            self.waiting -= 1
+            if waiters:
+                # Re-queue behind the other sessions
+                self._waiting[session_id] = waiters
+
+            self._start(session_id)
+            waiter.set_result(None)
+
+    def _remove_waiter(self, session_id: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiting.get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.waiting -= 1
+            if not waiters:
+                del self._waiting[session_id]
+
+    @asynccontextmanager
+    async def slot(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Hold one worker of this lane on behalf of a session.
+
+        Raises:
+            ModelBusyError: If no worker frees up before the queue timeout
+        """
+        queued_at = time.monotonic()
+
+        # Waiters only remain while workers are busy or their sessions are at their cap
+        if session_id not in self._waiting and self._can_run(session_id):
+            self._start(session_id)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(session_id, deque()).append(waiter)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # A worker was granted just as we gave up - hand it back
+                    self._finish(session_id)
+                else:
+                    waiter.cancel()
+                    self._remove_waiter(session_id, waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.rejected += 1
+                    raise ModelBusyError(f"Timed out waiting for the {self.name} lane")
+                raise
+
+        started_at = time.monotonic()
+        self._wait_times.append(started_at - queued_at)
+        try:
+            yield
+        finally:
+            self._run_times.append(time.monotonic() - started_at)
+            self.completed += 1
+            self._finish(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker usage and latency for this lane."""
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "waiting_sessions": len(self._waiting),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_p50_ms": _percentile(self._wait_times, 0.5),
+            "wait_p95_ms": _percentile(self._wait_times, 0.95),
+            "run_p50_ms": _percentile(self._run_times, 0.5),
+            "run_p95_ms": _percentile(self._run_times, 0.95)
+        }
+
+
+class LaneScheduler:
+    """Separate worker lanes for different classes of work (text turns, image jobs)."""
+
+    def __init__(self):
+        self._lanes: Dict[str, Lane] = {}
+
+    def add_lane(self, name: str, workers: int, max_per_session: int, queue_timeout: float) -> None:
+        """Configure a lane."""
+        self._lanes[name] = Lane(name, workers, max_per_session, queue_timeout)
+
+    def slot(self, lane: str, session_id: str):
+        """Hold one worker of a lane on behalf of a session."""
+        return self._lanes[lane].slot(session_id)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get statistics for every lane."""
+        return {name: lane.get_stats() for name, lane in self._lanes.items()}
@@ -0,0 +1,236 @@
+"""
+Per-connection outbound queue drained by a dedicated writer task.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Union
+from fastapi import WebSocket
+from models.websocket import ChatResponseChunk
+from services.serialization import OutboundFrame
+from services.wire_codec import JSON_CODEC, Outbound
+
+logger = logging.getLogger(__name__)
+
+
+class _Frame:
+    """One queued outbound frame."""
+
+    __slots__ = ("payload", "message", "enqueued_at", "on_sent", "sealed")
+
+    def __init__(
+        self,
+        payload: Union[str, bytes, None],
+        message: Optional[Outbound],
+        enqueued_at: float,
+        on_sent: Optional[Callable[[], None]]
+    ):
+        self.payload = payload
+        # Content chunks stay unencoded until they are sent, so later chunks can be merged in
+        self.message = message
+        self.enqueued_at = enqueued_at
+        self.on_sent = on_sent
+        self.sealed = False
+
+
+def _chunk_key(message: Outbound) -> Optional[str]:
+    """Get the message id of a chat content_chunk frame, or None for any other frame."""
+    if isinstance(message, OutboundFrame):
+        if message.envelope.type == "chat_response" and isinstance(message.model, ChatResponseChunk):
+            return message.model.message_id
+        return None
+    if not isinstance(message, dict):
+        return None
+    data = message.get("data")
+    if message.get("type") == "chat_response" and isinstance(data, dict) and data.get("type") == "content_chunk":
+        return data.get("message_id")
+    return None
+
+
+class Outbox:
+    """
+    Bounded outbound queue for one WebSocket connection, drained by its own writer task.
+
+    Every send to the connection goes through here, so frames keep their order
+    and only one task ever writes to the socket. Consecutive content_chunk
+    frames of the same message are merged while they wait: the writer holds a
+    lone chunk for up to the coalescing window so that tokens arriving in quick
+    succession leave as one frame. Producers sending with `send` wait while the
+    queue is full (backpressure); fan-out uses the non-blocking `offer`.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int,
+        coalesce_window: float,
+        on_failed: Callable[["Outbox"], None],
+        codec=JSON_CODEC
+    ):
+        """
+        Initialize the outbox and start its writer.
+
+        Args:
+            websocket: Connection to write to
+            max_size: Frames queued before producers have to wait
+            coalesce_window: Seconds a lone content chunk is held for merging
+            on_failed: Called when a send raises; the outbox is unusable afterwards
+            codec: Wire codec negotiated for the connection (see services.wire_codec)
+        """
+        self.websocket = websocket
+        self.max_size = max_size
+        self.coalesce_window = coalesce_window
+        self.on_failed = on_failed
+        self.codec = codec
+        self.frames: Deque[_Frame] = deque()
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+
+        self.sent = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+        self.writer = asyncio.create_task(self._write())
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def lag(self, now: float) -> float:
+        """Seconds the oldest unsent frame has been waiting."""
+        return now - self.frames[0].enqueued_at if self.frames else 0.0
+
+    def offer(self, payload: Union[str, bytes], on_sent: Optional[Callable[[], None]] = None) -> None:
+        """
+        Queue an encoded frame without waiting, even past the size limit.
+
+        Args:
+            payload: Frame encoded with this outbox's codec
+            on_sent: Called once the frame has been sent or dropped
+        """
+        self._append(_Frame(payload, None, time.monotonic(), on_sent))
+
+    async def send(self, message: Outbound, timeout: float) -> bool:
+        """
+        Queue a message, waiting while the queue is full.
+
+        Args:
+            message: Message dictionary, model or enveloped model to send
+            timeout: Seconds to wait for space before giving up
+
+        Returns:
+            False if the outbox is closed or stayed full for the whole timeout
+        """
+        chunk_key = _chunk_key(message)
+        if chunk_key is not None and self._merge(chunk_key, message):
+            return True
+
+        if len(self.frames) >= self.max_size:
+            self.throttled += 1
+            deadline = time.monotonic() + timeout
+            while len(self.frames) >= self.max_size and not self.closed:
+                self._space.clear()
+                try:
+                    await asyncio.wait_for(self._space.wait(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    return False
+
+        if self.closed:
+            return False
+        if chunk_key is not None:
+            self._append(_Frame(None, dict(message) if isinstance(message, dict) else message, time.monotonic(), None))
+        else:
+            self._append(_Frame(self.codec.encode(message), None, time.monotonic(), None))
+        return True
+
+    def _merge(self, chunk_key: str, message: Outbound) -> bool:
+        """Append a content chunk to the queued chunk of the same message, if it is last in line."""
+        if not self.frames:
+            return False
+        tail = self.frames[-1]
+        if tail.sealed or type(tail.message) is not type(message) or _chunk_key(tail.message) != chunk_key:
+            return False
+
+        if isinstance(message, OutboundFrame):
+            chunk = message.model
+            tail.message = OutboundFrame(message.envelope, tail.message.model.model_copy(update={
+                "content": tail.message.model.content + chunk.content,
+                "is_final": chunk.is_final,
+                "timestamp": chunk.timestamp
+            }))
+        else:
+            data = message["data"]
+            tail.message["data"] = {
+                **tail.message["data"],
+                "content": tail.message["data"]["content"] + data.get("content", ""),
+                "is_final": data.get("is_final", False),
+                "timestamp": data.get("timestamp")
+            }
+        self.coalesced += 1
+        return True
+
+    def _append(self, frame: _Frame) -> None:
+        if self.closed:
+            if frame.on_sent:
+                frame.on_sent()
+            return
+        self.frames.append(frame)
+        self._ready.set()
+
+    async def _write(self) -> None:
+        """Send queued frames in order until the outbox is closed."""
+        try:
+            while True:
+                if not self.frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+
+                frame = self.frames[0]
+                if frame.message is not None and len(self.frames) == 1:
+                    # Give the producer a moment to add more of this message
+                    remaining = frame.enqueued_at + self.coalesce_window - time.monotonic()
+                    if remaining > 0:
+                        await asyncio.sleep(remaining)
+
+                frame.sealed = True
+                payload = frame.payload if frame.payload is not None else self.codec.encode(frame.message)
+                if self.codec.binary:
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+
+                self.frames.popleft()
+                self.sent += 1
+                if frame.on_sent:
+                    frame.on_sent()
+                if len(self.frames) < self.max_size:
+                    self._space.set()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to send message to WebSocket: {str(e)}")
+            self.on_failed(self)
+
+    def close(self) -> None:
+        """Stop the writer, drop the queued frames and release waiting producers."""
+        self.closed = True
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        while self.frames:
+            frame = self.frames.popleft()
+            if frame.on_sent:
+                frame.on_sent()
+        self._space.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get writer counters."""
+        return {
+            "queued": len(self.frames),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled
+        }
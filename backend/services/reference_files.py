@@ -0,0 +1,168 @@
+"""
+Reuse of Gemini Files API uploads for repeated reference images.
+"""
+
+import io
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from google import genai
+from google.genai import errors, types
+
+logger = logging.getLogger(__name__)
+
+
+def is_file_reference_error(error: Exception) -> bool:
+    """Check whether an upstream error means a referenced uploaded file is gone or unusable."""
+    return (
+        isinstance(error, errors.ClientError)
+        and error.code in (400, 403, 404)
+        and "file" in str(error).lower()
+    )
+
+
+class ReferenceFileCache:
+    """
+    Uploads reference images once through the Files API and reuses their URIs.
+
+    URIs are cached by content hash until shortly before the uploaded file
+    expires, so repeated edit turns send a small file_data part instead of the
+    image bytes. Images below a size threshold, and any image whose upload
+    fails, are sent inline.
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        ttl_seconds: float,
+        min_bytes: int,
+        max_entries: int,
+        enabled: bool = True
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            client: Gen AI client
+            ttl_seconds: Longest time an upload is reused (the Files API keeps files for 48 hours)
+            min_bytes: Images smaller than this are always sent inline
+            max_entries: Maximum number of cached URIs
+            enabled: When False, every image is sent inline
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.min_bytes = min_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        # content hash -> (file URI, MIME type, reuse deadline)
+        self._entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+        self.uploads = 0
+        self.reused = 0
+        self.inline = 0
+
+    async def get_part(self, content: bytes, mime_type: str, content_hash: str) -> types.Part:
+        """
+        Get a model part for a reference image.
+
+        Args:
+            content: Image bytes
+            mime_type: Image MIME type
+            content_hash: SHA-256 hex digest identifying the content
+
+        Returns:
+            A file_data part referencing the uploaded image, or an inline part
+        """
+        if not self.enabled or len(content) < self.min_bytes:
+            self.inline += 1
+            return types.Part.from_bytes(data=content, mime_type=mime_type)
+
+        entry = self._lookup(content_hash)
+        if entry is None:
+            lock = self._locks.setdefault(content_hash, asyncio.Lock())
+            try:
+                async with lock:
+                    # Another turn may have uploaded the same image while we waited
+                    entry = self._lookup(content_hash)
+                    if entry is None:
+                        entry = await self._upload(content, mime_type, content_hash)
+                    else:
+                        self.reused += 1
+            finally:
+                if not lock.locked():
+                    self._locks.pop(content_hash, None)
+        else:
+            self.reused += 1
+
+        if entry is None:
+            self.inline += 1
+            return types.Part.from_bytes(data=content, mime_type=mime_type)
+
+        file_uri, file_mime_type, _ = entry
+        return types.Part.from_uri(file_uri=file_uri, mime_type=file_mime_type)
+
+    def _lookup(self, content_hash: str) -> Optional[Tuple[str, str, float]]:
+        """Get a cached upload that can still be reused."""
+        entry = self._entries.get(content_hash)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del self._entries[content_hash]
+            return None
+        self._entries.move_to_end(content_hash)
+        return entry
+
+    async def _upload(self, content: bytes, mime_type: str, content_hash: str) -> Optional[Tuple[str, str, float]]:
+        """Upload an image and cache its URI, returning None on failure."""
+        try:
+            uploaded = await self.client.aio.files.upload(
+                file=io.BytesIO(content),
+                config=types.UploadFileConfig(mime_type=mime_type, display_name=f"reference-{content_hash[:16]}")
+            )
+            if uploaded.state == types.FileState.PROCESSING:
+                uploaded = await self._wait_until_active(uploaded)
+            if uploaded.state in (types.FileState.PROCESSING, types.FileState.FAILED) or not uploaded.uri:
+                raise RuntimeError(f"File {uploaded.name} is not usable (state {uploaded.state})")
+        except Exception as e:
+            logger.warning(f"Reference image upload failed, sending inline: {str(e)}")
+            return None
+
+        deadline = time.time() + self.ttl_seconds
+        if uploaded.expiration_time:
+            # Stop reusing the file an hour before the API deletes it
+            deadline = min(deadline, uploaded.expiration_time.timestamp() - 3600)
+
+        entry = (uploaded.uri, uploaded.mime_type or mime_type, deadline)
+        self._entries[content_hash] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        self.uploads += 1
+        logger.info(f"Uploaded reference image {content_hash[:12]} as {uploaded.name}")
+        return entry
+
+    async def _wait_until_active(self, uploaded: types.File, timeout: float = 10.0) -> types.File:
+        """Poll a freshly uploaded file until the API has finished processing it."""
+        deadline = time.monotonic() + timeout
+        while uploaded.state == types.FileState.PROCESSING and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+            uploaded = await self.client.aio.files.get(name=uploaded.name)
+        return uploaded
+
+    def invalidate(self, content_hash: str) -> None:
+        """Forget an upload the model rejected (e.g. deleted or expired early)."""
+        self._entries.pop(content_hash, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get upload reuse statistics."""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "uploads": self.uploads,
+            "reused": self.reused,
+            "inline": self.inline
+        }
@@ -0,0 +1,104 @@
+"""
+Exact-match cache for AI chat responses.
+"""
+
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a user message for cache lookups.
+
+    Case, repeated whitespace and trailing punctuation are ignored, so
+    "Who are you?" and "who are you" share a cache entry.
+    """
+    normalized = _WHITESPACE.sub(" ", message.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", normalized)
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of AI responses with a time-to-live."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            ttl: Seconds a cached response stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(message: str, history: List[str], system_instruction: str, model: str) -> str:
+        """
+        Build a cache key for a chat turn.
+
+        Args:
+            message: User's message
+            history: History lines that will be sent with the prompt
+            system_instruction: System instruction for the model
+            model: Model name
+
+        Returns:
+            Hex digest identifying the turn
+        """
+        digest = hashlib.sha256()
+        for part in (model, system_instruction, *history):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        digest.update(normalize_message(message).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss or expired entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response, evicting the least recently used entries if full."""
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
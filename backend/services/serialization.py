@@ -0,0 +1,77 @@
+"""
+Fast JSON serialization of outbound WebSocket messages.
+"""
+
+from typing import Any, Dict, Optional, Union
+
+import orjson
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    """Serialize values orjson does not handle natively (pydantic models nested in dicts)."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    """Encode a dictionary (or any JSON value) with orjson."""
+    return orjson.dumps(value, default=_default).decode()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode JSON text or bytes with orjson."""
+    return orjson.loads(data)
+
+
+class Envelope:
+    """
+    A reusable `{"type": ..., "data": ...}` wrapper with its JSON prefix pre-encoded.
+
+    Wrapping a model yields an OutboundFrame, whose JSON is the cached prefix
+    followed by the model's own model_dump_json output, so the model is never
+    turned into an intermediate dict on the JSON path.
+    """
+
+    def __init__(self, type: str):
+        self.type = type
+        self._prefix = '{"type":' + dumps(type) + ',"data":'
+
+    def wrap(self, data: Union[BaseModel, Dict[str, Any]]) -> Union["OutboundFrame", Dict[str, Any]]:
+        """
+        Put a payload in the envelope.
+
+        Args:
+            data: A message model, or an already built dictionary
+
+        Returns:
+            An OutboundFrame for models, a plain dictionary otherwise
+        """
+        if isinstance(data, BaseModel):
+            return OutboundFrame(self, data)
+        return {"type": self.type, "data": data}
+
+
+class OutboundFrame:
+    """A message model in an envelope, encoded lazily and at most once per format."""
+
+    __slots__ = ("envelope", "model", "_json")
+
+    def __init__(self, envelope: Envelope, model: BaseModel):
+        self.envelope = envelope
+        self.model = model
+        self._json: Optional[str] = None
+
+    def to_json(self) -> str:
+        if self._json is None:
+            self._json = self.envelope._prefix + self.model.model_dump_json() + "}"
+        return self._json
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": self.envelope.type, "data": self.model.model_dump()}
+
+
+# Envelopes of the chat and group chat endpoints
+CHAT_RESPONSE = Envelope("chat_response")
+GROUP_CHAT_RESPONSE = Envelope("group_chat_response")
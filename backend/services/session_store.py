@@ -0,0 +1,197 @@
+"""
+Per-session conversation state for the AI chat.
+"""
+
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, AsyncIterator, Any
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """Conversation history and image context for a single visitor session."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+        # Chat history storage - in production, this would be persisted
+        self.chat_history: List[Dict[str, str]] = []
+
+        # Context tracking for smart image generation
+        self.last_generated_image_id: Optional[str] = None  # Image store id of the last generated image
+        self.last_generated_image_mime_type: Optional[str] = None
+        self.last_generation_prompt: Optional[str] = None  # Store the prompt that created it
+        self.last_message_was_generation: bool = False  # Track if last response included image generation
+
+        # Rolling summary of turns that no longer fit the prompt window
+        self.summary: Optional[str] = None
+        self.summary_task: Optional[asyncio.Task] = None
+        self.summary_retry_at = 0.0  # Monotonic time before which a failed summary is not retried
+
+        # Serializes turns so concurrent messages cannot interleave on the same history
+        self.lock = asyncio.Lock()
+        self.active_turns = 0
+
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+        self.size_bytes = 0
+
+    def estimate_size(self) -> int:
+        """Estimate the memory held by this session's history and image context."""
+        size = 0
+        for entry in self.chat_history:
+            for value in entry.values():
+                size += len(value)
+        if self.last_generation_prompt:
+            size += len(self.last_generation_prompt)
+        if self.summary:
+            size += len(self.summary)
+        return size
+
+    def reset(self) -> None:
+        """Clear the conversation and image context."""
+        self.chat_history = []
+        self.summary = None
+        if self.summary_task and not self.summary_task.done():
+            self.summary_task.cancel()
+        self.summary_task = None
+        self.summary_retry_at = 0.0
+        self.last_generated_image_id = None
+        self.last_generated_image_mime_type = None
+        self.last_generation_prompt = None
+        self.last_message_was_generation = False
+
+
+class SessionStore:
+    """
+    Bounded store of chat sessions.
+
+    Sessions are kept in LRU order. Idle sessions and, once the global memory
+    budget or session cap is exceeded, the least recently used sessions are
+    evicted. Sessions with a turn in progress are never evicted.
+    """
+
+    def __init__(self, max_sessions: int, memory_budget_bytes: int, idle_timeout: float):
+        """
+        Initialize the session store.
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory
+            memory_budget_bytes: Global memory budget across all sessions
+            idle_timeout: Seconds of inactivity after which a session is evicted
+        """
+        self.max_sessions = max_sessions
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_timeout = idle_timeout
+
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._total_bytes = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """Get an existing session without creating one."""
+        return self._sessions.get(session_id)
+
+    def get_or_create(self, session_id: str) -> ChatSession:
+        """
+        Get a session by ID, creating it if needed, and mark it most recently used.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            The chat session
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.evict_idle()
+            session = ChatSession(session_id)
+            self._sessions[session_id] = session
+            self._enforce_budget()
+            logger.info(f"Created chat session {session_id}. Total sessions: {len(self._sessions)}")
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+        return session
+
+    @asynccontextmanager
+    async def session_turn(self, session_id: str) -> AsyncIterator[ChatSession]:
+        """
+        Run one conversation turn with exclusive access to a session.
+
+        Args:
+            session_id: Session identifier
+
+        Yields:
+            The chat session, locked for the duration of the turn
+        """
+        session = self.get_or_create(session_id)
+        session.active_turns += 1
+        try:
+            async with session.lock:
+                yield session
+        finally:
+            session.active_turns -= 1
+            session.last_active = time.monotonic()
+            self.update_size(session)
+
+    def update_size(self, session: ChatSession) -> None:
+        """Recompute a session's memory footprint and enforce the global budget."""
+        if self._sessions.get(session.session_id) is not session:
+            return
+        new_size = session.estimate_size()
+        self._total_bytes += new_size - session.size_bytes
+        session.size_bytes = new_size
+        self._enforce_budget()
+
+    def remove(self, session_id: str) -> None:
+        """Remove a session from the store."""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size_bytes
+
+    def evict_idle(self) -> int:
+        """
+        Evict sessions that have been idle longer than the idle timeout.
+
+        Returns:
+            Number of sessions evicted
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_active < cutoff and session.active_turns == 0
+        ]
+        for session_id in idle:
+            self.remove(session_id)
+        self.evictions += len(idle)
+        if idle:
+            logger.info(f"Evicted {len(idle)} idle chat sessions")
+        return len(idle)
+
+    def _enforce_budget(self) -> None:
+        """Evict least recently used sessions until the store is within its limits."""
+        if len(self._sessions) <= self.max_sessions and self._total_bytes <= self.memory_budget_bytes:
+            return
+
+        for session_id in list(self._sessions.keys()):
+            if len(self._sessions) <= self.max_sessions and self._total_bytes <= self.memory_budget_bytes:
+                break
+            if self._sessions[session_id].active_turns > 0:
+                continue
+            self.remove(session_id)
+            self.evictions += 1
+            logger.info(f"Evicted chat session {session_id} to stay within memory budget")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session store statistics."""
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self._total_bytes,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "evictions": self.evictions
+        }
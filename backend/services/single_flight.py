@@ -0,0 +1,109 @@
+"""
+Single-flight coalescing of identical in-flight model streams.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One upstream stream shared by every subscriber with the same key."""
+
+    def __init__(self, key: str, source: AsyncIterator[Any]):
+        self.key = key
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        """Read the upstream stream and wake subscribers on every event."""
+        try:
+            async for event in source:
+                self.events.append(event)
+                async with self.changed:
+                    self.changed.notify_all()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self.changed:
+                self.changed.notify_all()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests for the same key onto one upstream stream.
+
+    The first caller starts the upstream generation; later callers with the
+    same key attach to it and receive every event from the beginning. The
+    upstream is cancelled only when its last subscriber goes away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def stream(self, key: str, source_factory: Callable[[], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """
+        Stream events for a key, sharing the upstream with concurrent callers.
+
+        Args:
+            key: Identity of the request (e.g. the response cache key)
+            source_factory: Creates the upstream async iterator if no flight is running
+
+        Yields:
+            Upstream events, replayed from the start for late subscribers
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key, source_factory())
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Attached to in-flight generation ({flight.subscribers} other subscribers)")
+
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index < len(flight.events):
+                    yield flight.events[index]
+                    index += 1
+                if flight.done:
+                    break
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: flight.done or len(flight.events) > index)
+
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Last subscriber left - nobody needs the upstream anymore
+                flight.task.cancel()
+                self._forget(flight)
+
+    def _forget(self, flight: _Flight) -> None:
+        """Drop a finished or abandoned flight so new requests start fresh."""
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get single-flight statistics."""
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
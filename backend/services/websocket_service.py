@@ -2,86 +2,182 @@
 WebSocket connection management service.
 """
 
-import json
+import time
+import uuid
 import logging
-from typing import Dict, List
-from fastapi import WebSocket
-from models.websocket import WebSocketMessage, ErrorMessage
+from typing import Any, Dict, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from models.websocket import WebSocketMessage, ErrorMessage, InboundMessage
+from services.fanout import FanoutEngine
+from services.wire_codec import JSON_CODEC, Outbound, negotiate_codec
+from config.settings import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class Connection:
+    """Registry record for one WebSocket connection."""
+    
+    __slots__ = (
+        "connection_id", "websocket", "endpoint", "codec", "session_id", "room_id", "connected_at", "data",
+        "last_seen", "ping_id", "ping_sent_at", "rtt"
+    )
+    
+    def __init__(self, websocket: WebSocket, endpoint: str, codec=JSON_CODEC):
+        self.connection_id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.endpoint = endpoint
+        # Wire encoding negotiated through the WebSocket subprotocol
+        self.codec = codec
+        # Each connection gets its own chat session unless the client names one
+        self.session_id = str(uuid.uuid4())
+        self.room_id: Optional[str] = None
+        self.connected_at = time.time()
+        # Handler-specific state (e.g. the sessions whose image jobs report here)
+        self.data: dict = {}
+        # Liveness, maintained by the receive loop and the heartbeat scheduler (monotonic clock)
+        self.last_seen = time.monotonic()
+        self.ping_id: Optional[str] = None
+        self.ping_sent_at = 0.0
+        self.rtt: Optional[float] = None
+        
+    def describe(self) -> dict:
+        """Get the record's metadata for diagnostics."""
+        return {
+            "connection_id": self.connection_id,
+            "endpoint": self.endpoint,
+            "protocol": self.codec.name,
+            "session_id": self.session_id,
+            "room_id": self.room_id,
+            "connected_at": self.connected_at,
+            "idle_seconds": round(time.monotonic() - self.last_seen, 3),
+            "rtt_ms": round(self.rtt * 1000, 3) if self.rtt is not None else None
+        }
 
 
 class WebSocketService:
     """Service for managing WebSocket connections and message broadcasting."""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.connection_data: Dict[WebSocket, dict] = {}
+        # Registry indexed both ways so every lookup is O(1)
+        self.connections: Dict[str, Connection] = {}  # connection_id -> Connection
+        self._by_socket: Dict[WebSocket, Connection] = {}
+        # Owns each connection's outbound writer; shared by every broadcast path (including group chat rooms)
+        self.fanout = FanoutEngine(
+            max_queue_size=settings.websocket_outbound_queue_size,
+            max_lag=settings.websocket_max_send_lag,
+            coalesce_window=settings.websocket_chunk_coalesce_window
+        )
+        
+    async def connect(self, websocket: WebSocket) -> Connection:
+        """
+        Accept a new WebSocket connection and register it.
+        
+        The wire encoding is negotiated from the subprotocols the client
+        offers: "msgpack.v1" selects binary MessagePack frames, anything else
+        (or nothing) keeps text JSON.
+        """
+        codec, subprotocol = negotiate_codec(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        return self.register(websocket, codec)
+        
+    def register(self, websocket: WebSocket, codec=JSON_CODEC) -> Connection:
+        """
+        Add an accepted WebSocket connection to the registry.
+        
+        Args:
+            websocket: Accepted WebSocket connection
+            codec: Wire codec negotiated for the connection
+            
+        Returns:
+            The connection's registry record
+        """
+        connection = Connection(websocket, websocket.scope.get("path", ""), codec)
+        self.connections[connection.connection_id] = connection
+        self._by_socket[websocket] = connection
+        self.fanout.open(websocket, codec)
+        logger.info(f"New WebSocket connection {connection.connection_id} on {connection.endpoint} ({codec.name}). Total: {len(self.connections)}")
+        return connection
+        
+    async def receive_message(self, websocket: WebSocket) -> InboundMessage:
+        """
+        Receive and validate the next message from a connection.
         
-    async def connect(self, websocket: WebSocket) -> None:
-        """Accept a new WebSocket connection."""
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        self.connection_data[websocket] = {}
-        logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
+        Text frames are parsed as JSON and binary frames with the
+        connection's codec, straight into the matching inbound message model.
+        The connection is marked as seen, even if the frame is invalid.
+        
+        Args:
+            websocket: Registered WebSocket connection
+            
+        Returns:
+            Validated inbound message model
+            
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+            InvalidMessageError: If the frame is not a valid client message
+        """
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+        
+        connection = self._by_socket.get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+        if frame.get("text") is not None:
+            return JSON_CODEC.parse(frame["text"])
+        return (connection.codec if connection else JSON_CODEC).parse(frame["bytes"])
         
     def disconnect(self, websocket: WebSocket) -> None:
         """Remove a WebSocket connection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if websocket in self.connection_data:
-            del self.connection_data[websocket]
-        logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
+        connection = self._by_socket.pop(websocket, None)
+        self.fanout.release(websocket)
+        if connection is None:
+            return
+        del self.connections[connection.connection_id]
+        logger.info(f"WebSocket {connection.connection_id} disconnected. Total: {len(self.connections)}")
         
-    async def send_message(self, message: dict, websocket: WebSocket) -> bool:
+    async def send_message(self, message: Outbound, websocket: WebSocket) -> bool:
         """
         Send a message to a specific WebSocket connection.
         
+        The message is queued on the connection's outbox and written by its
+        writer task. This waits while the outbox is full, so producers slow
+        down to the client's pace; consecutive content chunks may be merged.
+        
         Args:
-            message: Message dictionary to send
+            message: Message dictionary or model to send
             websocket: Target WebSocket connection
             
         Returns:
-            bool: True if message sent successfully, False otherwise
+            bool: True if message was queued, False if the connection is gone
         """
-        try:
-            await websocket.send_text(json.dumps(message))
-            return True
-        except Exception as e:
-            logger.warning(f"Failed to send message to WebSocket: {str(e)}")
-            self.disconnect(websocket)
+        if websocket not in self._by_socket:
             return False
+        if await self.fanout.send(message, websocket):
+            return True
+        self.disconnect(websocket)
+        return False
             
-    async def broadcast(self, message: dict, exclude: WebSocket = None) -> int:
+    async def broadcast(self, message: Outbound, exclude: WebSocket = None) -> int:
         """
         Broadcast a message to all connected clients.
         
+        The message is serialized once per wire codec and queued for every
+        recipient, so slow clients do not hold up the others (see FanoutEngine).
+        
         Args:
-            message: Message dictionary to broadcast
+            message: Message dictionary or model to broadcast
             exclude: WebSocket connection to exclude from broadcast
             
         Returns:
-            int: Number of successful deliveries
+            int: Number of connections the message was queued for
         """
-        successful_sends = 0
-        disconnected = []
-        
-        for connection in self.active_connections:
-            if connection == exclude:
-                continue
-                
-            try:
-                await connection.send_text(json.dumps(message))
-                successful_sends += 1
-            except Exception as e:
-                logger.warning(f"Failed to broadcast to connection: {str(e)}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
-            
-        return successful_sends
+        return await self.fanout.publish(
+            message,
+            [websocket for websocket in self._by_socket if websocket is not exclude]
+        )
         
     async def send_error(self, error_msg: str, websocket: WebSocket, 
                         message_id: str = None) -> bool:
@@ -100,23 +196,63 @@ class WebSocketService:
             error=error_msg,
             message_id=message_id
         )
-        return await self.send_message(error_message.dict(), websocket)
+        return await self.send_message(error_message, websocket)
+        
+    def get_stats(self) -> dict:
+        """Get connection and fan-out statistics."""
+        by_endpoint: Dict[str, int] = {}
+        for connection in self.connections.values():
+            by_endpoint[connection.endpoint] = by_endpoint.get(connection.endpoint, 0) + 1
+        return {
+            "connections": len(self.connections),
+            "by_endpoint": by_endpoint,
+            "fanout": self.fanout.get_stats()
+        }
         
     def get_connection_count(self) -> int:
         """Get the number of active connections."""
-        return len(self.active_connections)
+        return len(self.connections)
+        
+    def get_connection(self, websocket: WebSocket) -> Optional[Connection]:
+        """Get the registry record of a WebSocket connection."""
+        return self._by_socket.get(websocket)
+        
+    def get_connection_by_id(self, connection_id: str) -> Optional[Connection]:
+        """Get a registry record by connection id."""
+        return self.connections.get(connection_id)
+        
+    def record_pong(self, websocket: WebSocket, ping_id: Optional[str]) -> None:
+        """Record a client's answer to a server ping and update its round-trip time."""
+        connection = self._by_socket.get(websocket)
+        if connection is None:
+            return
+        connection.last_seen = time.monotonic()
+        if ping_id and ping_id == connection.ping_id:
+            connection.rtt = connection.last_seen - connection.ping_sent_at
+            connection.ping_id = None
         
     def is_connected(self, websocket: WebSocket) -> bool:
         """Check if a WebSocket is still connected."""
-        return websocket in self.active_connections
+        return websocket in self._by_socket
+        
+    def get_session_id(self, websocket: WebSocket) -> str:
+        """Get the chat session ID assigned to a WebSocket connection."""
+        connection = self._by_socket.get(websocket)
+        return connection.session_id if connection else "default"
+        
+    def set_room(self, websocket: WebSocket, room_id: Optional[str]) -> None:
+        """Record the group chat room a connection is in (None after leaving)."""
+        connection = self._by_socket.get(websocket)
+        if connection:
+            connection.room_id = room_id
         
     def get_connection_data(self, websocket: WebSocket) -> dict:
         """Get stored data for a WebSocket connection."""
-        return self.connection_data.get(websocket, {})
+        connection = self._by_socket.get(websocket)
+        return connection.data if connection else {}
         
     def set_connection_data(self, websocket: WebSocket, data: dict) -> None:
         """Set stored data for a WebSocket connection."""
-        if websocket in self.connection_data:
-            self.connection_data[websocket].update(data)
-        else:
-            self.connection_data[websocket] = data
+        connection = self._by_socket.get(websocket)
+        if connection:
+            connection.data.update(data)
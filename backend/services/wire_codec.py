@@ -0,0 +1,212 @@
+"""
+Wire encodings for WebSocket frames, negotiated through the WebSocket subprotocol.
+"""
+
+import logging
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+
+import msgpack
+from pydantic import BaseModel, ValidationError
+from models.websocket import INBOUND_MESSAGE_ADAPTER, InboundMessage
+from services.serialization import OutboundFrame, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Field name -> short tag used by the MessagePack encoding. Tags are reserved:
+# a message must not use a tag as a field name of its own.
+FIELD_TAGS: Dict[str, str] = {
+    "type": "t",
+    "data": "d",
+    "timestamp": "ts",
+    "content": "c",
+    "message_id": "m",
+    "is_final": "f",
+    "full_content": "fc",
+    "error": "e",
+    "session_id": "s",
+    "job_id": "j",
+    "status": "st",
+    "image_id": "ii",
+    "image_url": "iu",
+    "mime_type": "mt",
+    "size": "sz",
+    "attachments": "at",
+    "blob_id": "b",
+    "name": "n",
+    "ping_id": "p",
+    "room_id": "r",
+    "users": "us",
+    "userCount": "uc",
+    "userId": "ui",
+    "sender": "sn",
+    "message": "mg",
+    "replyTo": "rt",
+    "nickname": "nk",
+    "joined_at": "ja",
+    "id": "i",
+    "from": "fr",
+}
+TAG_FIELDS: Dict[str, str] = {tag: field for field, tag in FIELD_TAGS.items()}
+
+# Fields holding client-defined payloads, per message type. They are packed
+# as they are: tags are neither applied to nor stripped from their keys.
+OPAQUE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "broadcast": frozenset({"data"}),
+}
+
+# What codecs can encode: a plain dictionary, a message model, or a model in an envelope
+Outbound = Union[Dict[str, Any], BaseModel, OutboundFrame]
+
+
+class InvalidMessageError(ValueError):
+    """An inbound frame that is not a valid client message."""
+
+    def __init__(self, error: str, message_type: Optional[str] = None, message_id: Optional[str] = None):
+        """
+        Args:
+            error: Description of the problem, suitable for the client
+            message_type: The frame's "type" ("unknown" if missing, None if the frame was unreadable)
+            message_id: The frame's message id, if it had one
+        """
+        super().__init__(error)
+        self.message_type = message_type
+        self.message_id = message_id
+
+
+def _invalid(error: Exception, decode, data: Union[str, bytes]) -> InvalidMessageError:
+    """Describe a rejected frame, recovering its type and message id when it is still readable."""
+    try:
+        message = decode(data)
+    except Exception:
+        message = None
+    if not isinstance(message, dict):
+        reason = "; ".join(e["msg"] for e in error.errors()) if isinstance(error, ValidationError) else str(error)
+        return InvalidMessageError(f"Malformed message: {reason or type(error).__name__}")
+
+    message_type = str(message.get("type", "unknown"))
+    if isinstance(error, ValidationError):
+        # Locations start with the union tag; report the field paths within the message
+        details = "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'][1:]) or 'message'}: {e['msg']}" for e in error.errors()
+        )
+        error = f"Invalid {message_type} message: {details}"
+    return InvalidMessageError(str(error), message_type, message.get("message_id"))
+
+
+def _tag_value(value: Any) -> Any:
+    value_type = type(value)
+    if value_type is dict:
+        return _tag_fields(value)
+    if value_type is list:
+        return [_tag_value(item) for item in value]
+    if isinstance(value, BaseModel):
+        return _tag_fields(value.model_dump())
+    return value
+
+
+def _tag_fields(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace known field names with their tags, in nested messages and models too."""
+    opaque = OPAQUE_FIELDS.get(message.get("type"), ())
+    return {
+        FIELD_TAGS.get(key, key): value if key in opaque else _tag_value(value)
+        for key, value in message.items()
+    }
+
+
+def _untag_value(value: Any) -> Any:
+    value_type = type(value)
+    if value_type is dict:
+        return _untag_fields(value)
+    if value_type is list:
+        return [_untag_value(item) for item in value]
+    return value
+
+
+def _untag_fields(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore field names, leaving the opaque payloads of the message's type untouched."""
+    opaque = OPAQUE_FIELDS.get(message.get(FIELD_TAGS["type"]), ())
+    untagged = {}
+    for key, value in message.items():
+        field = TAG_FIELDS.get(key, key)
+        untagged[field] = value if field in opaque else _untag_value(value)
+    return untagged
+
+
+class JsonCodec:
+    """Text JSON frames, the default for clients that do not ask for another protocol."""
+
+    name = "json"
+    subprotocol: Optional[str] = None
+    binary = False
+
+    def encode(self, message: Outbound) -> str:
+        if isinstance(message, OutboundFrame):
+            return message.to_json()
+        if isinstance(message, BaseModel):
+            return message.model_dump_json()
+        return dumps(message)
+
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        return loads(data)
+
+    def parse(self, data: Union[str, bytes]) -> InboundMessage:
+        """Parse and validate a client frame in one pass."""
+        try:
+            return INBOUND_MESSAGE_ADAPTER.validate_json(data)
+        except ValidationError as e:
+            raise _invalid(e, self.decode, data) from None
+
+
+class MsgpackCodec:
+    """Binary MessagePack frames with short field tags (see FIELD_TAGS)."""
+
+    name = "msgpack"
+    subprotocol = "msgpack.v1"
+    binary = True
+
+    def __init__(self):
+        self._packer = msgpack.Packer(use_bin_type=True)
+
+    def encode(self, message: Outbound) -> bytes:
+        if isinstance(message, OutboundFrame):
+            message = message.to_dict()
+        elif isinstance(message, BaseModel):
+            message = message.model_dump()
+        return self._packer.pack(_tag_fields(message))
+
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        message = msgpack.unpackb(data, raw=False)
+        return _untag_fields(message) if type(message) is dict else message
+
+    def parse(self, data: Union[str, bytes]) -> InboundMessage:
+        """Unpack a client frame and validate it."""
+        try:
+            return INBOUND_MESSAGE_ADAPTER.validate_python(self.decode(data))
+        except ValueError as e:  # ValidationError and malformed MessagePack alike
+            raise _invalid(e, self.decode, data) from None
+
+
+JSON_CODEC = JsonCodec()
+MSGPACK_CODEC = MsgpackCodec()
+
+# Subprotocols the server accepts, in order of preference
+CODECS_BY_SUBPROTOCOL = {
+    MSGPACK_CODEC.subprotocol: MSGPACK_CODEC,
+    "json": JSON_CODEC,
+}
+
+
+def negotiate_codec(offered: List[str]) -> Tuple[Union[JsonCodec, MsgpackCodec], Optional[str]]:
+    """
+    Pick the wire codec for a connection from the subprotocols the client offered.
+
+    Args:
+        offered: Values of the client's Sec-WebSocket-Protocol header
+
+    Returns:
+        Tuple of (codec, subprotocol to confirm in the handshake or None)
+    """
+    for subprotocol, codec in CODECS_BY_SUBPROTOCOL.items():
+        if subprotocol in offered:
+            return codec, subprotocol
+    return JSON_CODEC, None
@@ -0,0 +1,19 @@
+"""
+Shared test setup.
+
+Usage:
+    cd backend
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Settings are read at import time: keep the services off the network and out of ./data
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+for _name in ("ATTACHMENT_STORE_DIR", "GENERATED_IMAGE_STORE_DIR", "IMAGE_RESULT_CACHE_DIR"):
+    os.environ.setdefault(_name, tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.setdefault("IMAGE_RESULT_CACHE_ENABLED", "false")
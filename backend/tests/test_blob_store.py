@@ -0,0 +1,178 @@
+"""
+Tests for the content-addressed blob store and the streaming attachment upload route.
+"""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.api_routes import api_router
+from services.blob_store import (
+    BlobStore,
+    BlobTooLargeError,
+    UploadQuota,
+    get_blob_store,
+    get_image_store,
+    get_upload_quota
+)
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=4096)
+
+    async def run():
+        return [await store.put_bytes(b"same content") for _ in range(2)]
+
+    (first_id, size, first_existed), (second_id, _, second_existed) = asyncio.run(run())
+    assert first_id == second_id == hashlib.sha256(b"same content").hexdigest()
+    assert (size, first_existed, second_existed) == (12, False, True)
+    assert store.get_stats()["entries"] == 1
+    assert asyncio.run(store.read(first_id)) == b"same content"
+
+
+def test_oversized_blob_leaves_no_partial_file(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=8, max_total_bytes=4096)
+
+    with pytest.raises(BlobTooLargeError):
+        asyncio.run(store.put_bytes(b"x" * 9))
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=100, max_total_bytes=250)
+
+    async def run():
+        first, _, _ = await store.put_bytes(b"a" * 100)
+        second, _, _ = await store.put_bytes(b"b" * 100)
+        await store.read(first)  # first is now the most recently used
+        third, _, _ = await store.put_bytes(b"c" * 100)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert store.exists(first) and store.exists(third)
+    assert not store.exists(second)
+    assert store.get_stats()["total_bytes"] == 200
+    assert store.evictions == 1
+
+
+def test_index_is_rebuilt_on_startup(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=100, max_total_bytes=1000)
+    asyncio.run(store.put_bytes(b"kept"))
+    open(os.path.join(tmp_path, "leftover.part"), "wb").close()
+
+    reopened = BlobStore(str(tmp_path), max_blob_bytes=100, max_total_bytes=1000)
+    assert reopened.get_stats()["entries"] == 1
+    assert reopened.total_bytes == 4
+    assert not os.path.exists(os.path.join(tmp_path, "leftover.part"))
+
+
+def test_mime_type_is_recorded_at_write_time(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=100, max_total_bytes=1000)
+
+    async def run():
+        typed, _, _ = await store.put_bytes(b"image", "image/webp")
+        untyped, _, _ = await store.put_bytes(b"other")
+        return await store.mime_type(typed), await store.mime_type(untyped)
+
+    assert asyncio.run(run()) == ("image/webp", None)
+
+
+def make_client(store: BlobStore, quota: UploadQuota = None, image_store: BlobStore = None) -> TestClient:
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[get_blob_store] = lambda: store
+    app.dependency_overrides[get_image_store] = lambda: image_store or store
+    app.dependency_overrides[get_upload_quota] = lambda: quota or UploadQuota(max_bytes=1024 * 1024, window_seconds=60.0)
+    return TestClient(app)
+
+
+def test_upload_streams_file_into_store(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=64 * 1024, max_total_bytes=1024 * 1024)
+    client = make_client(store, UploadQuota(max_bytes=1024 * 1024, window_seconds=60.0))
+    content = os.urandom(40 * 1024)
+
+    response = client.post("/api/attachments", files={"file": ("photo.png", content, "image/png")}, data={"note": "ignored"})
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["blob_id"] == hashlib.sha256(content).hexdigest()
+    assert (data["name"], data["mime_type"], data["size"]) == ("photo.png", "image/png", len(content))
+    assert asyncio.run(store.read(data["blob_id"])) == content
+
+
+def test_upload_declaring_too_large_a_body_is_refused_before_reading(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=1024 * 1024)
+    quota = UploadQuota(max_bytes=1024 * 1024, window_seconds=60.0)
+    client = make_client(store, quota)
+
+    response = client.post(
+        "/api/attachments",
+        content=b"",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": str(10 * 1024 * 1024)}
+    )
+
+    assert response.status_code == 413
+    assert quota.get_stats()["clients"] == 0
+
+
+def test_upload_over_the_blob_limit_is_refused(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=1024 * 1024)
+    client = make_client(store, UploadQuota(max_bytes=1024 * 1024, window_seconds=60.0))
+
+    response = client.post("/api/attachments", files={"file": ("big.bin", b"x" * 4096, "application/octet-stream")})
+
+    assert response.status_code == 413
+    assert store.get_stats()["entries"] == 0
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".part")] == []
+
+
+def test_upload_quota_is_per_client_window(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=64 * 1024, max_total_bytes=1024 * 1024)
+    client = make_client(store, UploadQuota(max_bytes=12 * 1024, window_seconds=60.0))
+
+    first = client.post("/api/attachments", files={"file": ("a.bin", os.urandom(8 * 1024), "application/octet-stream")})
+    second = client.post("/api/attachments", files={"file": ("b.bin", os.urandom(8 * 1024), "application/octet-stream")})
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+
+
+def test_upload_without_file_field_is_rejected(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=1024 * 1024)
+    client = make_client(store, UploadQuota(max_bytes=1024 * 1024, window_seconds=60.0))
+
+    assert client.post("/api/attachments", data={"other": "value"}, files={"other_file": ("a.txt", b"a")}).status_code == 400
+    assert client.post("/api/attachments", json={"file": "x"}).status_code == 400
+
+
+def test_uploaded_content_type_is_recorded(tmp_path):
+    store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=1024 * 1024)
+    client = make_client(store)
+
+    response = client.post("/api/attachments", files={"file": ("photo.jpg", b"jpeg bytes", "image/jpeg")})
+
+    assert asyncio.run(store.mime_type(response.json()["data"]["blob_id"])) == "image/jpeg"
+
+
+def test_generated_image_is_served_with_its_recorded_type(tmp_path):
+    image_store = BlobStore(str(tmp_path), max_blob_bytes=1024, max_total_bytes=1024 * 1024)
+    image_id, _, _ = asyncio.run(image_store.put_bytes(b"0123456789", "image/webp"))
+    client = make_client(image_store)
+
+    # The extension in the URL does not decide the served type
+    response = client.get(f"/api/images/{image_id}.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["etag"] == f'"{image_id}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    partial = client.get(f"/api/images/{image_id}.webp", headers={"Range": "bytes=2-5"})
+    assert partial.status_code == 206
+    assert partial.content == b"2345"
+
+    assert client.get(f"/api/images/{image_id}.webp", headers={"If-None-Match": f'"{image_id}"'}).status_code == 304
+    assert client.get(f"/api/images/{'0' * 64}.png").status_code == 404
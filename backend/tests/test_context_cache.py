@@ -0,0 +1,227 @@
+"""
+Tests for PersonaContextCache against a local fake of client.aio.caches.
+"""
+
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors, types
+
+from services.chat_service import ChatService
+from services.context_cache import PersonaContextCache, is_cache_error
+
+PERSONA = "You are a helpful assistant. " * 200  # ~1500 tokens, above the caching minimum
+TOOLS = [types.Tool(function_declarations=[types.FunctionDeclaration(name="generate_image", description="Draw")])]
+
+
+class FakeCaches:
+    """In-memory stand-in for client.aio.caches."""
+
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.fail_create = None
+        self.ttl_override = None
+
+    def _cached(self, name: str, ttl: str) -> types.CachedContent:
+        seconds = self.ttl_override if self.ttl_override is not None else int(ttl.rstrip("s"))
+        expire_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=seconds)
+        return types.CachedContent(name=name, expire_time=expire_time)
+
+    async def create(self, model, config):
+        if self.fail_create:
+            raise self.fail_create
+        name = f"cachedContents/{len(self.created) + 1}"
+        self.created.append((model, config))
+        return self._cached(name, config.ttl)
+
+    async def update(self, name, config):
+        self.updated.append(name)
+        return self._cached(name, config.ttl)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def make_cache(caches: FakeCaches, **kwargs) -> PersonaContextCache:
+    options = {
+        "client": SimpleNamespace(aio=SimpleNamespace(caches=caches)),
+        "system_instruction": PERSONA,
+        "tools": TOOLS,
+        "ttl_seconds": 3600,
+        "refresh_margin": 300.0,
+        "retry_after": 600.0,
+        "min_tokens": 1024,
+    }
+    options.update(kwargs)
+    return PersonaContextCache(**options)
+
+
+def test_creates_once_and_reuses():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+
+    async def run():
+        return [await cache.get("gemini-2.5-flash") for _ in range(3)]
+
+    names = asyncio.run(run())
+    assert names == ["cachedContents/1"] * 3
+    assert len(caches.created) == 1
+    assert caches.created[0][1].tools == TOOLS
+
+
+def test_concurrent_first_use_creates_one_entry():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+
+    async def run():
+        return await asyncio.gather(*[cache.get("gemini-2.5-flash") for _ in range(5)])
+
+    assert set(asyncio.run(run())) == {"cachedContents/1"}
+    assert len(caches.created) == 1
+
+
+def test_entries_are_per_model_and_tools():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+
+    async def run():
+        return {
+            await cache.get("gemini-2.5-flash"),
+            await cache.get("gemini-2.5-flash", include_tools=False),
+            await cache.get("gemini-2.5-pro"),
+        }
+
+    assert len(asyncio.run(run())) == 3
+    assert caches.created[1][1].tools is None
+
+
+def test_refreshes_close_to_expiry():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+    caches.ttl_override = 60  # Created inside the refresh margin
+
+    async def run():
+        first = await cache.get("gemini-2.5-flash")
+        caches.ttl_override = None
+        second = await cache.get("gemini-2.5-flash")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert caches.updated == [first]
+    assert cache.refreshed == 1
+
+
+def test_recreates_after_expiry():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+    caches.ttl_override = -1  # Already expired
+
+    async def run():
+        first = await cache.get("gemini-2.5-flash")
+        caches.ttl_override = None
+        second = await cache.get("gemini-2.5-flash")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first, second) == ("cachedContents/1", "cachedContents/2")
+    assert caches.updated == []
+
+
+def test_invalidate_recreates_on_next_use():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+
+    async def run():
+        first = await cache.get("gemini-2.5-flash")
+        cache.invalidate("gemini-2.5-flash")
+        return first, await cache.get("gemini-2.5-flash")
+
+    assert asyncio.run(run()) == ("cachedContents/1", "cachedContents/2")
+    assert cache.get_stats()["fallbacks"] == 1
+
+
+def test_failed_create_cools_down(monkeypatch):
+    caches = FakeCaches()
+    cache = make_cache(caches, retry_after=600.0)
+    caches.fail_create = errors.ClientError(400, {"error": {"message": "Cached content is too small", "status": "INVALID_ARGUMENT"}})
+    now = [1000.0]
+    monkeypatch.setattr("services.context_cache.time.time", lambda: now[0])
+
+    async def attempt():
+        return await cache.get("gemini-2.5-flash")
+
+    assert asyncio.run(attempt()) is None
+    caches.fail_create = None
+    now[0] += 300  # Still cooling down: no create call
+    assert asyncio.run(attempt()) is None
+    assert caches.created == []
+
+    now[0] += 301
+    assert asyncio.run(attempt()) == "cachedContents/1"
+    assert cache.fallbacks == 2
+
+
+def test_prefix_below_minimum_never_calls_create():
+    caches = FakeCaches()
+    cache = make_cache(caches, system_instruction="Short persona.")
+
+    async def run():
+        return [await cache.get("gemini-2.5-flash") for _ in range(3)]
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert caches.created == []
+    assert cache.get_stats()["below_minimum"] is True
+
+
+def test_disabled_never_calls_create():
+    caches = FakeCaches()
+    cache = make_cache(caches, enabled=False)
+
+    assert asyncio.run(cache.get("gemini-2.5-flash")) is None
+    assert caches.created == []
+
+
+def test_mode_reports_the_caching_decision():
+    caches = FakeCaches()
+    assert make_cache(caches).mode() == "explicit"
+    assert make_cache(caches, system_instruction="Short persona.").mode() == "below_minimum"
+    assert make_cache(caches, enabled=False).mode() == "disabled"
+
+
+def test_default_persona_is_below_the_minimum():
+    chat = ChatService()
+    stats = chat.context_cache.get_stats()
+
+    # The shipped persona and tools are too small to cache, so the feature is off by default
+    assert stats["mode"] == "disabled"
+    assert stats["below_minimum"] is True
+    assert stats["prefix_tokens"] < stats["min_tokens"]
+
+
+def test_close_deletes_entries():
+    caches = FakeCaches()
+    cache = make_cache(caches)
+
+    async def run():
+        name = await cache.get("gemini-2.5-flash")
+        await cache.close()
+        return name
+
+    assert caches.deleted == [asyncio.run(run())]
+    assert cache.get_stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("error, expected", [
+    (errors.ClientError(404, {"error": {"message": "CachedContent not found", "status": "NOT_FOUND"}}), True),
+    (errors.ClientError(403, {"error": {"message": "Permission denied on cached content", "status": "PERMISSION_DENIED"}}), True),
+    (errors.ClientError(400, {"error": {"message": "Invalid prompt", "status": "INVALID_ARGUMENT"}}), False),
+    (errors.ClientError(429, {"error": {"message": "Cache quota exhausted", "status": "RESOURCE_EXHAUSTED"}}), False),
+    (ValueError("cache"), False),
+])
+def test_is_cache_error(error, expected):
+    assert is_cache_error(error) is expected
@@ -0,0 +1,85 @@
+"""
+Tests for rolling history summarization in ChatService.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import errors
+
+from config.settings import get_settings
+from services.chat_service import ChatService
+
+settings = get_settings()
+
+
+class FakeSummaries:
+    """Chat model stand-in that answers summary requests."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.fail:
+            raise errors.ServerError(500, {"error": {"message": "Internal error", "status": "INTERNAL"}})
+        return SimpleNamespace(text=f"summary {self.calls}")
+
+
+def make_chat(models: FakeSummaries) -> ChatService:
+    chat = ChatService()
+    chat.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    chat.scheduler.max_retries = 0
+    return chat
+
+
+async def add_turns(chat: ChatService, session, count: int) -> None:
+    for turn in range(count):
+        chat._add_to_history(session, f"question {turn}", f"answer {turn}")
+        if session.summary_task:
+            await session.summary_task
+
+
+def test_compaction_runs_every_few_turns_not_every_turn(monkeypatch):
+    monkeypatch.setattr(settings, "chat_history_limit", 10)
+    monkeypatch.setattr(settings, "chat_summary_keep_ratio", 0.5)
+    models = FakeSummaries()
+    chat = make_chat(models)
+    session = chat.sessions.get_or_create("compaction")
+
+    asyncio.run(add_turns(chat, session, 40))
+
+    # Each compaction brings the window down to 5 turns, so it refills every 6 turns
+    assert models.calls == 5
+    assert session.summary == "summary 5"
+    assert 5 <= len(session.chat_history) <= 10
+    assert session.chat_history[-1]["user"] == "question 39"
+
+
+def test_history_is_capped_when_summaries_are_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "chat_summary_enabled", False)
+    monkeypatch.setattr(settings, "chat_history_limit", 10)
+    models = FakeSummaries()
+    chat = make_chat(models)
+    session = chat.sessions.get_or_create("disabled")
+
+    asyncio.run(add_turns(chat, session, 30))
+
+    assert models.calls == 0
+    assert [entry["user"] for entry in session.chat_history] == [f"question {turn}" for turn in range(20, 30)]
+
+
+def test_history_is_capped_when_summaries_keep_failing(monkeypatch):
+    monkeypatch.setattr(settings, "chat_history_limit", 10)
+    monkeypatch.setattr(settings, "chat_history_max_turns", 25)
+    models = FakeSummaries(fail=True)
+    chat = make_chat(models)
+    session = chat.sessions.get_or_create("failing")
+
+    asyncio.run(add_turns(chat, session, 60))
+
+    # A failed summary is not retried on every turn
+    assert models.calls == 1
+    assert len(session.chat_history) == 25
+    assert session.summary is None
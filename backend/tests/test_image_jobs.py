@@ -0,0 +1,96 @@
+"""
+Tests for background image jobs started from a chat turn.
+"""
+
+import asyncio
+
+from services.chat_service import IMAGE_PENDING_REPLY, ChatService
+
+
+async def start_job(chat: ChatService, session, render: asyncio.Event, outcome):
+    """Start an image job whose render waits for render to be set, then collect its events."""
+    events = []
+
+    async def generate_image(prompt, reference_images):
+        await render.wait()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def listener(event):
+        events.append(event)
+
+    chat.generate_image = generate_image
+    chat.image_jobs.subscribe(session.session_id, "test", listener)
+    started = [event async for event in chat._handle_image_generation_tool(session, "draw a cat", {"prompt": "a cat"}, "msg-1")]
+    job = chat.image_jobs._jobs[started[0]["job_id"]]
+    return job, events
+
+
+def test_outcome_fills_the_reserved_history_slot():
+    chat = ChatService()
+    session = chat.sessions.get_or_create("ordering")
+
+    async def run():
+        render = asyncio.Event()
+        job, events = await start_job(chat, session, render, (b"png", "image/png", "A cat."))
+        assert session.chat_history[-1] == {"user": "draw a cat", "assistant": IMAGE_PENDING_REPLY}
+
+        # A later turn finishes while the image is still rendering
+        chat._add_to_history(session, "what else can you do", "Lots of things.")
+        render.set()
+        await job.task
+        return events
+
+    events = asyncio.run(run())
+
+    assert [entry["user"] for entry in session.chat_history] == ["draw a cat", "what else can you do"]
+    assert session.chat_history[0]["assistant"] == "Generated an image based on your request."
+    assert session.last_message_was_generation is True
+
+    # The turn was already completed; the job reports one image_job result and no second message_complete
+    assert "message_complete" not in [event["type"] for event in events]
+    results = [event for event in events if event["type"] == "image_job"]
+    assert len(results) == 1
+    assert results[0]["status"] == "done"
+    assert results[0]["text"] == "A cat."
+    assert results[0]["message_id"] == "msg-1"
+    assert results[0]["image_url"].endswith(".png")
+    assert (events[-1]["type"], events[-1]["status"]) == ("image_job_status", "done")
+
+
+def test_failure_is_recorded_in_the_reserved_slot():
+    chat = ChatService()
+    session = chat.sessions.get_or_create("failure")
+
+    async def run():
+        render = asyncio.Event()
+        job, events = await start_job(chat, session, render, RuntimeError("quota"))
+        render.set()
+        await job.task
+        return events
+
+    events = asyncio.run(run())
+
+    assert session.chat_history[0]["assistant"].startswith("Tried to generate an image, but it failed.")
+    results = [event for event in events if event["type"] == "image_job"]
+    assert [result["status"] for result in results] == ["failed"]
+    assert "quota" in results[0]["error"]
+    assert chat.image_jobs.get_stats()["failed"] == 1
+
+
+def test_cancellation_is_recorded_in_the_reserved_slot():
+    chat = ChatService()
+    session = chat.sessions.get_or_create("cancelled")
+
+    async def run():
+        job, events = await start_job(chat, session, asyncio.Event(), (b"png", "image/png", None))
+        await asyncio.sleep(0.01)
+        assert chat.image_jobs.cancel(job.job_id, [session.session_id])
+        await asyncio.gather(job.task, return_exceptions=True)
+        return events
+
+    events = asyncio.run(run())
+
+    assert session.chat_history[0]["assistant"] == "Started generating an image, but it was cancelled."
+    assert events[-1]["status"] == "cancelled"
@@ -0,0 +1,85 @@
+"""
+Tests for the local image intent pre-router.
+"""
+
+import pytest
+
+from services.intent_router import ImageIntentClassifier
+
+
+@pytest.mark.parametrize("message", [
+    "draw a cat",
+    "draw me a cat",
+    "sketch a dragon",
+    "paint the ocean at night",
+    "please draw me a picture of a lighthouse",
+    "generate an image of a robot reading",
+    "create a logo for a coffee shop",
+    "a picture of a fox in the snow",
+])
+def test_new_image_requests_are_prerouted(message):
+    args = ImageIntentClassifier().classify(message, has_previous_image=False, has_image_attachments=False)
+    assert args is not None
+    assert args["modification_type"] == "new_generation"
+    assert args["use_previous_image"] is False
+
+
+@pytest.mark.parametrize("message", [
+    "draw a comparison between React and Vue",
+    "let's draw a conclusion from this",
+    "sketch a plan for the launch",
+    "paint the town red",
+    "draw a cat?",
+    "how do I draw a cat",
+    "give me tips for drawing hands",
+    "tell me about Andrei's projects",
+])
+def test_ambiguous_or_figurative_messages_pass_through(message):
+    assert ImageIntentClassifier().classify(message, has_previous_image=False, has_image_attachments=False) is None
+
+
+@pytest.mark.parametrize("message", [
+    "make it bluer",
+    "now make it a bit darker",
+    "make the sky purple",
+    "change the background to a beach",
+    "add a red hat",
+    "turn it into a watercolor",
+    "in the style of van gogh",
+    "it but brighter",
+])
+def test_visual_edits_of_previous_image_are_prerouted(message):
+    args = ImageIntentClassifier().classify(message, has_previous_image=True, has_image_attachments=False)
+    assert args is not None
+    assert args["modification_type"] == "edit_previous"
+    assert args["use_previous_image"] is True
+
+
+@pytest.mark.parametrize("message", [
+    "make it shorter",
+    "turn it into a poem",
+    "add a link to your github",
+    "change the subject",
+    "put it another way",
+    "give it a title",
+    "remove that last sentence",
+    "replace the word foo with bar",
+    "make it more formal",
+])
+def test_text_edits_after_an_image_pass_through(message):
+    assert ImageIntentClassifier().classify(message, has_previous_image=True, has_image_attachments=False) is None
+
+
+def test_edits_need_an_image_to_edit():
+    classifier = ImageIntentClassifier()
+    assert classifier.classify("make it bluer", has_previous_image=False, has_image_attachments=False) is None
+    args = classifier.classify("make it bluer", has_previous_image=False, has_image_attachments=True)
+    assert args["modification_type"] == "edit_previous"
+    assert args["use_previous_image"] is False
+
+
+def test_counts_decisions():
+    classifier = ImageIntentClassifier()
+    classifier.classify("draw a cat", has_previous_image=False, has_image_attachments=False)
+    classifier.classify("make it shorter", has_previous_image=True, has_image_attachments=False)
+    assert classifier.get_stats() == {"prerouted": 1, "passed_through": 1}
@@ -0,0 +1,200 @@
+"""
+Tests for ReferenceFileCache and the inline retry in ChatService.generate_image,
+against a local fake of the Files API.
+"""
+
+import asyncio
+import datetime
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors, types
+
+from models.websocket import MessageAttachment
+from services.chat_service import ChatService
+from services.reference_files import ReferenceFileCache, is_file_reference_error
+
+IMAGE = b"\x89PNG" + b"\x00" * 4096
+IMAGE_HASH = hashlib.sha256(IMAGE).hexdigest()
+
+
+class FakeFiles:
+    """In-memory stand-in for client.aio.files."""
+
+    def __init__(self, expires_in: float = 48 * 3600.0):
+        self.expires_in = expires_in
+        self.uploads = []
+        self.fail = False
+
+    async def upload(self, file, config):
+        if self.fail:
+            raise errors.ServerError(503, {"error": {"message": "Upload unavailable", "status": "UNAVAILABLE"}})
+        self.uploads.append(file.read())
+        name = f"files/{len(self.uploads)}"
+        return types.File(
+            name=name,
+            uri=f"https://generativelanguage.googleapis.com/v1beta/{name}",
+            mime_type=config.mime_type,
+            state=types.FileState.ACTIVE,
+            expiration_time=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.expires_in)
+        )
+
+    async def get(self, name):
+        raise AssertionError("Uploads are ACTIVE immediately")
+
+
+def make_cache(files: FakeFiles, **kwargs) -> ReferenceFileCache:
+    options = {
+        "client": SimpleNamespace(aio=SimpleNamespace(files=files)),
+        "ttl_seconds": 46 * 3600.0,
+        "min_bytes": 1024,
+        "max_entries": 10,
+    }
+    options.update(kwargs)
+    return ReferenceFileCache(**options)
+
+
+def test_reuses_upload_by_content_hash():
+    files = FakeFiles()
+    cache = make_cache(files)
+
+    async def run():
+        return [await cache.get_part(IMAGE, "image/png", IMAGE_HASH) for _ in range(3)]
+
+    parts = asyncio.run(run())
+    assert len(files.uploads) == 1
+    assert {part.file_data.file_uri for part in parts} == {"https://generativelanguage.googleapis.com/v1beta/files/1"}
+    assert cache.get_stats()["reused"] == 2
+
+
+def test_concurrent_turns_share_one_upload():
+    files = FakeFiles()
+    cache = make_cache(files)
+
+    async def run():
+        return await asyncio.gather(*[cache.get_part(IMAGE, "image/png", IMAGE_HASH) for _ in range(5)])
+
+    asyncio.run(run())
+    assert len(files.uploads) == 1
+
+
+def test_small_images_are_sent_inline():
+    files = FakeFiles()
+    cache = make_cache(files, min_bytes=len(IMAGE) + 1)
+
+    part = asyncio.run(cache.get_part(IMAGE, "image/png", IMAGE_HASH))
+    assert part.inline_data.data == IMAGE
+    assert files.uploads == []
+
+
+def test_expired_upload_is_uploaded_again(monkeypatch):
+    files = FakeFiles()
+    cache = make_cache(files, ttl_seconds=60.0)
+    now = [1_000_000.0]
+    monkeypatch.setattr("services.reference_files.time.time", lambda: now[0])
+
+    async def run():
+        first = await cache.get_part(IMAGE, "image/png", IMAGE_HASH)
+        now[0] += 61
+        second = await cache.get_part(IMAGE, "image/png", IMAGE_HASH)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(files.uploads) == 2
+    assert first.file_data.file_uri != second.file_data.file_uri
+
+
+def test_reuse_stops_an_hour_before_the_api_deletes_the_file(monkeypatch):
+    files = FakeFiles(expires_in=2 * 3600.0)
+    cache = make_cache(files)
+
+    asyncio.run(cache.get_part(IMAGE, "image/png", IMAGE_HASH))
+    later = datetime.datetime.now(datetime.timezone.utc).timestamp() + 3600 + 60
+    monkeypatch.setattr("services.reference_files.time.time", lambda: later)
+    asyncio.run(cache.get_part(IMAGE, "image/png", IMAGE_HASH))
+    assert len(files.uploads) == 2
+
+
+def test_failed_upload_falls_back_to_inline():
+    files = FakeFiles()
+    files.fail = True
+    cache = make_cache(files)
+
+    part = asyncio.run(cache.get_part(IMAGE, "image/png", IMAGE_HASH))
+    assert part.inline_data.data == IMAGE
+    assert cache.get_stats()["entries"] == 0
+
+
+class FakeModels:
+    """Image model that rejects file references it no longer knows."""
+
+    def __init__(self, file_error: errors.ClientError = None):
+        self.calls = []
+        self.file_error = file_error or errors.ClientError(
+            403, {"error": {"message": "File files/1 not found or expired", "status": "PERMISSION_DENIED"}}
+        )
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls.append(contents)
+        if any(isinstance(part, types.Part) and part.file_data for part in contents):
+            raise self.file_error
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+            role="model",
+            parts=[types.Part(inline_data=types.Blob(data=b"rendered", mime_type="image/png"))]
+        ))])
+
+
+def make_chat(files: FakeFiles, models: FakeModels) -> ChatService:
+    chat = ChatService()
+    chat.client = SimpleNamespace(aio=SimpleNamespace(files=files, models=models))
+    chat.reference_files = make_cache(files)
+    chat.scheduler.max_retries = 0
+    return chat
+
+
+def make_reference() -> MessageAttachment:
+    reference = MessageAttachment(name="photo.png", mime_type="image/png", data="cGxhY2Vob2xkZXI=")
+    reference.set_content(IMAGE)
+    return reference
+
+
+def test_rejected_file_reference_is_retried_inline():
+    files = FakeFiles()
+    models = FakeModels()
+    chat = make_chat(files, models)
+
+    image_bytes, mime_type, _ = asyncio.run(chat.generate_image("make it bluer", [make_reference()]))
+
+    assert (image_bytes, mime_type) == (b"rendered", "image/png")
+    assert len(models.calls) == 2
+    assert models.calls[0][0].file_data is not None
+    assert models.calls[1][0].inline_data.data == IMAGE
+    # The rejected upload is forgotten, so the next turn uploads again
+    assert chat.reference_files.get_stats()["entries"] == 0
+
+
+def test_rate_limit_is_raised_without_dropping_uploads():
+    files = FakeFiles()
+    models = FakeModels(errors.ClientError(429, {"error": {"message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}}))
+    chat = make_chat(files, models)
+
+    with pytest.raises(errors.ClientError) as raised:
+        asyncio.run(chat.generate_image("make it bluer", [make_reference()]))
+
+    assert raised.value.code == 429
+    assert len(models.calls) == 1
+    assert chat.reference_files.get_stats()["entries"] == 1
+    assert len(files.uploads) == 1
+
+
+@pytest.mark.parametrize("error, expected", [
+    (errors.ClientError(403, {"error": {"message": "You do not have permission to access the File files/1", "status": "PERMISSION_DENIED"}}), True),
+    (errors.ClientError(404, {"error": {"message": "File files/1 not found", "status": "NOT_FOUND"}}), True),
+    (errors.ClientError(400, {"error": {"message": "File files/1 is not in an ACTIVE state", "status": "FAILED_PRECONDITION"}}), True),
+    (errors.ClientError(429, {"error": {"message": "Quota exceeded for file uploads", "status": "RESOURCE_EXHAUSTED"}}), False),
+    (errors.ClientError(400, {"error": {"message": "Invalid prompt", "status": "INVALID_ARGUMENT"}}), False),
+    (ValueError("file"), False),
+])
+def test_is_file_reference_error(error, expected):
+    assert is_file_reference_error(error) is expected
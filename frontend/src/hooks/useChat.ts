@@ -2,7 +2,7 @@ import { useCallback, useState } from 'react'
 import { useWebSocket } from './useWebSocket'
 import { useChatMessages, ChatResponse } from './useChatMessages'
 import { useFileUpload } from './useFileUpload'
-import { generateMessageId, convertFilesToAttachments, MessageAttachment } from '../utils/chatUtils'
+import { generateMessageId, uploadFilesAsAttachments, getApiBaseUrl, MessageAttachment } from '../utils/chatUtils'
 
 interface UseChatOptions {
   websocketUrl: string
@@ -21,7 +21,8 @@ export const useChat = ({ websocketUrl, onMessagesUpdate }: UseChatOptions) => {
     clearMessages,
     updateMessages
   } = useChatMessages({
-    onMessagesChange: onMessagesUpdate
+    onMessagesChange: onMessagesUpdate,
+    apiBaseUrl: getApiBaseUrl(websocketUrl)
   })
 
   const {
@@ -46,9 +47,9 @@ export const useChat = ({ websocketUrl, onMessagesUpdate }: UseChatOptions) => {
       // Special logging for image events
       if (responseData.type === 'image_generating') {
         console.log('🖼️ Image generation started!')
-      } else if (responseData.type === 'image_generated') {
-        console.log('🖼️ Image generated! Has image_data:', !!responseData.image_data)
-        console.log('🖼️ Image data length:', responseData.image_data?.length)
+      } else if (responseData.type === 'image_job') {
+        console.log('🖼️ Image job finished:', responseData.status, responseData.image_url)
+        console.log('🖼️ Image size:', responseData.size)
         console.log('🖼️ MIME type:', responseData.mime_type)
       }
       
@@ -89,14 +90,14 @@ export const useChat = ({ websocketUrl, onMessagesUpdate }: UseChatOptions) => {
       const displayAttachments = getAttachments()
       addUserMessage(content, displayAttachments)
       
-      // Convert files to base64 attachments for backend
+      // Upload files to the backend blob store and reference them by id
       let backendAttachments: MessageAttachment[] = []
       if (hasFiles) {
         try {
-          backendAttachments = await convertFilesToAttachments(selectedFiles)
-          console.log(`📎 Converted ${backendAttachments.length} attachments for backend`)
+          backendAttachments = await uploadFilesAsAttachments(selectedFiles, getApiBaseUrl(websocketUrl))
+          console.log(`📎 Uploaded ${backendAttachments.length} attachments for backend`)
         } catch (error) {
-          console.error('Error converting files to attachments:', error)
+          console.error('Error uploading attachments:', error)
           addErrorMessage('Failed to process file attachments')
           return false
         }
@@ -119,6 +120,7 @@ export const useChat = ({ websocketUrl, onMessagesUpdate }: UseChatOptions) => {
   }, [
     hasFiles, 
     selectedFiles,
+    websocketUrl,
     getAttachments, 
     addUserMessage, 
     clearFiles, 
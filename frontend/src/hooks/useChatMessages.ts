@@ -16,21 +16,27 @@ export interface Message {
 }
 
 export interface ChatResponse {
-  type: 'typing_start' | 'typing_end' | 'content_chunk' | 'message_complete' | 'error' | 'image_generated' | 'image_generating'
+  type: 'typing_start' | 'typing_end' | 'content_chunk' | 'message_complete' | 'error' | 'image_job' | 'image_generating'
   content?: string
   full_content?: string
   message_id?: string
   error?: string
-  image_data?: string  // base64 encoded image
-  mime_type?: string   // image MIME type
+  image_id?: string   // content hash of the generated image
+  image_url?: string  // backend path the image is served from
+  mime_type?: string  // image MIME type
+  size?: number       // image size in bytes
+  job_id?: string     // background image job the event belongs to
+  status?: string     // image job outcome: 'done' or 'failed'
+  text?: string       // text the image model returned with the result
 }
 
 interface UseChatMessagesOptions {
   onMessagesChange?: (messages: Message[]) => void
+  apiBaseUrl?: string
 }
 
 export const useChatMessages = (options: UseChatMessagesOptions = {}) => {
-  const { onMessagesChange } = options
+  const { onMessagesChange, apiBaseUrl = '' } = options
   const [messages, setMessages] = useState<Message[]>([])
   const [isAiTyping, setIsAiTyping] = useState(false)
   const currentAiMessageRef = useRef<string>('')
@@ -62,38 +68,43 @@ export const useChatMessages = (options: UseChatMessagesOptions = {}) => {
         currentMessageIdRef.current = responseData.message_id || ''
         break
       
-      case 'image_generated':
-        // Handle generated image
-        console.log('🖼️ PROCESSING IMAGE_GENERATED EVENT')
-        console.log('🖼️ Has image_data:', !!responseData.image_data)
-        console.log('🖼️ Has mime_type:', !!responseData.mime_type)
-        console.log('🖼️ Image data length:', responseData.image_data?.length)
+      case 'image_job':
+        // Result of a background image job; the chat turn itself already completed
+        console.log('🖼️ PROCESSING IMAGE_JOB EVENT:', responseData.status)
         
-        if (responseData.image_data && responseData.mime_type) {
-          console.log('🖼️ Creating image message!')
+        if (responseData.status === 'done' && responseData.image_url && responseData.mime_type) {
           const imageMessage: Message = {
             id: `assistant-${Date.now()}`,
             type: 'assistant',
-            content: 'Here\'s the image I generated for you:',
+            content: responseData.text || 'Here\'s the image I generated for you:',
             timestamp: new Date(),
             attachments: [{
               name: 'generated-image.png',
               type: responseData.mime_type,
-              size: 0,
-              url: `data:${responseData.mime_type};base64,${responseData.image_data}`
+              size: responseData.size || 0,
+              url: `${apiBaseUrl}${responseData.image_url}`
             }]
           }
           
-          console.log('🖼️ Image message:', imageMessage)
-          
           setMessages(prev => {
             const newMessages = [...prev, imageMessage]
-            console.log('🖼️ Added image message, total messages:', newMessages.length)
+            setTimeout(() => onMessagesChange?.(newMessages), 0)
+            return newMessages
+          })
+        } else if (responseData.status === 'failed') {
+          setMessages(prev => {
+            const newMessages = [...prev, {
+              id: `ai-${responseData.job_id || Date.now()}`,
+              type: 'ai' as const,
+              content: responseData.text || `Sorry, I couldn't generate that image: ${responseData.error}`,
+              timestamp: new Date(),
+              isStreaming: false
+            }]
             setTimeout(() => onMessagesChange?.(newMessages), 0)
             return newMessages
           })
         } else {
-          console.warn('🖼️ Missing image_data or mime_type!')
+          console.warn('🖼️ Image job event without an image:', responseData)
         }
         break
         
@@ -160,7 +171,7 @@ export const useChatMessages = (options: UseChatMessagesOptions = {}) => {
         })
         break
     }
-  }, [onMessagesChange])
+  }, [onMessagesChange, apiBaseUrl])
 
   const addErrorMessage = useCallback((error: string) => {
     setIsAiTyping(false)
@@ -73,6 +73,12 @@ export const useWebSocket = ({ url, onMessage, reconnectDelay = 3000, heartbeatI
             return
           }
           
+          // Answer server heartbeat pings so the server can measure round-trip time
+          if (data.type === 'ping') {
+            ws.send(JSON.stringify({ type: 'pong', ping_id: data.ping_id }))
+            return
+          }
+          
           // Handle regular messages
           onMessage?.(data)
         } catch (error) {
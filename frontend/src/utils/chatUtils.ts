@@ -110,7 +110,8 @@ export const adjustTextareaHeight = (textarea: HTMLTextAreaElement, maxHeight: n
 export interface MessageAttachment {
   name: string
   mime_type: string
-  data: string // base64 encoded
+  data?: string // base64 encoded (legacy inline upload)
+  blob_id?: string // id returned by POST /api/attachments
   size?: number
 }
 
@@ -158,3 +159,56 @@ export const convertFilesToAttachments = async (files: File[]): Promise<MessageA
     throw error
   }
 }
+
+/**
+ * Uploads a file to the backend blob store
+ * @param file - File to upload
+ * @param apiBaseUrl - Backend base URL (e.g. http://localhost:8000)
+ * @returns Promise with an attachment referencing the stored blob
+ */
+export const uploadFileAsAttachment = async (file: File, apiBaseUrl: string): Promise<MessageAttachment> => {
+  const formData = new FormData()
+  formData.append('file', file)
+
+  const response = await fetch(`${apiBaseUrl}/api/attachments`, {
+    method: 'POST',
+    body: formData
+  })
+  if (!response.ok) {
+    throw new Error(`Failed to upload ${file.name} (${response.status})`)
+  }
+
+  const result = await response.json()
+  return {
+    name: file.name,
+    mime_type: file.type || result.data.mime_type,
+    blob_id: result.data.blob_id,
+    size: result.data.size
+  }
+}
+
+/**
+ * Uploads multiple files and returns blob-referencing attachments
+ * @param files - Array of files to upload
+ * @param apiBaseUrl - Backend base URL
+ * @returns Promise with array of attachments
+ */
+export const uploadFilesAsAttachments = async (files: File[], apiBaseUrl: string): Promise<MessageAttachment[]> => {
+  try {
+    return await Promise.all(files.map(file => uploadFileAsAttachment(file, apiBaseUrl)))
+  } catch (error) {
+    console.error('Error uploading attachments:', error)
+    throw error
+  }
+}
+
+/**
+ * Derives the HTTP base URL of the backend from its WebSocket URL
+ * @param websocketUrl - WebSocket URL (e.g. ws://localhost:8000/ws)
+ * @returns HTTP base URL (e.g. http://localhost:8000)
+ */
+export const getApiBaseUrl = (websocketUrl: string): string => {
+  const url = new URL(websocketUrl)
+  url.protocol = url.protocol === 'wss:' ? 'https:' : 'http:'
+  return url.origin
+}